@@ -0,0 +1,85 @@
+import heapq
+import threading
+
+from indexes import is_number
+
+
+def _categories(product: dict) -> set[str]:
+    # OFF category tags ("en:breakfast-cereals"), each counted once per product
+    details = product.get("details")
+    tags = details.get("categories_tags") if isinstance(details, dict) else None
+    if not isinstance(tags, list):
+        return set()
+    return {tag for tag in tags if isinstance(tag, str)}
+
+
+class InventoryStats:
+    # Running inventory totals, kept current through ProductStore.subscribe(): every change
+    # subtracts the old product's share and adds the new one's, so reading them is O(1)
+    # (plus the number of categories) however big the inventory is.
+    #   units            -> sum of stock
+    #   value            -> sum of price * stock
+    #   out_of_stock     -> products with stock <= 0
+    #   categories       -> category tag -> number of products with it
+    # Products whose price/stock aren't numbers count as products but add nothing to the
+    # totals. value is a float running sum, so it's rounded to cents on the way out.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.products = 0
+        self.units = 0
+        self.value = 0.0
+        self.out_of_stock = 0
+        self._categories: dict[str, int] = {}
+
+    def on_change(self, action: str, old: dict | None, new: dict | None) -> None:
+        # Store listener
+        with self._lock:
+            if action == "clear":
+                self._reset()
+                return
+            if old is not None:
+                self._apply(old, -1)
+            if new is not None:
+                self._apply(new, 1)
+
+    def _apply(self, product: dict, sign: int) -> None:
+        self.products += sign
+        stock = product.get("stock")
+        if is_number(stock):
+            self.units += sign * stock
+            if stock <= 0:
+                self.out_of_stock += sign
+            price = product.get("price")
+            if is_number(price):
+                self.value += sign * price * stock
+
+        for tag in _categories(product):
+            count = self._categories.get(tag, 0) + sign
+            if count:
+                self._categories[tag] = count
+            else:
+                del self._categories[tag]
+
+    def snapshot(self, top_categories: int | None = None) -> dict:
+        # top_categories limits the category breakdown to the N biggest (None = all)
+        with self._lock:
+            if top_categories is None:
+                categories = sorted(self._categories.items(), key=lambda item: (-item[1], item[0]))
+            else:
+                categories = heapq.nsmallest(
+                    top_categories, self._categories.items(), key=lambda item: (-item[1], item[0])
+                )
+            return {
+                "products": self.products,
+                "units": self.units,
+                # + 0.0 turns a -0.0 left by float error into 0.0
+                "inventory_value": round(self.value, 2) + 0.0,
+                "out_of_stock": self.out_of_stock,
+                "category_count": len(self._categories),
+                # A list, so the biggest-first order survives JSON key sorting
+                "categories": [{"category": tag, "products": count} for tag, count in categories],
+            }
@@ -1,10 +1,414 @@
-from flask import Flask, jsonify, request
+import atexit
+import json
+import math
+import os
+import time
+
+import requests
+from flask import Flask, Response, g, jsonify, request
+from aggregates import InventoryStats
+from changes import ChangeFeed, CursorExpired
 from data import products
-from services.openfoodfacts import fetch_by_barcode, fetch_by_name
+from fragments import FragmentCache
+from indexes import INDEXED_FIELDS, SORT_FIELDS, build_indexes, find_products, is_number
+from jobs import JobManager
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry, process_memory_bytes
+from refresher import DetailsRefresher, stamp_fetched
+from services.breaker import CLOSED, HALF_OPEN, CircuitOpenError
+from services.deadline import deadline
+from services.openfoodfacts import NAME_CANDIDATES, default_client as off_client, fetch_by_barcode, fetch_by_name, search_by_name
+from storage.journal import Journal
+from search import SearchIndex
+from services.cache import TTLCache
+from store import PRODUCT_FIELDS, ProductStore, backend_from_env
+from versions import VersionTracker
 
 # Main Flask app for the inventory API
 app = Flask(__name__)
 
+# Product storage: in-memory by default, SQLite with STORE_BACKEND=sqlite (see store.py).
+# A fresh/empty store gets seeded with the demo rows from data.py.
+store = ProductStore(backend=backend_from_env())
+
+# Optional durability for the in-memory backend: STORE_JOURNAL_DIR restores the store from
+# its last snapshot + journal on startup and journals every change after that
+journal = None
+if os.getenv("STORE_JOURNAL_DIR"):
+    if store.backend.persistent:
+        raise RuntimeError("STORE_JOURNAL_DIR only works with in-memory backends (STORE_BACKEND=memory or compact)")
+    journal = Journal(
+        os.environ["STORE_JOURNAL_DIR"],
+        snapshot_every=int(os.getenv("STORE_SNAPSHOT_EVERY", "100000")),
+    )
+    journal.attach(store)
+    atexit.register(journal.close)
+
+if len(store) == 0:
+    store.load(products)
+
+# Local full-text index over our own inventory, updated on every store change
+search_index = SearchIndex()
+store.subscribe(search_index.on_change)
+
+# Sorted price/stock indexes for GET /products filters and sorting, also updated on every change
+field_indexes = build_indexes(store)
+
+# Running totals (units, value, out of stock, categories) for GET /products/stats
+inventory_stats = InventoryStats()
+store.subscribe(inventory_stats.on_change)
+
+# Each product's JSON encoded once and reused until it changes, so building a list response
+# is mostly joining bytes. The encoder matches jsonify's output (compact, Flask's key sorting
+# and type handling); one reusable instance is much cheaper per call than app.json.dumps.
+product_fragments = FragmentCache(
+    json.JSONEncoder(
+        separators=(",", ":"),
+        sort_keys=app.json.sort_keys,
+        ensure_ascii=app.json.ensure_ascii,
+        default=app.json.default,
+    ).encode,
+    maxsize=int(os.getenv("FRAGMENT_CACHE_SIZE", "1000000")),
+)
+# Subscribed before `versions`: once a change's new ETag is visible, its old fragment is gone,
+# so a response can't pair the new ETag with the old body (and cache that pair).
+store.subscribe(product_fragments.on_change, replay=False)
+
+# Per-product and per-collection versions for ETag/Last-Modified, plus serialized response
+# bodies keyed by URL. A cached body is only reused while its ETag is still current.
+versions = VersionTracker()
+store.subscribe(versions.on_change, replay=False)
+
+# Bounded log of recent changes for GET /products/changes. Subscribed after `versions`: a
+# reader that sees a change's seq then also sees its new ETag, so GET /products never serves
+# a cached body older than the X-Change-Seq it sends with it.
+change_feed = ChangeFeed(size=int(os.getenv("CHANGE_FEED_SIZE", "10000")))
+store.subscribe(change_feed.on_change, replay=False)
+response_cache = TTLCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")), ttl=3600)
+
+# Background bulk-enrichment jobs (bounded thread pool + global OFF requests/second limit)
+enrichment_jobs = JobManager(
+    max_workers=int(os.getenv("ENRICH_WORKERS", "8")),
+    rate_per_sec=float(os.getenv("ENRICH_RATE_PER_SEC", "10")),
+)
+
+# Re-fetches OFF details older than DETAILS_MAX_AGE in the background, a small rate-limited
+# batch every DETAILS_REFRESH_INTERVAL seconds (0 = only when POST /products/refresh asks).
+# off_client is looked up at call time so it can be swapped out (tests mock it).
+details_refresher = DetailsRefresher(
+    store,
+    fetch=lambda barcode: off_client.refresh_by_barcode(barcode),
+    max_age=float(os.getenv("DETAILS_MAX_AGE", str(7 * 24 * 3600))),
+    batch_size=int(os.getenv("DETAILS_REFRESH_BATCH_SIZE", "20")),
+    rate_per_sec=float(os.getenv("DETAILS_REFRESH_RATE_PER_SEC", "1")),
+    interval=float(os.getenv("DETAILS_REFRESH_INTERVAL", "600")),
+)
+details_refresher.start()
+
+# Request and upstream instrumentation, scraped from GET /metrics (Prometheus text format).
+# Routes are labeled by their URL rule ("/products/<int:product_id>"), not the raw path, so
+# the number of series stays small.
+metrics = MetricsRegistry()
+http_requests = metrics.counter("http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+http_latency = metrics.histogram("http_request_duration_seconds", "Time to build a response", ("route", "method"))
+off_latency = metrics.histogram(
+    "openfoodfacts_lookup_duration_seconds", "OpenFoodFacts lookups by endpoint and outcome", ("endpoint", "outcome")
+)
+off_client.observer = lambda endpoint, outcome, seconds: off_latency.observe(seconds, endpoint, outcome)
+metrics.gauge("inventory_products", "Products in the store", lambda: len(store))
+metrics.gauge("inventory_store_bytes", "Approximate bytes used by product storage", lambda: store.size_bytes())
+metrics.gauge("process_resident_memory_bytes", "Resident memory of this process", process_memory_bytes)
+metrics.gauge("product_fragment_cache_entries", "Products with a cached JSON encoding", lambda: len(product_fragments))
+metrics.gauge("product_details_stale", "Products whose OFF details are older than DETAILS_MAX_AGE", details_refresher.stale_count)
+metrics.gauge("openfoodfacts_cache_entries", "Entries in the OpenFoodFacts lookup cache", lambda: len(off_client.cache))
+metrics.gauge("openfoodfacts_cache_hits_total", "OpenFoodFacts cache hits", lambda: off_client.cache.hits, kind="counter")
+metrics.gauge("openfoodfacts_cache_misses_total", "OpenFoodFacts cache misses", lambda: off_client.cache.misses, kind="counter")
+metrics.gauge(
+    "openfoodfacts_circuit_state", "OpenFoodFacts circuit breaker: 0 closed, 1 half open, 2 open",
+    lambda: {CLOSED: 0, HALF_OPEN: 1}.get(off_client.breaker.state, 2),
+)
+metrics.gauge("openfoodfacts_circuit_opened_total", "Times the OpenFoodFacts breaker opened", lambda: off_client.breaker.opened, kind="counter")
+metrics.gauge("openfoodfacts_circuit_rejected_total", "Lookups failed fast by the open breaker", lambda: off_client.breaker.rejected, kind="counter")
+
+# Page size limits for GET /products?limit=...
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# GET /products query params that switch to a filtered/sorted/projected listing
+QUERY_PARAMS = (
+    "price", "price_min", "price_max", "stock", "stock_min", "stock_max",
+    "barcode", "has_barcode", "sort", "fields", "offset",
+)
+
+# Stock at or below this counts as low (GET /products/stats and /products/low-stock)
+LOW_STOCK_THRESHOLD = float(os.getenv("LOW_STOCK_THRESHOLD", "10"))
+
+# GET /products/changes: max seconds a long poll may wait, SSE keep-alive interval, and how
+# long one SSE connection lasts before the client reconnects (with Last-Event-ID)
+MAX_CHANGES_WAIT = 30.0
+SSE_HEARTBEAT = 15.0
+SSE_MAX_DURATION = 300.0
+
+# Most time one API request may spend waiting on OpenFoodFacts, retries included. Lookups
+# past it fail with a 502 instead of holding a worker for the full upstream timeout.
+OFF_REQUEST_BUDGET = float(os.getenv("OFF_REQUEST_BUDGET", "3"))
+
+# Max items per bulk request (keeps one request from holding the store for too long)
+MAX_BULK_ITEMS = int(os.getenv("MAX_BULK_ITEMS", "10000"))
+
+
+def _upstream_error(error: Exception):
+    # 503 while the OFF circuit breaker is open (we didn't even try; Retry-After says when
+    # it's worth trying again), 502 when OFF itself failed or ran out of time
+    if isinstance(error, CircuitOpenError):
+        resp = jsonify({"error": "External API unavailable"})
+        resp.headers["Retry-After"] = str(max(1, math.ceil(error.retry_after)))
+        return resp, 503
+    if isinstance(error, requests.Timeout):
+        return jsonify({"error": "External API timed out"}), 502
+    return jsonify({"error": "External API request failed"}), 502
+
+
+def _int_arg(name: str, default: int | None = None) -> int | None:
+    # Query params come in as strings; raise ValueError so routes can return a clean 400
+    raw = request.args.get(name)
+    if raw is None or raw == "":
+        return default
+    return int(raw)
+
+
+def _float_arg(name: str) -> float | None:
+    raw = request.args.get(name)
+    if raw is None or raw == "":
+        return None
+    value = float(raw)
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    return value
+
+
+def _product_query() -> tuple[dict | None, str | None]:
+    # Parse GET /products filters into (query, None) or (None, error).
+    # price=/stock= match exactly, *_min/*_max are inclusive bounds.
+    ranges = {}
+    for field in INDEXED_FIELDS:
+        try:
+            exact = _float_arg(field)
+            low = _float_arg(f"{field}_min")
+            high = _float_arg(f"{field}_max")
+        except ValueError:
+            return None, f"{field}, {field}_min and {field}_max must be numbers"
+        if exact is not None:
+            low = exact if low is None else max(low, exact)
+            high = exact if high is None else min(high, exact)
+        if low is not None or high is not None:
+            ranges[field] = (low, high)
+
+    has_barcode = request.args.get("has_barcode")
+    if has_barcode is not None:
+        if has_barcode.lower() not in ("true", "false", "1", "0"):
+            return None, "has_barcode must be true or false"
+        has_barcode = has_barcode.lower() in ("true", "1")
+
+    # sort=price (ascending) or sort=-price (descending)
+    sort = request.args.get("sort", "id")
+    if sort.lstrip("-") not in SORT_FIELDS:
+        return None, f"sort must be one of {', '.join(SORT_FIELDS)} (prefix with - for descending)"
+
+    fields = None
+    if request.args.get("fields"):
+        fields = [field.strip() for field in request.args["fields"].split(",") if field.strip()]
+        unknown = [field for field in fields if field != "id" and field not in PRODUCT_FIELDS]
+        if unknown:
+            return None, f"Unknown fields: {', '.join(unknown)}"
+
+    # Filtered listings page by offset: an id cursor doesn't work once the order isn't by id
+    if "after" in request.args:
+        return None, "after can't be combined with filters, sort or fields; use offset"
+    paged = "limit" in request.args or "offset" in request.args
+    try:
+        limit = _int_arg("limit", DEFAULT_PAGE_SIZE)
+        offset = _int_arg("offset", 0)
+    except ValueError:
+        return None, "limit and offset must be integers"
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return None, f"limit must be between 1 and {MAX_PAGE_SIZE}"
+    if offset < 0:
+        return None, "offset must be 0 or more"
+
+    return {
+        "find": {
+            "ranges": ranges,
+            "barcode": request.args.get("barcode"),
+            "has_barcode": has_barcode,
+            "sort": sort.lstrip("-"),
+            "descending": sort.startswith("-"),
+        },
+        "fields": fields,
+        "page": (offset, limit) if paged else None,
+    }, None
+
+
+def _query_products():
+    # GET /products with filters/sort/fields. Plain list, or with limit/offset
+    # {"items": [...], "next_offset": <offset or null>, "total": <matches>}.
+    query, error = _product_query()
+    if error:
+        return jsonify({"error": error}), 400
+
+    def build():
+        since = product_fragments.mark()
+        offset, limit = query["page"] or (0, None)
+        products, total = find_products(store, field_indexes, **query["find"], offset=offset, limit=limit)
+
+        if query["fields"]:
+            items = product_fragments.dumps(
+                [{field: product.get(field) for field in query["fields"]} for product in products]
+            ).encode()
+        else:
+            items = product_fragments.join(products, since)
+
+        if not query["page"]:
+            return items + b"\n"
+        next_offset = offset + limit if offset + limit < total else None
+        return (
+            b'{"items":' + items + b',"next_offset":' + app.json.dumps(next_offset).encode()
+            + b',"total":' + str(total).encode() + b"}\n"
+        )
+
+    return _conditional_json(versions.collection_etag(), versions.collection_modified, build)
+
+
+def _field_error(fields: dict) -> str | None:
+    # Type checks for the product fields a write sends. A bad value has to be a 400 here: once
+    # the backend has the row, a store listener (search index, stats, ...) choking on it would
+    # leave the write half applied.
+    if "name" in fields and not isinstance(fields["name"], str):
+        return "name must be a string"
+    if "barcode" in fields and fields["barcode"] is not None and not isinstance(fields["barcode"], str):
+        return "barcode must be a string"
+    if "price" in fields and not (is_number(fields["price"]) and math.isfinite(fields["price"])):
+        return "price must be a number"
+    # Stock goes in a 64 bit column on SQLite and the compact backend
+    if "stock" in fields and not (type(fields["stock"]) is int and -(2 ** 63) <= fields["stock"] < 2 ** 63):
+        return "stock must be an integer"
+    if "details" in fields and fields["details"] is not None and not isinstance(fields["details"], dict):
+        return "details must be a JSON object"
+    return None
+
+
+def _normalize_fields(fields: dict) -> dict:
+    # Store what every backend would give back, so a write's response matches later reads:
+    # prices are floats (SQLite returns 3 as 3.0) and null details are {}
+    fields = dict(fields)
+    if "price" in fields:
+        fields["price"] = float(fields["price"])
+    if "details" in fields and fields["details"] is None:
+        fields["details"] = {}
+    return fields
+
+
+def _new_product_fields(data) -> tuple[dict | None, str | None]:
+    # Shared validation for POST /products and bulk create: (fields, None) or (None, error)
+    # No JSON body at all (or empty)
+    if not data:
+        return None, "No input data provided"
+
+    if not isinstance(data, dict):
+        return None, "Product must be a JSON object"
+
+    # Name is the one required field for a product
+    if "name" not in data:
+        return None, "Product name is required"
+
+    error = _field_error(data)
+    if error:
+        return None, error
+
+    # Default missing fields to sane values
+    return _normalize_fields({
+        "name": data["name"],
+        "barcode": data.get("barcode", None),
+        "price": data.get("price", 0.0),
+        "stock": data.get("stock", 0),
+        "details": data.get("details", {}),
+    }), None
+
+
+def _bulk_items(data, key: str):
+    # Bulk bodies can be a bare JSON list or {"<key>": [...]}; returns (items, error response)
+    items = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return None, (jsonify({"error": f"Expected a JSON list (or {{\"{key}\": [...]}})"}), 400)
+    if len(items) > MAX_BULK_ITEMS:
+        return None, (jsonify({"error": f"At most {MAX_BULK_ITEMS} items per request"}), 400)
+    return items, None
+
+
+def _stream_ndjson(rows, since: int):
+    # One JSON document per line, so clients can start parsing after the first product
+    for fragment in product_fragments.iter_encoded(rows, since):
+        yield fragment + b"\n"
+
+
+def _stream_json_array(rows, since: int):
+    # Same JSON array a plain GET returns, just produced piece by piece
+    yield b"["
+    first = True
+    for fragment in product_fragments.iter_encoded(rows, since):
+        if not first:
+            yield b","
+        first = False
+        yield fragment
+    yield b"]"
+
+
+def _conditional_json(etag: str, last_modified: float, build) -> Response:
+    # 304 if the client already has this version (If-None-Match wins over If-Modified-Since),
+    # otherwise the cached body for this URL if it's still current, otherwise build() it (bytes)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif request.if_modified_since:
+        not_modified = int(last_modified) <= request.if_modified_since.timestamp()
+    else:
+        not_modified = False
+
+    if not_modified:
+        resp = Response(status=304)
+    else:
+        key = request.full_path
+        hit, cached = response_cache.get(key)
+        if hit and cached[0] == etag:
+            body = cached[1]
+        else:
+            body = build()
+            response_cache.set(key, (etag, body))
+        resp = Response(body, mimetype="application/json")
+
+    resp.set_etag(etag)
+    # HTTP dates only have whole seconds, so a Last-Modified handed out during the second it
+    # names could hide a later write in that same second (and earn a false 304 from
+    # If-Modified-Since). It's only sent once that second is over; the ETag is always exact.
+    if int(last_modified) < int(time.time()):
+        resp.last_modified = int(last_modified)
+    return resp
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request_metrics(response):
+    # Runs for error responses too (404s, aborted requests, unhandled 500s). Streaming
+    # responses are timed until the first byte is ready, not until the body is sent.
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        http_requests.inc(route, request.method, str(response.status_code))
+        http_latency.observe(time.perf_counter() - started, route, request.method)
+    return response
+
 
 @app.route("/health", methods=["GET"])
 def health_check():
@@ -12,22 +416,89 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
 @app.route("/products", methods=["GET"])
 def get_products():
-    # Return the full in-memory "database"
-    return jsonify(products), 200
+    # X-Change-Seq tells the client where to start following GET /products/changes. It's read
+    # before any products, so changes after it are at worst replayed, never missed.
+    seq = change_feed.seq
+    resp = app.make_response(_list_products())
+    resp.headers["X-Change-Seq"] = str(seq)
+    resp.headers["X-Change-Epoch"] = change_feed.epoch
+    return resp
+
+
+def _list_products():
+    # ?stream=ndjson|json streams every product without building one giant body in memory
+    stream = request.args.get("stream")
+    if any(name in request.args for name in QUERY_PARAMS):
+        if stream is not None:
+            return jsonify({"error": "stream can't be combined with filters, sort or fields"}), 400
+        return _query_products()
+
+    if stream == "ndjson":
+        since = product_fragments.mark()
+        return Response(_stream_ndjson(store.iter_products(), since), mimetype="application/x-ndjson")
+    if stream == "json":
+        since = product_fragments.mark()
+        return Response(_stream_json_array(store.iter_products(), since), mimetype="application/json")
+    if stream is not None:
+        return jsonify({"error": "stream must be 'ndjson' or 'json'"}), 400
+
+    # ?limit=&after= switches to keyset pagination (after = last id from the previous page)
+    if "limit" in request.args or "after" in request.args:
+        try:
+            limit = _int_arg("limit", DEFAULT_PAGE_SIZE)
+            after = _int_arg("after")
+        except ValueError:
+            return jsonify({"error": "limit and after must be integers"}), 400
+
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+        def build_page():
+            # Same bytes jsonify({"items": ..., "next_after": ...}) would produce (keys sorted)
+            since = product_fragments.mark()
+            items, next_after = store.page(after=after, limit=limit)
+            return (
+                b'{"items":' + product_fragments.join(items, since)
+                + b',"next_after":' + app.json.dumps(next_after).encode() + b"}\n"
+            )
+
+        return _conditional_json(versions.collection_etag(), versions.collection_modified, build_page)
+
+    # No paging params: return the full in-memory "database" like before
+    def build_all():
+        since = product_fragments.mark()
+        if len(product_fragments) * 2 >= len(store):
+            # Mostly cached: go by id and only read the products that need encoding. A cold
+            # cache takes one scan instead (one query per product would be slow on SQLite).
+            return product_fragments.join_ids(store.column("id"), store.get, since) + b"\n"
+        return product_fragments.join(store.iter_products(), since) + b"\n"
+
+    return _conditional_json(versions.collection_etag(), versions.collection_modified, build_all)
 
 
 @app.route("/products/<int:product_id>", methods=["GET"])
 def get_product_by_id(product_id):
-    # Find the product with a matching id (None if it doesn't exist)
-    product = next((product for product in products if product["id"] == product_id), None)
+    # Read the version before the product, so the body is never older than its ETag
+    etag = versions.product_etag(product_id)
+
+    # Primary index lookup (None if it doesn't exist)
+    since = product_fragments.mark()
+    product = store.get(product_id)
 
     if product is None:
         # Keep errors consistent and readable
         return jsonify({"error": "Product not found"}), 404
 
-    return jsonify(product), 200
+    return _conditional_json(
+        etag, versions.product_modified(product_id), lambda: product_fragments.encode(product, since) + b"\n"
+    )
 
 
 @app.route("/products", methods=["POST"])
@@ -35,29 +506,12 @@ def add_product():
     # Incoming JSON payload from the client / CLI
     data = request.get_json()
 
-    # No JSON body at all (or empty)
-    if not data:
-        return jsonify({"error": "No input data provided"}), 400
-
-    # Name is the one required field for a product
-    if "name" not in data:
-        return jsonify({"error": "Product name is required"}), 400
-
-    # Auto-increment id based on current max id in the list
-    new_id = max(product["id"] for product in products) + 1
+    fields, error = _new_product_fields(data)
+    if error:
+        return jsonify({"error": error}), 400
 
-    # Create the new product, defaulting missing fields to sane values
-    new_product = {
-        "id": new_id,
-        "name": data["name"],
-        "barcode": data.get("barcode", None),
-        "price": data.get("price", 0.0),
-        "stock": data.get("stock", 0),
-        "details": data.get("details", {}),
-    }
-
-    # Since this is in-memory storage, append is basically our "INSERT"
-    products.append(new_product)
+    # The store hands out the next id itself, so no max() scan over every product
+    new_product = store.add(fields)
 
     return jsonify(new_product), 201
 
@@ -67,48 +521,158 @@ def update_product(product_id):
     # PATCH = partial update, so we only update fields the client actually sends
     data = request.get_json()
 
-    product = next((product for product in products if product["id"] == product_id), None)
-
-    if product is None:
+    if store.get(product_id) is None:
         return jsonify({"error": "Product not found"}), 404
 
     if not data:
         return jsonify({"error": "No input data provided"}), 400
 
-    # Update each field if it was provided in the payload
-    if "name" in data:
-        product["name"] = data["name"]
-
-    if "barcode" in data:
-        product["barcode"] = data["barcode"]
-
-    if "price" in data:
-        product["price"] = data["price"]
+    if not isinstance(data, dict):
+        return jsonify({"error": "Changes must be a JSON object"}), 400
 
-    if "stock" in data:
-        product["stock"] = data["stock"]
+    error = _field_error(data)
+    if error:
+        return jsonify({"error": error}), 400
 
-    if "details" in data:
-        # Allow manually setting/replacing details (useful for testing or admin work)
-        product["details"] = data["details"]
+    # The store only applies known fields (name/barcode/price/stock/details) that were
+    # actually sent, and keeps the barcode index in sync if the barcode changes.
+    # Details can be set manually here too (useful for testing or admin work).
+    product = store.update(product_id, _normalize_fields(data))
 
     return jsonify(product), 200
 
 
 @app.route("/products/<int:product_id>", methods=["DELETE"])
 def delete_product(product_id):
-    # Find product by id, then remove it from the list
-    product = next((p for p in products if p["id"] == product_id), None)
+    # Index pop is our "DELETE FROM products WHERE id = ?"
+    product = store.delete(product_id)
 
     if product is None:
         return jsonify({"error": "Product not found"}), 404
 
-    # List remove is our "DELETE FROM products WHERE id = ?"
-    products.remove(product)
-
     return jsonify({"message": "Product deleted"}), 200
 
 
+# ---------- bulk CRUD ----------
+# Each bulk route applies the whole batch in one store transaction (a single commit on SQLite)
+# and reports a result per item, so one bad row doesn't sink the rest of the batch. Items are
+# validated before they're written, and a write that still fails is reported as that item's
+# 500 (on SQLite only the failed statement is undone, the rest of the batch still commits).
+
+# Per-item result for a write the backend refused
+WRITE_FAILED = {"status": 500, "error": "Write failed"}
+
+
+@app.route("/products/bulk", methods=["POST"])
+def bulk_add_products():
+    items, error = _bulk_items(request.get_json(), "products")
+    if error:
+        return error
+
+    results = []
+    with store.transaction():
+        for index, item in enumerate(items):
+            fields, item_error = _new_product_fields(item)
+            if item_error:
+                results.append({"index": index, "status": 400, "error": item_error})
+                continue
+            try:
+                results.append({"index": index, "status": 201, "product": store.add(fields)})
+            except Exception:
+                results.append({"index": index, **WRITE_FAILED})
+
+    created = sum(1 for r in results if r["status"] == 201)
+    return jsonify({"created": created, "failed": len(results) - created, "results": results}), 200
+
+
+@app.route("/products/bulk", methods=["PATCH"])
+def bulk_update_products():
+    # Items look like {"id": 1, "stock": 5}; the id picks the product, the rest is the PATCH
+    items, error = _bulk_items(request.get_json(), "products")
+    if error:
+        return error
+
+    results = []
+    with store.transaction():
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not isinstance(item.get("id"), int):
+                results.append({"index": index, "status": 400, "error": "Each item needs an integer id"})
+                continue
+
+            changes = {k: v for k, v in item.items() if k != "id"}
+            if not changes:
+                results.append({"index": index, "status": 400, "error": "No input data provided"})
+                continue
+
+            field_error = _field_error(changes)
+            if field_error:
+                results.append({"index": index, "status": 400, "error": field_error})
+                continue
+
+            try:
+                product = store.update(item["id"], _normalize_fields(changes))
+            except Exception:
+                results.append({"index": index, **WRITE_FAILED})
+                continue
+            if product is None:
+                results.append({"index": index, "status": 404, "error": "Product not found"})
+            else:
+                results.append({"index": index, "status": 200, "product": product})
+
+    updated = sum(1 for r in results if r["status"] == 200)
+    return jsonify({"updated": updated, "failed": len(results) - updated, "results": results}), 200
+
+
+@app.route("/products/bulk", methods=["DELETE"])
+def bulk_delete_products():
+    ids, error = _bulk_items(request.get_json(), "ids")
+    if error:
+        return error
+
+    results = []
+    with store.transaction():
+        for index, product_id in enumerate(ids):
+            if not isinstance(product_id, int):
+                results.append({"index": index, "status": 400, "error": "ids must be integers"})
+                continue
+            try:
+                deleted = store.delete(product_id)
+            except Exception:
+                results.append({"index": index, **WRITE_FAILED})
+                continue
+            if deleted is None:
+                results.append({"index": index, "status": 404, "error": "Product not found"})
+            else:
+                results.append({"index": index, "status": 200, "id": product_id})
+
+    deleted = sum(1 for r in results if r["status"] == 200)
+    return jsonify({"deleted": deleted, "failed": len(results) - deleted, "results": results}), 200
+
+
+@app.route("/products/bulk", methods=["GET"])
+def bulk_get_products():
+    # Multi-get: /products/bulk?ids=1,2,3 -> found products (in request order) + missing ids
+    try:
+        ids = [int(i) for i in request.args.get("ids", "").split(",") if i.strip()]
+    except ValueError:
+        return jsonify({"error": "ids must be a comma separated list of integers"}), 400
+
+    if not ids:
+        return jsonify({"error": "ids query param is required"}), 400
+    if len(ids) > MAX_BULK_ITEMS:
+        return jsonify({"error": f"At most {MAX_BULK_ITEMS} ids per request"}), 400
+
+    found, missing = [], []
+    for product_id in ids:
+        product = store.get(product_id)
+        if product is None:
+            missing.append(product_id)
+        else:
+            found.append(product)
+
+    return jsonify({"products": found, "missing": missing}), 200
+
+
 @app.route("/products/search", methods=["GET"])
 def search_products():
     # Support searching by barcode OR name (barcode wins if both are sent)
@@ -118,11 +682,28 @@ def search_products():
     if not barcode and not name:
         return jsonify({"error": "barcode or name query param is required"}), 400
 
+    # ?limit=N on a name search returns the top N ranked candidates instead of just the best one
+    if name and not barcode and "limit" in request.args:
+        try:
+            limit = _int_arg("limit", 5)
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+
+        if limit < 1 or limit > NAME_CANDIDATES:
+            return jsonify({"error": f"limit must be between 1 and {NAME_CANDIDATES}"}), 400
+
+        try:
+            with deadline(OFF_REQUEST_BUDGET):
+                return jsonify(search_by_name(name, limit)), 200
+        except requests.RequestException as e:
+            return _upstream_error(e)
+
     # Prefer barcode lookup because it's more exact
-    if barcode:
-        details = fetch_by_barcode(barcode)
-    else:
-        details = fetch_by_name(name)
+    try:
+        with deadline(OFF_REQUEST_BUDGET):
+            details = fetch_by_barcode(barcode) if barcode else fetch_by_name(name)
+    except requests.RequestException as e:
+        return _upstream_error(e)
 
     if details is None:
         # Clean "not found" instead of leaking random external API behavior
@@ -131,10 +712,162 @@ def search_products():
     return jsonify(details), 200
 
 
+@app.route("/products/local-search", methods=["GET"])
+def local_search():
+    # Search our own inventory (name, brand, categories, ingredients) without calling OFF
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error": "q query param is required"}), 400
+
+    try:
+        limit = _int_arg("limit", 10)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = []
+    for product_id, score in search_index.search(query, limit=limit):
+        product = store.get(product_id)
+        if product is not None:
+            results.append({"score": score, "product": product})
+
+    return jsonify(results), 200
+
+
+def _resync_response():
+    return jsonify({
+        "error": "Cursor is too old (or from before a restart/reload); reload GET /products and "
+                 "continue from its X-Change-Seq",
+        "resync": True,
+        "epoch": change_feed.epoch,
+        "seq": change_feed.seq,
+    }), 410
+
+
+def _sse_changes(since: int, epoch: str, limit: int, duration: float):
+    # Server-Sent Events: one "change" event per change (id = its seq, so a reconnecting
+    # EventSource resumes via Last-Event-ID), comments as keep-alives, and a final "resync"
+    # event if the client fell behind the buffer
+    deadline = time.monotonic() + duration
+    yield "retry: 1000\n\n"
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        try:
+            changes = change_feed.read(since, limit, wait=min(SSE_HEARTBEAT, remaining), epoch=epoch)
+        except CursorExpired:
+            yield f"event: resync\ndata: {app.json.dumps({'seq': change_feed.seq})}\n\n"
+            return
+        if not changes:
+            yield ": keep-alive\n\n"
+            continue
+        for change in changes:
+            yield f"id: {change['seq']}\nevent: change\ndata: {product_fragments.dumps(change)}\n\n"
+        since = changes[-1]["seq"]
+
+
+@app.route("/products/changes", methods=["GET"])
+def get_changes():
+    # Everything that changed after ?since=<seq> (from X-Change-Seq, or the last next_since).
+    #   ?wait=N      long poll: block up to N seconds until there is a change
+    #   ?stream=sse  (or Accept: text/event-stream) keep the connection open as an SSE stream
+    #   ?epoch=      the X-Change-Epoch you started from; a restart then means resync
+    # A cursor that fell off the buffer gets a 410 with "resync": true.
+    try:
+        since = _int_arg("since")
+        if request.headers.get("Last-Event-ID"):
+            since = int(request.headers["Last-Event-ID"])
+        limit = _int_arg("limit", MAX_PAGE_SIZE)
+        wait = _float_arg("wait") or 0.0
+        duration = _float_arg("duration") or SSE_MAX_DURATION
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers, wait and duration numbers"}), 400
+
+    if since is None:
+        return jsonify({"error": "since is required (start from the X-Change-Seq header of GET /products)"}), 400
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+    if wait < 0 or wait > MAX_CHANGES_WAIT:
+        return jsonify({"error": f"wait must be between 0 and {MAX_CHANGES_WAIT} seconds"}), 400
+    if duration <= 0 or duration > SSE_MAX_DURATION:
+        return jsonify({"error": f"duration must be between 0 and {SSE_MAX_DURATION} seconds"}), 400
+
+    epoch = request.args.get("epoch")
+    sse = request.args.get("stream") == "sse" or request.accept_mimetypes.best == "text/event-stream"
+    try:
+        changes = change_feed.read(since, limit, wait=0 if sse else wait, epoch=epoch)
+    except CursorExpired:
+        return _resync_response()
+
+    if sse:
+        # Validated above, so a bad cursor is a plain 410 instead of a stream that ends at once
+        resp = Response(_sse_changes(since, change_feed.epoch, limit, duration), mimetype="text/event-stream")
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
+    next_since = changes[-1]["seq"] if changes else since
+    return jsonify({
+        "changes": changes,
+        "epoch": change_feed.epoch,
+        "next_since": next_since,
+        "more": next_since < change_feed.seq,
+    }), 200
+
+
+@app.route("/products/stats", methods=["GET"])
+def get_product_stats():
+    # Dashboard numbers from running totals and the stock index; nothing here scans products.
+    # ?top=N limits the category breakdown (default 20, 0 = all).
+    try:
+        top = _int_arg("top", 20)
+        threshold = _float_arg("threshold")
+    except ValueError:
+        return jsonify({"error": "top must be an integer and threshold a number"}), 400
+    if top < 0:
+        return jsonify({"error": "top must be 0 or more"}), 400
+    if threshold is None:
+        threshold = LOW_STOCK_THRESHOLD
+
+    def build():
+        stats = inventory_stats.snapshot(top or None)
+        stats["low_stock_threshold"] = threshold
+        stats["low_stock"] = field_indexes["stock"].count(None, threshold)
+        return jsonify(stats).get_data()
+
+    return _conditional_json(versions.collection_etag(), versions.collection_modified, build)
+
+
+@app.route("/products/low-stock", methods=["GET"])
+def get_low_stock():
+    # Products with stock <= threshold, lowest first, straight from the stock index
+    try:
+        threshold = _float_arg("threshold")
+        limit = _int_arg("limit", DEFAULT_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "threshold must be a number and limit an integer"}), 400
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+    if threshold is None:
+        threshold = LOW_STOCK_THRESHOLD
+
+    def build():
+        since = product_fragments.mark()
+        items, total = find_products(store, field_indexes, ranges={"stock": (None, threshold)}, sort="stock", limit=limit)
+        return (
+            b'{"items":' + product_fragments.join(items, since)
+            + b',"threshold":' + app.json.dumps(threshold).encode() + b',"total":' + str(total).encode() + b"}\n"
+        )
+
+    return _conditional_json(versions.collection_etag(), versions.collection_modified, build)
+
+
 @app.route("/products/<int:product_id>/enrich", methods=["PATCH"])
 def enrich_product(product_id):
     # Enrich = take an existing inventory item and fill its details via OpenFoodFacts
-    product = next((p for p in products if p["id"] == product_id), None)
+    product = store.get(product_id)
 
     if product is None:
         return jsonify({"error": "Product not found"}), 404
@@ -144,20 +877,70 @@ def enrich_product(product_id):
         # If the product doesn't have a barcode, we can't enrich it
         return jsonify({"error": "Barcode required to enrich product"}), 400
 
-    # Pull external product details (wrap in try so we can return a proper 502)
+    # Pull external product details (wrap in try so we can return a proper 502/503)
     try:
-        details = fetch_by_barcode(barcode)
-    except Exception:
-        return jsonify({"error": "External API request failed"}), 502
+        with deadline(OFF_REQUEST_BUDGET):
+            details = fetch_by_barcode(barcode)
+    except Exception as e:
+        return _upstream_error(e)
 
     if details is None:
         return jsonify({"error": "External product not found"}), 404
 
     # Store the clean subset in our inventory item
-    product["details"] = details
+    product = store.update(product_id, {"details": stamp_fetched(details)})
     return jsonify(product), 200
 
 
+@app.route("/products/enrich", methods=["POST"])
+def start_enrichment_job():
+    # Bulk enrich: either an explicit {"ids": [...]} list or {"missing": true} for every
+    # barcoded product that doesn't have details yet. Returns a job id right away (202).
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+
+    if "ids" in data:
+        ids = data["ids"]
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return jsonify({"error": "ids must be a list of integers"}), 400
+    elif data.get("missing"):
+        ids = [p["id"] for p in store.iter_products() if p.get("barcode") and not p.get("details")]
+    else:
+        return jsonify({"error": "Provide ids or missing: true"}), 400
+
+    # Look fetch_by_barcode up at call time so it can be swapped out (tests mock it)
+    job = enrichment_jobs.start(store, ids, fetch=lambda barcode: stamp_fetched(fetch_by_barcode(barcode)))
+
+    resp = jsonify(job.to_dict())
+    resp.headers["Location"] = f"/products/enrich/{job.id}"
+    return resp, 202
+
+
+@app.route("/products/enrich/<job_id>", methods=["GET"])
+def get_enrichment_job(job_id):
+    job = enrichment_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    # Per-product outcomes can be long, so they're opt-in
+    include_results = request.args.get("results") in ("1", "true")
+    return jsonify(job.to_dict(include_results=include_results)), 200
+
+
+@app.route("/products/refresh", methods=["GET"])
+def get_refresh_status():
+    # Background details refresher: config, stale count, the run in progress and the last one
+    return jsonify(details_refresher.status()), 200
+
+
+@app.route("/products/refresh", methods=["POST"])
+def trigger_refresh():
+    # Runs a batch now rather than at the next interval; poll GET for progress
+    details_refresher.trigger()
+    return jsonify(details_refresher.status()), 202
+
+
 if __name__ == "__main__":
     # Local dev run (production would use gunicorn/etc)
     app.run()
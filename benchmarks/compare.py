@@ -0,0 +1,57 @@
+import argparse
+import json
+
+# Compare two result files from the same suite, e.g. before/after a change:
+#   python -m benchmarks.compare benchmarks/results/routes-abc123-*.json benchmarks/results/routes-def456-*.json
+# Lower is better for latencies, higher is better for rps. With --fail-over PCT the exit code
+# is 1 when anything got worse by more than PCT percent (handy in CI).
+
+METRICS = [("rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False)]
+
+
+def compare(old: dict, new: dict) -> list[dict]:
+    rows = []
+    for name, new_stats in new["results"].items():
+        old_stats = old["results"].get(name)
+        if old_stats is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            before, after = old_stats.get(metric), new_stats.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            # Positive "worse" means a regression, whichever direction is good for the metric
+            worse = -change if higher_is_better else change
+            rows.append({"benchmark": name, "metric": metric, "before": before, "after": after,
+                         "change_pct": round(change, 1), "worse_pct": round(worse, 1)})
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--fail-over", type=float, help="Exit 1 if any metric regressed by more than this percent")
+    args = parser.parse_args(argv)
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    print(f"{'benchmark':<32} {'metric':<8} {'before':>10} {'after':>10} {'change':>8}")
+    regressions = 0
+    for row in compare(old, new):
+        flag = ""
+        if args.fail_over is not None and row["worse_pct"] > args.fail_over:
+            flag = "  <-- regression"
+            regressions += 1
+        print(f"{row['benchmark']:<32} {row['metric']:<8} {row['before']:>10} {row['after']:>10} "
+              f"{row['change_pct']:>7}%{flag}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
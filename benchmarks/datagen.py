@@ -0,0 +1,84 @@
+import argparse
+import json
+import random
+import sys
+from typing import Iterator
+
+# Word lists for plausible-looking product names (so search/sort benchmarks see realistic
+# token distributions instead of "product 1", "product 2", ...)
+ADJECTIVES = [
+    "Organic", "Whole", "Low Fat", "Smoked", "Crunchy", "Spicy", "Sweet", "Salted", "Fresh",
+    "Frozen", "Roasted", "Classic", "Dark", "Greek", "Wild", "Honey", "Vanilla", "Garlic",
+]
+NOUNS = [
+    "Milk", "Bananas", "Peanut Butter", "Bread", "Yogurt", "Cheddar", "Coffee", "Tea", "Pasta",
+    "Rice", "Almonds", "Chocolate", "Salmon", "Chicken", "Oats", "Apples", "Salsa", "Crackers",
+    "Granola", "Butter", "Eggs", "Tofu", "Hummus", "Olive Oil", "Ketchup", "Cereal", "Juice",
+]
+BRANDS = ["Acme", "Farmhouse", "Green Valley", "Sunrise", "Northern", "Blue Hill", "Maple Co"]
+CATEGORIES = ["dairies", "snacks", "beverages", "breakfasts", "spreads", "frozen-foods", "cereals"]
+
+
+def generate_products(
+    n: int,
+    seed: int = 0,
+    barcode_ratio: float = 0.8,
+    details_ratio: float = 0.3,
+    unique_names: bool = False,
+) -> Iterator[dict]:
+    # Deterministic for a given seed, so two runs (or two commits) benchmark the same data.
+    # Rows are generated lazily, so 1M products never need to sit in a list here.
+    # Names repeat a lot by default (like real shelves: many "Whole Milk"s in different sizes);
+    # unique_names=True gives every product its own name string, the worst case for interning.
+    rng = random.Random(seed)
+    for product_id in range(1, n + 1):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+        if unique_names:
+            name = f"{name} #{product_id}"
+        product = {
+            "id": product_id,
+            "name": name,
+            # 13 digit EAN-ish barcodes, unique per product
+            "barcode": f"{400000000000 + product_id:013d}" if rng.random() < barcode_ratio else None,
+            "price": round(rng.uniform(0.25, 25), 2),
+            "stock": rng.randint(0, 500),
+            "details": {},
+        }
+        if rng.random() < details_ratio:
+            product["details"] = {
+                "product_name": name,
+                "brands": rng.choice(BRANDS),
+                "ingredients_text": ", ".join(rng.sample(NOUNS, 3)).lower(),
+                "image_url": None,
+                "quantity": f"{rng.choice([250, 500, 750, 1000])} g",
+                "categories_tags": [f"en:{rng.choice(CATEGORIES)}"],
+            }
+        yield product
+
+
+def seed_store(store, n: int, seed: int = 0) -> None:
+    # Replace whatever the store holds with n generated products
+    store.load(generate_products(n, seed))
+
+
+def main(argv=None) -> int:
+    # python -m benchmarks.datagen 100000 products.ndjson
+    # The output can be loaded into a running server with `python cli.py import products.ndjson`.
+    parser = argparse.ArgumentParser(description="Generate N fake products as NDJSON")
+    parser.add_argument("count", type=int)
+    parser.add_argument("output", nargs="?", help="Output file (default: stdout)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for product in generate_products(args.count, args.seed):
+            out.write(json.dumps(product) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeOFFHandler(BaseHTTPRequestHandler):
+    # Answers the two OFF endpoints we use, after sleeping `latency` seconds:
+    #   /api/v2/product/<barcode> -> a product for every barcode not ending in 0, 404 otherwise
+    #   /cgi/search.pl            -> a handful of candidates built from the search terms
+    # Settings live on the server object (server.latency, server.error_rate).
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle + delayed ACKs add ~40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        with server.lock:
+            server.request_count += 1
+            fail = server.error_rate and (server.request_count % round(1 / server.error_rate) == 0)
+        if fail:
+            self._send(503, {"status": 0})
+            return
+
+        url = urlparse(self.path)
+        if url.path.startswith("/api/v2/product/"):
+            barcode = url.path.rsplit("/", 1)[-1]
+            if barcode.endswith("0"):
+                self._send(404, {"status": 0, "status_verbose": "product not found"})
+            else:
+                self._send(200, {"status": 1, "product": _fake_product(f"Product {barcode}")})
+        elif url.path == "/cgi/search.pl":
+            terms = (parse_qs(url.query).get("search_terms") or [""])[0]
+            products = [_fake_product(f"{terms} {suffix}".strip()) for suffix in ("", "original", "light", "family pack")]
+            self._send(200, {"count": len(products), "products": products})
+        else:
+            self._send(404, {"status": 0})
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _fake_product(name: str) -> dict:
+    return {
+        "product_name": name,
+        "brands": "Benchmark Foods",
+        "ingredients_text": "sugar, salt, water",
+        "image_url": None,
+        "quantity": "500 g",
+        "categories_tags": ["en:snacks"],
+    }
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, error_rate: float = 0.0):
+    # Start the stand-in in a background thread. Returns (server, base_url); point a client at
+    # f"{base_url}/api/v2" and f"{base_url}/cgi/search.pl", or the app via OFF_BASE_URL /
+    # OFF_SEARCH_URL.
+    server = ThreadingHTTPServer((host, port), FakeOFFHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.request_count = 0
+    server.lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), name="fake-off", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None) -> int:
+    # python -m benchmarks.fake_off --port 8081 --latency 0.2
+    parser = argparse.ArgumentParser(description="Local OpenFoodFacts stand-in with configurable latency")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds to wait before every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args(argv)
+
+    server, url = start_server(args.host, args.port, args.latency, args.error_rate)
+    print(f"Fake OpenFoodFacts on {url} (latency {args.latency}s). Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
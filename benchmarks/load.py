@@ -0,0 +1,168 @@
+import argparse
+import os
+import random
+import threading
+import time
+
+import requests
+
+from benchmarks.common import print_table, summarize, write_results
+from benchmarks.datagen import NOUNS, seed_store
+from benchmarks.fake_off import start_server
+
+# Multi-threaded load generator against a real HTTP server.
+#
+# Against a server you started yourself:
+#   python -m benchmarks.load --url http://127.0.0.1:5000 --threads 32 --duration 30 --products 10000
+# Or let it start the app in-process on a threaded Werkzeug server (plus the OFF stand-in):
+#   python -m benchmarks.load --serve --products 100000 --threads 16
+#
+# Every worker thread has its own keep-alive session and picks requests from a weighted mix,
+# so the numbers reflect a realistic read-heavy workload rather than one hot route.
+
+# name -> weight. Reads dominate, like a store where scanners mostly look things up.
+DEFAULT_MIX = {
+    "get_product": 50,
+    "list_page": 15,
+    "local_search": 15,
+    "update": 10,
+    "create": 5,
+    "off_barcode": 5,
+}
+
+
+def _make_request(name: str, rng: random.Random, count: int) -> tuple[str, str, dict | None]:
+    # Returns (method, path, json body)
+    if name == "get_product":
+        return "GET", f"/products/{rng.randint(1, count)}", None
+    if name == "list_page":
+        return "GET", f"/products?limit=100&after={rng.randint(0, max(count - 100, 0))}", None
+    if name == "local_search":
+        return "GET", f"/products/local-search?q={rng.choice(NOUNS).split()[0]}", None
+    if name == "update":
+        return "PATCH", f"/products/{rng.randint(1, count)}", {"stock": rng.randint(0, 500)}
+    if name == "create":
+        return "POST", "/products", {"name": f"Load {rng.choice(NOUNS)}", "price": 2.0, "stock": 1}
+    if name == "off_barcode":
+        # Unique barcodes so the app's OFF cache doesn't hide upstream latency
+        return "GET", f"/products/search?barcode={rng.randint(10**12, 10**13 - 1)}", None
+    if name == "health":
+        return "GET", "/health", None
+    raise ValueError(f"Unknown request type: {name}")
+
+
+def _parse_mix(text: str | None) -> dict:
+    # "get_product=80,update=20"
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def run_load(base_url: str, threads: int, duration: float, count: int, mix: dict, seed: int = 0) -> dict:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    deadline = time.perf_counter() + duration
+
+    # Each worker appends to its own lists, so there's no shared-state locking on the hot path
+    per_thread = [{name: ([], [0]) for name in names} for _ in range(threads)]
+
+    def worker(index: int) -> None:
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        samples = per_thread[index]
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, path, body = _make_request(name, rng, count)
+            latencies, errors = samples[name]
+            t0 = time.perf_counter()
+            try:
+                resp = session.request(method, base_url + path, json=body, timeout=30)
+                failed = resp.status_code >= 400 and resp.status_code != 404
+            except requests.RequestException:
+                failed = True
+            latencies.append(time.perf_counter() - t0)
+            errors[0] += failed
+        session.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    all_latencies = []
+    all_errors = 0
+    for name in names:
+        latencies = [latency for samples in per_thread for latency in samples[name][0]]
+        errors = sum(samples[name][1][0] for samples in per_thread)
+        results[name] = summarize(latencies, elapsed, errors)
+        all_latencies.extend(latencies)
+        all_errors += errors
+    results["total"] = summarize(all_latencies, elapsed, all_errors)
+    return results
+
+
+def _serve_in_process(args) -> tuple[str, list]:
+    # Start the stand-in OFF server and the app on a threaded Werkzeug server, both on
+    # random free ports. Returns the app's base URL and the servers to shut down afterwards.
+    import logging
+
+    from werkzeug.serving import make_server
+
+    # Per-request access logging would be most of what we measure
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    off_server, off_url = start_server(latency=args.off_latency)
+    os.environ["OFF_BASE_URL"] = f"{off_url}/api/v2"
+    os.environ["OFF_SEARCH_URL"] = f"{off_url}/cgi/search.pl"
+    os.environ.setdefault("STORE_BACKEND", args.backend)
+
+    import app as app_module
+
+    seed_store(app_module.store, args.products, args.seed)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", [server, off_server]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Threaded HTTP load generator for the inventory API")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="API base URL (ignored with --serve)")
+    parser.add_argument("--serve", action="store_true", help="Start the app in-process instead of using --url")
+    parser.add_argument("--backend", choices=["memory", "compact", "sqlite"], default="memory", help="With --serve")
+    parser.add_argument("--off-latency", type=float, default=0.05, help="With --serve: stand-in OFF latency")
+    parser.add_argument("--products", type=int, default=10_000,
+                        help="Product count (seeded with --serve; otherwise the id range to request)")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds (default 10)")
+    parser.add_argument("--mix", help="Weighted request mix, e.g. get_product=80,update=20")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    servers = []
+    base_url = args.url.rstrip("/")
+    if args.serve:
+        base_url, servers = _serve_in_process(args)
+
+    try:
+        results = run_load(base_url, args.threads, args.duration, args.products, _parse_mix(args.mix), args.seed)
+    finally:
+        for server in servers:
+            server.shutdown()
+
+    print_table(results)
+    params = {key: value for key, value in vars(args).items() if key != "output"}
+    print(f"Saved {write_results('load', params, results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
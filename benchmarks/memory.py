@@ -0,0 +1,98 @@
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from benchmarks.common import write_results
+from benchmarks.datagen import generate_products
+from fragments import FragmentCache
+from store import ProductStore
+from storage.compact import CompactBackend
+from storage.memory import MemoryBackend
+
+# Memory per product and full-table scan speed for the in-memory backends.
+#
+#   python -m benchmarks.memory --products 1000000
+#   python -m benchmarks.memory --products 1000000 --unique-names
+#
+# Memory is what tracemalloc sees allocated by loading the store (rows are generated on the
+# fly, so the generator itself doesn't count). Scans are timed on the loaded store, plus the
+# full list body GET /products builds from warm cached fragments.
+
+BACKENDS = {"memory": MemoryBackend, "compact": CompactBackend}
+
+
+def _timed(fn, repeat: int = 3) -> tuple[float, object]:
+    # Fastest of a few runs, so one unlucky garbage collection doesn't decide the number
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 4), result
+
+
+def measure(kind: str, count: int, seed: int, unique_names: bool) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = ProductStore(backend=BACKENDS[kind]())
+    store.load(generate_products(count, seed, unique_names=unique_names))
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    results = {
+        "products": len(store),
+        "bytes": used,
+        "bytes_per_product": round(used / count, 1),
+        "size_bytes_estimate": store.size_bytes(),
+    }
+
+    # Full-table scans: one column (what aggregates/filters need), whole rows, and full JSON
+    results["scan_stock_sum_s"], total = _timed(lambda: sum(store.column("stock")))
+    results["scan_rows_s"], _ = _timed(lambda: sum(p["stock"] for p in store.iter_products()))
+    results["scan_json_s"], _ = _timed(lambda: sum(len(json.dumps(p)) for p in store.iter_products()))
+    results["stock_total"] = total
+
+    fragments = FragmentCache(json.dumps)
+    store.subscribe(fragments.on_change, replay=False)
+    body = fragments.join(store.iter_products(), fragments.mark())
+    results["list_json_warm_s"], warm = _timed(lambda: fragments.join_ids(store.column("id"), store.get, fragments.mark()))
+    assert warm == body
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-product memory and scan speed of the in-memory backends")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--backends", default="memory,compact")
+    parser.add_argument("--unique-names", action="store_true", help="Give every product its own name")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for kind in args.backends.split(","):
+        results[kind] = measure(kind, args.products, args.seed, args.unique_names)
+        stats = results[kind]
+        print(
+            f"{kind:<8} {stats['bytes_per_product']:>8} B/product  "
+            f"column scan {stats['scan_stock_sum_s']}s  row scan {stats['scan_rows_s']}s  json {stats['scan_json_s']}s  "
+            f"list (cached) {stats['list_json_warm_s']}s"
+        )
+
+    if "memory" in results and "compact" in results:
+        ratio = results["memory"]["bytes"] / results["compact"]["bytes"]
+        results["memory_ratio"] = round(ratio, 2)
+        print(f"compact uses {ratio:.2f}x less memory than memory")
+
+    params = {key: value for key, value in vars(args).items() if key != "output"}
+    print(f"Saved {write_results('memory', params, results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
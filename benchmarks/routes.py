@@ -0,0 +1,131 @@
+import argparse
+import os
+import random
+import time
+
+from benchmarks.common import print_table, summarize, write_results
+from benchmarks.datagen import NOUNS, seed_store
+from benchmarks.fake_off import start_server
+
+# Micro-benchmarks for every route, run in-process through app.test_client(). No sockets
+# or server threads involved, so this measures what our own code costs per request.
+#
+#   python -m benchmarks.routes --products 100000
+#   python -m benchmarks.routes --products 1000 --backend sqlite --only get_product,update
+#
+# Each benchmark runs for about --seconds (at least --min-iterations times).
+
+
+def _benchmarks(app_module, rng: random.Random, count: int) -> tuple[dict, list[int]]:
+    # name -> (method, make_request) where make_request() returns (path, json body, headers)
+    created: list[int] = []
+
+    def random_id() -> int:
+        return rng.randint(1, count)
+
+    client = app_module.app.test_client()
+    etag_path = f"/products/{random_id()}"
+    etag = client.get(etag_path).headers.get("ETag")
+
+    def create():
+        return "/products", {"name": f"Bench {rng.choice(NOUNS)}", "price": 1.5, "stock": 3}, None
+
+    def delete():
+        # Delete products the create benchmark made, so the seeded data stays intact
+        product_id = created.pop() if created else random_id()
+        return f"/products/{product_id}", None, None
+
+    return {
+        "health": ("GET", lambda: ("/health", None, None)),
+        "get_product": ("GET", lambda: (f"/products/{random_id()}", None, None)),
+        "get_product_304": ("GET", lambda: (etag_path, None, {"If-None-Match": etag})),
+        "list_page": ("GET", lambda: (f"/products?limit=100&after={rng.randint(0, max(count - 100, 0))}", None, None)),
+        "list_all": ("GET", lambda: ("/products", None, None)),
+        "stream_ndjson": ("GET", lambda: ("/products?stream=ndjson", None, None)),
+        # Random bounds so the response cache can't answer these
+        "filter_low_stock": ("GET", lambda: (f"/products?stock_max={rng.randint(0, 9)}&price_max={rng.uniform(5, 25):.2f}&fields=id,stock", None, None)),
+        "filter_price_range": (
+            "GET", lambda: (f"/products?price_min={rng.randint(1, 20)}&price_max=25&sort=-price&limit=100", None, None)
+        ),
+        "stats": ("GET", lambda: (f"/products/stats?threshold={rng.randint(0, 500)}", None, None)),
+        "low_stock": ("GET", lambda: (f"/products/low-stock?threshold={rng.randint(0, 20)}&limit=50", None, None)),
+        "bulk_get": ("GET", lambda: ("/products/bulk?ids=" + ",".join(str(random_id()) for _ in range(50)), None, None)),
+        "local_search": ("GET", lambda: (f"/products/local-search?q={rng.choice(NOUNS).split()[0]}", None, None)),
+        "create": ("POST", create),
+        "update": ("PATCH", lambda: (f"/products/{random_id()}", {"stock": rng.randint(0, 500)}, None)),
+        "delete": ("DELETE", delete),
+        # Unique barcodes so every lookup misses the cache and goes to the stand-in OFF server
+        "off_barcode": ("GET", lambda: (f"/products/search?barcode={rng.randint(10**12, 10**13 - 1)}", None, None)),
+        "off_name": ("GET", lambda: (f"/products/search?name={rng.choice(NOUNS)}%20{rng.random()}&limit=5", None, None)),
+    }, created
+
+
+def run(args) -> dict:
+    os.environ.setdefault("STORE_BACKEND", args.backend)
+    if args.backend == "sqlite":
+        os.environ.setdefault("STORE_PATH", args.store_path)
+
+    # The stand-in OFF server has to be up (and the env set) before the app builds its client
+    off_server, off_url = start_server(latency=args.off_latency)
+    os.environ["OFF_BASE_URL"] = f"{off_url}/api/v2"
+    os.environ["OFF_SEARCH_URL"] = f"{off_url}/cgi/search.pl"
+
+    import app as app_module
+
+    start = time.perf_counter()
+    seed_store(app_module.store, args.products, args.seed)
+    print(f"Seeded {args.products} products in {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(args.seed)
+    benchmarks, created = _benchmarks(app_module, rng, args.products)
+    if args.only:
+        wanted = args.only.split(",")
+        benchmarks = {name: benchmarks[name] for name in wanted}
+
+    client = app_module.app.test_client()
+    results = {}
+    for name, (method, make_request) in benchmarks.items():
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        while len(latencies) < args.min_iterations or time.perf_counter() - started < args.seconds:
+            path, body, headers = make_request()
+            t0 = time.perf_counter()
+            resp = client.open(path, method=method, json=body, headers=headers)
+            # Reading the body matters for streaming routes, which only do their work here
+            resp.get_data()
+            latencies.append(time.perf_counter() - t0)
+
+            # 404 is a legitimate answer here (the OFF stand-in has products it "doesn't know")
+            if resp.status_code >= 400 and resp.status_code != 404:
+                errors += 1
+            elif name == "create":
+                created.append(resp.get_json()["id"])
+        results[name] = summarize(latencies, time.perf_counter() - started, errors)
+
+    off_server.shutdown()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-route micro-benchmarks through the Flask test client")
+    parser.add_argument("--products", type=int, default=10_000, help="How many products to seed (default 10000)")
+    parser.add_argument("--backend", choices=["memory", "compact", "sqlite"], default="memory")
+    parser.add_argument("--store-path", default="bench-inventory.db", help="SQLite file for --backend sqlite")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time budget per benchmark (default 1)")
+    parser.add_argument("--min-iterations", type=int, default=5)
+    parser.add_argument("--off-latency", type=float, default=0.0, help="Stand-in OFF latency in seconds")
+    parser.add_argument("--only", help="Comma separated benchmark names")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print_table(results)
+    params = {key: value for key, value in vars(args).items() if key != "output"}
+    print(f"Saved {write_results('routes', params, results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,84 @@
+import argparse
+import time
+
+from benchmarks.common import print_table, summarize, write_results
+from benchmarks.datagen import generate_products
+from fragments import FragmentCache
+from store import ProductStore
+
+# List response serialization: jsonify on every request vs joining cached per-product
+# fragments (what GET /products does now).
+#
+#   python -m benchmarks.serialize --products 100000
+#
+# Timed directly rather than through the routes, since the URL-level response cache would
+# otherwise hide repeated list requests. "fragments_cold" starts from an empty cache every
+# time (the cost after every product changed); "fragments_warm" is the usual case.
+
+
+def _repeat(fn, seconds: float, min_iterations: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < min_iterations or time.perf_counter() - started < seconds:
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run(args) -> dict:
+    import app as app_module
+
+    flask_app = app_module.app
+    store = ProductStore(generate_products(args.products, args.seed))
+
+    # The app's own encoder, so both sides produce identical bytes
+    dumps = app_module.product_fragments.dumps
+
+    warm = FragmentCache(dumps)
+    store.subscribe(warm.on_change, replay=False)
+    warm.join(store.iter_products(), warm.mark())
+
+    def cold():
+        cache = FragmentCache(dumps)
+        return cache.join(store.iter_products(), cache.mark())
+
+    benchmarks = {
+        "jsonify_all": lambda: flask_app.json.response(store.all()).get_data(),
+        "fragments_cold_all": cold,
+        "fragments_warm_all": lambda: warm.join(store.iter_products(), warm.mark()),
+        "jsonify_page_100": lambda: flask_app.json.response(store.page(limit=100)[0]).get_data(),
+        "fragments_warm_page_100": lambda: warm.join(store.page(limit=100)[0], warm.mark()),
+    }
+
+    results = {}
+    with flask_app.app_context():
+        # Both ways must produce the same bytes, or the comparison means nothing
+        assert benchmarks["jsonify_all"]() == benchmarks["fragments_warm_all"]() + b"\n"
+        for name, fn in benchmarks.items():
+            results[name] = _repeat(fn, args.seconds, args.min_iterations)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="jsonify vs cached JSON fragments for product lists")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Time budget per benchmark (default 2)")
+    parser.add_argument("--min-iterations", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print_table(results)
+    speedup = results["jsonify_all"]["mean_ms"] / max(results["fragments_warm_all"]["mean_ms"], 1e-9)
+    results["warm_all_speedup"] = round(speedup, 1)
+    print(f"Cached fragments build the full list {speedup:.1f}x faster than jsonify")
+
+    params = {key: value for key, value in vars(args).items() if key != "output"}
+    print(f"Saved {write_results('serialize', params, results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,101 @@
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import print_table, summarize, write_results
+from benchmarks.datagen import seed_store
+
+# CLI startup cost, and what batch mode saves on scripted work.
+#
+#   python -m benchmarks.startup --runs 20 --commands 200
+#
+# - help / import_requests: one fresh interpreter per run (`cli.py --help` vs just importing
+#   requests, which `--help` no longer does)
+# - update_per_process: `cli.py update N --stock K` as one process per command, the old way
+#   to script a stock-take
+# - update_batch / update_batch_concurrent: the same commands through one `cli.py batch`
+#   (latency per command = total time / commands)
+# The updates go to the app served in-process on a threaded Werkzeug server.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT, "cli.py")
+
+
+def _run(argv: list[str], stdin: str | None = None) -> float:
+    started = time.perf_counter()
+    subprocess.run(argv, input=stdin, text=True, capture_output=True, check=True, cwd=ROOT)
+    return time.perf_counter() - started
+
+
+def _serve(products: int) -> tuple[str, object]:
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    import app as app_module
+
+    seed_store(app_module.store, products)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def run(args) -> dict:
+    python = sys.executable
+    results = {}
+
+    for name, argv in [
+        ("help", [python, CLI, "--help"]),
+        ("import_requests", [python, "-c", "import requests"]),
+    ]:
+        started = time.perf_counter()
+        latencies = [_run(argv) for _ in range(args.runs)]
+        results[name] = summarize(latencies, time.perf_counter() - started)
+
+    base_url, server = _serve(args.products)
+    try:
+        commands = [f"update {i % args.products + 1} --stock {i % 50}" for i in range(args.commands)]
+
+        # One process per command; fewer of them, since each one costs a whole interpreter
+        started = time.perf_counter()
+        latencies = [
+            _run([python, CLI, "--base-url", base_url, *command.split()]) for command in commands[:args.runs]
+        ]
+        results["update_per_process"] = summarize(latencies, time.perf_counter() - started)
+
+        for name, concurrency in [("update_batch", 1), ("update_batch_concurrent", args.concurrency)]:
+            elapsed = _run(
+                [python, CLI, "--base-url", base_url, "batch", "--concurrency", str(concurrency)],
+                stdin="\n".join(commands) + "\n",
+            )
+            results[name] = summarize([elapsed / len(commands)] * len(commands), elapsed)
+    finally:
+        server.shutdown()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="CLI startup time and per-process vs batch command cost")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh processes per measurement (default 10)")
+    parser.add_argument("--commands", type=int, default=200, help="Update commands per batch run (default 200)")
+    parser.add_argument("--concurrency", type=int, default=8, help="For update_batch_concurrent (default 8)")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print_table(results)
+    speedup = results["update_per_process"]["mean_ms"] / max(results["update_batch"]["mean_ms"], 1e-9)
+    results["batch_speedup"] = round(speedup, 1)
+    print(f"batch runs an update {speedup:.1f}x faster than one process per command")
+
+    params = {key: value for key, value in vars(args).items() if key != "output"}
+    print(f"Saved {write_results('startup', params, results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+import threading
+import time
+import uuid
+
+
+class CursorExpired(Exception):
+    # The requested position is no longer (or was never) in the buffer: the client has to
+    # reload everything and continue from the current seq
+    pass
+
+
+class ChangeFeed:
+    # Every store change gets the next sequence number and goes into a fixed-size ring
+    # buffer, so clients can sync with "everything after seq N" instead of re-downloading the
+    # whole inventory. Kept current through ProductStore.subscribe().
+    #
+    # Entries are {"seq", "action": "add"|"update"|"delete", "id", "product"} where product is
+    # the product after the change (None for deletes). Product dicts are copy-on-write, so
+    # holding references to them is safe.
+    #
+    # A cursor is only good while its seq is still buffered and belongs to this process
+    # (epoch). A store reload ("clear") also invalidates every older cursor.
+
+    def __init__(self, size: int = 10_000):
+        self.size = size
+        self.epoch = uuid.uuid4().hex[:8]
+        self._ring: list[dict | None] = [None] * size
+        self._seq = 0
+        # Oldest seq a cursor may point at (changes after it are all still in the ring)
+        self._floor = 0
+        self._changed = threading.Condition()
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def on_change(self, action: str, old: dict | None, new: dict | None) -> None:
+        # Store listener
+        with self._changed:
+            if action == "clear":
+                # Takes a seq of its own, so even a cursor that was fully caught up has to resync
+                # (the feed can't tell it which products the reload dropped)
+                self._seq += 1
+                self._floor = self._seq
+            else:
+                self._seq += 1
+                product = new or old
+                self._ring[self._seq % self.size] = {
+                    "seq": self._seq,
+                    "action": action,
+                    "id": product["id"],
+                    "product": new,
+                }
+                self._floor = max(self._floor, self._seq - self.size)
+            self._changed.notify_all()
+
+    def read(self, since: int, limit: int = 1000, wait: float = 0.0, epoch: str | None = None) -> list[dict]:
+        # Changes with seq > since, oldest first. With wait > 0, blocks up to that many seconds
+        # until there is at least one. Raises CursorExpired if the client has to resync.
+        deadline = time.monotonic() + wait
+        with self._changed:
+            while True:
+                if (epoch is not None and epoch != self.epoch) or since < self._floor or since > self._seq:
+                    raise CursorExpired()
+                if since < self._seq:
+                    end = min(self._seq, since + limit)
+                    return [self._ring[seq % self.size] for seq in range(since + 1, end + 1)]
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._changed.wait(remaining)
@@ -1,30 +1,164 @@
+from __future__ import annotations
+
 import argparse
+import csv
 import json
 import os
+import shlex
 import sys
-from typing import Any
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+from urllib.parse import quote
 
-import requests
+# requests (and our session setup on top of it) is most of the startup time, so it's only
+# imported once a command actually talks to the API. --help and argument errors skip it.
+if TYPE_CHECKING:
+    import requests
 
 
 # Default to local dev server, but allow overrides via env var or --base-url
 DEFAULT_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:5000")
 
+# One keep-alive session for the whole process, created on first use
+_session: requests.Session | None = None
+
+# Local cache of GET responses (url -> {"etag": ..., "payload": ...}) used for conditional
+# requests. Lives for the process; set API_CACHE_FILE to keep it between CLI runs too (it's
+# written once, when main() finishes). Least recently used entries go past CACHE_SIZE, and
+# pages (?limit=&after=) aren't cached at all: paging through a big inventory would fill it
+# with bodies nobody asks for twice. The plain list is, since `list` is what gets polled.
+CACHE_FILE = os.getenv("API_CACHE_FILE")
+CACHE_SIZE = int(os.getenv("API_CACHE_SIZE", "256"))
+_response_cache: dict | None = None
+_response_cache_dirty = False
+_response_cache_lock = threading.Lock()
+
+# Where command output goes. Normally printed; batch mode collects each command's output in
+# a per-thread list instead (see _collecting) and prompts use their defaults.
+_output = threading.local()
+
+
+class CliError(Exception):
+    # A command failed: main() prints "ERROR: <message>" and exits with `code`, batch mode
+    # reports it and moves on to the next command
+    def __init__(self, message: str, code: int = 1):
+        super().__init__(message)
+        self.code = code
+
 
 # ---------- helpers ----------
 def _print_json(data: Any) -> None:
     # Pretty-print JSON so CLI output is readable (and easy to grade)
+    results = getattr(_output, "results", None)
+    if results is not None:
+        results.append(data)
+        return
     print(json.dumps(data, indent=2, ensure_ascii=False))
 
 
+def _print_line(data: Any) -> None:
+    # One compact JSON document per line (NDJSON output)
+    results = getattr(_output, "results", None)
+    if results is not None:
+        results.append(data)
+        return
+    print(json.dumps(data, ensure_ascii=False))
+
+
+def _prompt(text: str) -> str:
+    # Interactive prompt for a missing value; batch mode can't ask, so it's left blank
+    if getattr(_output, "results", None) is not None:
+        return ""
+    return input(text).strip()
+
+
+def _get_session(pool_size: int = 10) -> requests.Session:
+    # Reusing one session means commands that make many calls (paging, bulk work, a whole
+    # batch file) only pay the connection handshake once
+    global _session
+    if _session is None:
+        from services.http import build_session
+
+        _session = build_session(pool_size=pool_size)
+    return _session
+
+
+def _get_response_cache() -> dict:
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = {}
+        if CACHE_FILE:
+            try:
+                with open(CACHE_FILE, encoding="utf-8") as f:
+                    _response_cache = json.load(f)
+            except (OSError, ValueError):
+                # No cache yet (or a corrupt one): start empty
+                pass
+    return _response_cache
+
+
+def _cached_response(url: str) -> dict | None:
+    # Locked because batch mode runs commands on several threads
+    with _response_cache_lock:
+        cache = _get_response_cache()
+        entry = cache.pop(url, None)
+        if entry is not None:
+            # Dicts keep insertion order, so re-inserting makes this the most recently used
+            cache[url] = entry
+        return entry
+
+
+def _remember_response(url: str, etag: str, payload: Any) -> None:
+    global _response_cache_dirty
+    if isinstance(payload, dict) and "next_after" in payload:
+        return
+    with _response_cache_lock:
+        cache = _get_response_cache()
+        cache.pop(url, None)
+        cache[url] = {"etag": etag, "payload": payload}
+        while len(cache) > CACHE_SIZE:
+            del cache[next(iter(cache))]
+        _response_cache_dirty = True
+
+
+def _save_response_cache() -> None:
+    # Write API_CACHE_FILE if anything changed (via a temp file, so a crash never leaves half a file)
+    global _response_cache_dirty
+    if not CACHE_FILE or not _response_cache_dirty:
+        return
+    with _response_cache_lock:
+        tmp = f"{CACHE_FILE}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(_response_cache, f)
+            os.replace(tmp, CACHE_FILE)
+        except OSError:
+            # Only a cache: the next run just revalidates less
+            pass
+        _response_cache_dirty = False
+
+
 def _request(method: str, url: str, *, json_body: dict | None = None, timeout: int = 8) -> Any:
     # One request function for all CLI commands so error handling stays consistent
+    import requests
+
+    kwargs = {"json": json_body, "timeout": timeout}
+
+    # If we've fetched this URL before, ask the server to skip the body when nothing changed
+    cached = _cached_response(url) if method == "GET" else None
+    if cached:
+        kwargs["headers"] = {"If-None-Match": cached["etag"]}
+
     try:
-        resp = requests.request(method, url, json=json_body, timeout=timeout)
+        resp = _get_session().request(method, url, **kwargs)
     except requests.RequestException as e:
         # Server down / wrong URL / network issue
-        print(f"ERROR: Could not reach API: {e}", file=sys.stderr)
-        raise SystemExit(2)
+        raise CliError(f"Could not reach API: {e}", 2)
+
+    # 304 Not Modified: our cached copy is still current
+    if resp.status_code == 304 and cached:
+        return cached["payload"]
 
     # Try to parse JSON, but don’t die if the server sends HTML or plain text
     payload = None
@@ -36,6 +170,9 @@ def _request(method: str, url: str, *, json_body: dict | None = None, timeout: i
 
     # Happy path: return whatever the API returned
     if 200 <= resp.status_code < 300:
+        etag = resp.headers.get("ETag")
+        if method == "GET" and etag:
+            _remember_response(url, etag, payload)
         return payload
 
     # Non-2xx: show a clean message (prefer {"error": "..."} if the API provided it)
@@ -44,8 +181,7 @@ def _request(method: str, url: str, *, json_body: dict | None = None, timeout: i
     else:
         msg = payload if payload else f"HTTP {resp.status_code}"
 
-    print(f"ERROR: {msg}", file=sys.stderr)
-    raise SystemExit(1)
+    raise CliError(str(msg))
 
 
 def _base_url(args) -> str:
@@ -55,8 +191,26 @@ def _base_url(args) -> str:
 
 # ---------- command handlers ----------
 def cmd_list(args) -> None:
-    data = _request("GET", f"{_base_url(args)}/products")
-    _print_json(data)
+    if not args.page_size:
+        data = _request("GET", f"{_base_url(args)}/products")
+        _print_json(data)
+        return
+
+    # Page through with the keyset cursor and print one product per line (NDJSON) as pages
+    # arrive, so huge inventories never have to sit in memory all at once
+    after = None
+    while True:
+        url = f"{_base_url(args)}/products?limit={args.page_size}"
+        if after is not None:
+            url += f"&after={after}"
+
+        page = _request("GET", url)
+        for item in page["items"]:
+            _print_line(item)
+
+        after = page["next_after"]
+        if after is None:
+            break
 
 
 def cmd_show(args) -> None:
@@ -66,24 +220,23 @@ def cmd_show(args) -> None:
 
 def cmd_add(args) -> None:
     # Allow fully-flagged add OR interactive prompts (nice for quick demos)
-    name = args.name or input("Name: ").strip()
+    name = args.name or _prompt("Name: ")
     if not name:
-        print("ERROR: name is required", file=sys.stderr)
-        raise SystemExit(1)
+        raise CliError("name is required")
 
     barcode = args.barcode
     if barcode is None:
-        raw = input("Barcode (optional): ").strip()
+        raw = _prompt("Barcode (optional): ")
         barcode = raw or None
 
     price = args.price
     if price is None:
-        raw = input("Price (default 0): ").strip()
+        raw = _prompt("Price (default 0): ")
         price = float(raw) if raw else 0.0
 
     stock = args.stock
     if stock is None:
-        raw = input("Stock (default 0): ").strip()
+        raw = _prompt("Stock (default 0): ")
         stock = int(raw) if raw else 0
 
     body = {
@@ -112,8 +265,7 @@ def cmd_update(args) -> None:
 
     # If they didn’t pass any update flags, don’t send an empty PATCH
     if not body:
-        print("ERROR: provide at least one field to update (--name/--barcode/--price/--stock)", file=sys.stderr)
-        raise SystemExit(1)
+        raise CliError("provide at least one field to update (--name/--barcode/--price/--stock)")
 
     data = _request("PATCH", f"{_base_url(args)}/products/{args.id}", json_body=body)
     _print_json(data)
@@ -127,25 +279,315 @@ def cmd_delete(args) -> None:
 def cmd_find(args) -> None:
     # Find is external lookup only (does not save to inventory unless you enrich a product)
     if bool(args.barcode) == bool(args.name):
-        print("ERROR: use exactly one of --barcode or --name", file=sys.stderr)
-        raise SystemExit(1)
+        raise CliError("use exactly one of --barcode or --name")
 
     if args.barcode:
         url = f"{_base_url(args)}/products/search?barcode={args.barcode}"
     else:
         # Encode name so spaces and special chars don’t break the query string
-        url = f"{_base_url(args)}/products/search?name={requests.utils.quote(args.name)}"
+        url = f"{_base_url(args)}/products/search?name={quote(args.name)}"
+        if args.limit:
+            # Ranked list of candidates instead of just the best match
+            url += f"&limit={args.limit}"
 
     data = _request("GET", url)
     _print_json(data)
 
 
+def cmd_search(args) -> None:
+    # Search is local-only (our own inventory), unlike find which goes out to OpenFoodFacts
+    query = quote(args.query)
+    data = _request("GET", f"{_base_url(args)}/products/local-search?q={query}&limit={args.limit}")
+    _print_json(data)
+
+
+def cmd_stats(args) -> None:
+    # Inventory totals plus the products running low, both answered from server-side totals
+    query = f"?threshold={args.threshold}" if args.threshold is not None else ""
+    stats = _request("GET", f"{_base_url(args)}/products/stats{query}")
+    low = _request("GET", f"{_base_url(args)}/products/low-stock{query}{'&' if query else '?'}limit={args.limit}")
+    stats["low_stock_items"] = [
+        {"id": item["id"], "name": item["name"], "stock": item["stock"]} for item in low["items"]
+    ]
+    _print_json(stats)
+
+
 def cmd_enrich(args) -> None:
+    if args.all:
+        _enrich_all(args)
+        return
+
+    if args.id is None:
+        raise CliError("provide a product id or --all")
+
     # Enrich hits the API endpoint that stores OFF details into an existing product
     data = _request("PATCH", f"{_base_url(args)}/products/{args.id}/enrich")
     _print_json(data)
 
 
+def _enrich_all(args) -> None:
+    # Start a server-side bulk job for every product missing details, then poll until it's done
+    job = _request("POST", f"{_base_url(args)}/products/enrich", json_body={"missing": True})
+    status_url = f"{_base_url(args)}/products/enrich/{job['job_id']}"
+
+    while job["status"] != "done":
+        time.sleep(args.poll_interval)
+        job = _request("GET", status_url)
+        # Progress goes to stderr so stdout stays clean JSON
+        print(f"enriching: {job['processed']}/{job['total']}", file=sys.stderr)
+
+    _print_json(job)
+
+
+# ---------- import / export ----------
+# Columns used for CSV files (details is a JSON-encoded blob in its own column)
+CSV_COLUMNS = ["id", "name", "barcode", "price", "stock", "details"]
+
+
+def _file_format(path: str, explicit: str | None) -> str:
+    if explicit:
+        return explicit
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def _read_products(path: str, fmt: str):
+    # Yield (line number, product dict or error string) one row at a time, so the file is
+    # never fully loaded into memory
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "ndjson":
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError:
+                    yield line_no, "invalid JSON"
+            return
+
+        # Line 1 is the header row
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                product = {"name": row.get("name") or None}
+                if row.get("barcode"):
+                    product["barcode"] = row["barcode"]
+                if row.get("price"):
+                    product["price"] = float(row["price"])
+                if row.get("stock"):
+                    product["stock"] = int(row["stock"])
+                if row.get("details"):
+                    product["details"] = json.loads(row["details"])
+            except ValueError as e:
+                yield line_no, f"bad value: {e}"
+                continue
+            if product["name"] is None:
+                del product["name"]
+            yield line_no, product
+
+
+def cmd_import(args) -> None:
+    # Send the file through POST /products/bulk in chunks; per-row problems go to stderr
+    fmt = _file_format(args.file, args.format)
+    url = f"{_base_url(args)}/products/bulk"
+    summary = {"created": 0, "failed": 0}
+
+    def send(chunk):
+        result = _request("POST", url, json_body={"products": [product for _, product in chunk]}, timeout=60)
+        summary["created"] += result["created"]
+        summary["failed"] += result["failed"]
+        for item in result["results"]:
+            if item["status"] != 201:
+                print(f"line {chunk[item['index']][0]}: {item['error']}", file=sys.stderr)
+
+    chunk = []
+    for line_no, product in _read_products(args.file, fmt):
+        if isinstance(product, str):
+            # Couldn't even parse the row, so don't bother the server with it
+            summary["failed"] += 1
+            print(f"line {line_no}: {product}", file=sys.stderr)
+            continue
+
+        # Ids come from the server; an exported id column is ignored on import
+        product.pop("id", None)
+        chunk.append((line_no, product))
+        if len(chunk) >= args.chunk_size:
+            send(chunk)
+            chunk = []
+    if chunk:
+        send(chunk)
+
+    _print_json(summary)
+
+
+def cmd_export(args) -> None:
+    # Stream GET /products?stream=ndjson straight into the file, one product at a time
+    fmt = _file_format(args.file, args.format)
+    url = f"{_base_url(args)}/products?stream=ndjson"
+
+    import requests
+
+    try:
+        resp = _get_session().get(url, stream=True, timeout=60)
+    except requests.RequestException as e:
+        raise CliError(f"Could not reach API: {e}", 2)
+
+    if resp.status_code != 200:
+        raise CliError(f"HTTP {resp.status_code}")
+
+    count = 0
+    with open(args.file, "w", encoding="utf-8", newline="") as f:
+        writer = None
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            if writer is None:
+                f.write(line + "\n")
+            else:
+                product = json.loads(line)
+                product["details"] = json.dumps(product.get("details") or {}, ensure_ascii=False)
+                writer.writerow(product)
+            count += 1
+
+    _print_json({"exported": count, "file": args.file})
+
+
+# ---------- batch / shell ----------
+def _parse_line(parser: argparse.ArgumentParser, line: str, base_url: str):
+    # One batch/shell line (same syntax as the command line) -> parsed args, or None for blank
+    # lines and # comments. The outer --base-url applies unless the line sets its own.
+    # Bad arguments make argparse print its usage error and raise SystemExit.
+    try:
+        argv = shlex.split(line, comments=True)
+    except ValueError as e:
+        # e.g. an unbalanced quote
+        raise CliError(f"invalid command: {e}", 2)
+    if not argv:
+        return None
+    if argv[0] != "--base-url":
+        argv = ["--base-url", base_url, *argv]
+    args = parser.parse_args(argv)
+    if args.command in ("batch", "shell"):
+        raise CliError(f"{args.command} can't be run from inside batch or shell")
+    return args
+
+
+def _run_collected(parser: argparse.ArgumentParser, line_no: int, line: str, base_url: str) -> dict | None:
+    # Run one batch line, capturing what the command would have printed
+    record = {"line": line_no, "command": line.strip()}
+    _output.results = results = []
+    try:
+        args = _parse_line(parser, line, base_url)
+        if args is None:
+            return None
+        args.func(args)
+    except CliError as e:
+        record.update(ok=False, error=str(e), exit_code=e.code)
+    except SystemExit as e:
+        record.update(ok=False, error="invalid command", exit_code=e.code)
+    except Exception as e:
+        # Anything else (a missing import file, a bad CSV...) fails this line, not the batch
+        record.update(ok=False, error=str(e) or type(e).__name__, exit_code=1)
+    else:
+        record.update(ok=True, result=results[0] if len(results) == 1 else results)
+    finally:
+        _output.results = None
+    return record
+
+
+def _run_concurrently(parser, lines, base_url: str, concurrency: int):
+    # Yield records in input order while up to `concurrency` commands run at once. Only a few
+    # lines per worker are read ahead, so huge batch files stream through.
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = deque()
+        for line_no, line in lines:
+            pending.append(pool.submit(_run_collected, parser, line_no, line, base_url))
+            if len(pending) >= concurrency * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def cmd_batch(args) -> None:
+    # Run many commands (one per line) in this one process over one keep-alive connection
+    # pool, instead of paying interpreter startup + a new connection per command. Prints one
+    # NDJSON record per command, in input order:
+    #   {"line": 1, "command": "update 5 --stock 2", "ok": true, "result": {...}}
+    #   {"line": 2, "command": "show 999", "ok": false, "error": "Product not found", "exit_code": 1}
+    if args.concurrency < 1:
+        raise CliError("--concurrency must be at least 1")
+
+    parser = build_parser()
+    base_url = _base_url(args)
+    _get_session(pool_size=max(10, args.concurrency))
+
+    source = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+    failed = 0
+    try:
+        lines = enumerate(source, start=1)
+        if args.concurrency == 1:
+            records = (_run_collected(parser, line_no, line, base_url) for line_no, line in lines)
+        else:
+            records = _run_concurrently(parser, lines, base_url, args.concurrency)
+
+        for record in records:
+            if record is None:
+                continue
+            failed += not record["ok"]
+            _print_line(record)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    if failed:
+        raise CliError(f"{failed} command(s) failed")
+
+
+def cmd_shell(args) -> None:
+    # Interactive prompt running the same commands, with one interpreter and connection
+    try:
+        import readline  # noqa: F401  (line editing and history, where available)
+    except ImportError:
+        pass
+
+    parser = build_parser()
+    base_url = _base_url(args)
+    print("Type a command (e.g. show 1 or update 1 --stock 5), help, or exit.", file=sys.stderr)
+    while True:
+        try:
+            line = input("inventory> ")
+        except EOFError:
+            print(file=sys.stderr)
+            return
+        except KeyboardInterrupt:
+            print(file=sys.stderr)
+            continue
+
+        command = line.strip()
+        if command in ("exit", "quit"):
+            return
+        if command in ("help", "?"):
+            parser.print_help()
+            continue
+
+        try:
+            parsed = _parse_line(parser, line, base_url)
+            if parsed is not None:
+                parsed.func(parsed)
+        except CliError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+        except SystemExit:
+            # argparse has already printed the usage error (or --help)
+            pass
+        except Exception as e:
+            print(f"ERROR: {e or type(e).__name__}", file=sys.stderr)
+
+
 # ---------- argparse ----------
 def build_parser() -> argparse.ArgumentParser:
     # argparse structure: subcommands = clean CLI UX and matches rubric nicely
@@ -162,6 +604,7 @@ def build_parser() -> argparse.ArgumentParser:
     sub = parser.add_subparsers(dest="command", required=True)
 
     p_list = sub.add_parser("list", help="List all products")
+    p_list.add_argument("--page-size", type=int, help="Fetch in pages of this size and print NDJSON")
     p_list.set_defaults(func=cmd_list)
 
     p_show = sub.add_parser("show", help="Show a product by id")
@@ -190,12 +633,44 @@ def build_parser() -> argparse.ArgumentParser:
     p_find = sub.add_parser("find", help="Find product details via OpenFoodFacts")
     p_find.add_argument("--barcode", help="Barcode to look up")
     p_find.add_argument("--name", help="Name to search for")
+    p_find.add_argument("--limit", type=int, help="With --name: show the top N ranked matches")
     p_find.set_defaults(func=cmd_find)
 
+    p_search = sub.add_parser("search", help="Search the local inventory by name/brand/category")
+    p_search.add_argument("query")
+    p_search.add_argument("--limit", type=int, default=10, help="Max results (default 10)")
+    p_search.set_defaults(func=cmd_search)
+
+    p_stats = sub.add_parser("stats", help="Inventory totals, categories and low-stock products")
+    p_stats.add_argument("--threshold", type=float, help="Low stock means stock <= this (default: server's)")
+    p_stats.add_argument("--limit", type=int, default=20, help="Max low-stock products to list (default 20)")
+    p_stats.set_defaults(func=cmd_stats)
+
     p_enrich = sub.add_parser("enrich", help="Enrich an existing product by id using its barcode")
-    p_enrich.add_argument("id", type=int)
+    p_enrich.add_argument("id", type=int, nargs="?")
+    p_enrich.add_argument("--all", action="store_true", help="Enrich every product that has no details yet")
+    p_enrich.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between status checks with --all")
     p_enrich.set_defaults(func=cmd_enrich)
 
+    p_import = sub.add_parser("import", help="Bulk import products from a CSV or NDJSON file")
+    p_import.add_argument("file")
+    p_import.add_argument("--format", choices=["csv", "ndjson"], help="Default: from the file extension")
+    p_import.add_argument("--chunk-size", type=int, default=1000, help="Products per bulk request (default 1000)")
+    p_import.set_defaults(func=cmd_import)
+
+    p_export = sub.add_parser("export", help="Export every product to a CSV or NDJSON file")
+    p_export.add_argument("file")
+    p_export.add_argument("--format", choices=["csv", "ndjson"], help="Default: from the file extension")
+    p_export.set_defaults(func=cmd_export)
+
+    p_batch = sub.add_parser("batch", help="Run commands from a file (one per line), printing NDJSON results")
+    p_batch.add_argument("file", nargs="?", default="-", help="Command file (default: - for stdin)")
+    p_batch.add_argument("--concurrency", type=int, default=1, help="Commands to run at once (default 1)")
+    p_batch.set_defaults(func=cmd_batch)
+
+    p_shell = sub.add_parser("shell", help="Interactive prompt for running commands")
+    p_shell.set_defaults(func=cmd_shell)
+
     return parser
 
 
@@ -203,7 +678,13 @@ def main(argv=None) -> int:
     # main(argv=None) makes CLI testable (tests can pass args without spawning a subprocess)
     parser = build_parser()
     args = parser.parse_args(argv)
-    args.func(args)
+    try:
+        args.func(args)
+    except CliError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        raise SystemExit(e.code)
+    finally:
+        _save_response_cache()
     return 0
 
 
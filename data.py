@@ -1,5 +1,6 @@
 # In-memory products "database"
 # Keeping it simple: a list of dicts stands in for real DB rows.
+# app.py loads these rows into store.ProductStore, which keeps the id/barcode indexes.
 
 products = [
     {
@@ -0,0 +1,103 @@
+import threading
+from typing import Callable, Iterable, Iterator
+
+
+class FragmentCache:
+    # Serialized JSON per product, so list responses are built by joining bytes instead of
+    # re-encoding every product dict on every request. Kept current through
+    # ProductStore.subscribe(): any change drops that product's fragment, and the next read
+    # encodes it again.
+    #
+    # Filling the cache races with writes: a reader can pick up a product, a write replaces
+    # it (and drops the fragment), and then the reader stores its now-stale encoding. So
+    # readers take a mark() *before* reading products, and a fragment is only stored if its
+    # product hasn't changed since that mark.
+    #
+    # maxsize caps the number of fragments (about 150-250 bytes each for typical products).
+    # Once full, products without a fragment are just encoded per request.
+
+    def __init__(self, dumps: Callable[[dict], str], maxsize: int = 1_000_000):
+        self.dumps = dumps
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._fragments: dict[int, bytes] = {}
+        # Change sequence number, the seq of each product's last change, and of the last clear
+        self._seq = 0
+        self._changed: dict[int, int] = {}
+        self._cleared_at = 0
+        # Approximate: bumped without the lock
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+    def on_change(self, action: str, old: dict | None, new: dict | None) -> None:
+        # Store listener
+        with self._lock:
+            self._seq += 1
+            if action == "clear":
+                self._fragments = {}
+                self._changed = {}
+                self._cleared_at = self._seq
+                return
+
+            product_id = (new or old)["id"]
+            self._fragments.pop(product_id, None)
+            # New ids can't have been read before they existed, so only updates/deletes need
+            # remembering (which keeps a 1M product load from filling _changed)
+            if action != "add":
+                self._changed[product_id] = self._seq
+
+    def mark(self) -> int:
+        # Take this before reading the products you're about to encode
+        return self._seq
+
+    def _cached(self, product_id: int, since: int) -> bytes | None:
+        # A fragment only counts for a reader whose mark is at or after the product's last
+        # change; an older reader gets its own products encoded, so its body never mixes
+        # bytes from both sides of a change
+        fragment = self._fragments.get(product_id)
+        if fragment is not None and (self._cleared_at > since or self._changed.get(product_id, 0) > since):
+            return None
+        return fragment
+
+    def encode(self, product: dict, since: int) -> bytes:
+        product_id = product["id"]
+        fragment = self._cached(product_id, since)
+        if fragment is not None:
+            self.hits += 1
+            return fragment
+
+        self.misses += 1
+        fragment = self.dumps(product).encode()
+        if len(self._fragments) < self.maxsize:
+            with self._lock:
+                if self._cleared_at <= since and self._changed.get(product_id, 0) <= since:
+                    self._fragments[product_id] = fragment
+        return fragment
+
+    def join(self, products: Iterable[dict], since: int) -> bytes:
+        # The same bytes as encoding the list in one go: [fragment,fragment,...]
+        return b"[" + b",".join([self.encode(product, since) for product in products]) + b"]"
+
+    def join_ids(self, ids: Iterable[int], get: Callable[[int], dict | None], since: int) -> bytes:
+        # join() for the products with these ids, only reading (with get) the ones that have no
+        # fragment yet. On the compact backend that skips rebuilding every row just to look up
+        # its cached bytes. Ids deleted since they were read are left out.
+        parts = []
+        for product_id in ids:
+            fragment = self._cached(product_id, since)
+            if fragment is not None:
+                self.hits += 1
+            else:
+                product = get(product_id)
+                if product is None:
+                    continue
+                fragment = self.encode(product, since)
+            parts.append(fragment)
+        return b"[" + b",".join(parts) + b"]"
+
+    def iter_encoded(self, products: Iterable[dict], since: int) -> Iterator[bytes]:
+        for product in products:
+            yield self.encode(product, since)
@@ -0,0 +1,193 @@
+import bisect
+import math
+import threading
+from typing import Any, Callable, Iterable
+
+from store import ProductStore
+
+# Fields with a sorted index: range filters and sorts on them don't need a full scan
+INDEXED_FIELDS = ("price", "stock")
+
+# Fields GET /products can sort by
+SORT_FIELDS = ("id", "name", "price", "stock")
+
+
+def is_number(value) -> bool:
+    # Prices/stocks aren't type checked on write, so anything else (strings, None, NaN) is
+    # left out of the index and never matches a range filter
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+class SortedIndex:
+    # (value, product id) pairs for one numeric field, kept in sorted order so a range is two
+    # bisects and a slice. Kept current through ProductStore.subscribe().
+    # `value` picks the number out of a product when it isn't a top-level field.
+    #
+    # A store load replays every product as an "add", and insort for each of those would be
+    # quadratic. After a "clear" adds are just appended, and the list is sorted once when it's
+    # first needed (Timsort is fast on the mostly sorted result).
+
+    def __init__(self, field: str, value: Callable[[dict], Any] | None = None):
+        self.field = field
+        self._value = value if value is not None else lambda product: product.get(field)
+        self._entries: list[tuple] = []
+        self._unsorted = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def on_change(self, action: str, old: dict | None, new: dict | None) -> None:
+        # Store listener
+        with self._lock:
+            if action == "clear":
+                self._entries = []
+                self._unsorted = True
+                return
+            if old is not None:
+                self._remove(old)
+            if new is not None:
+                self._add(new)
+
+    def _sorted(self) -> list[tuple]:
+        # Call with the lock held
+        if self._unsorted:
+            self._entries.sort()
+            self._unsorted = False
+        return self._entries
+
+    def _add(self, product: dict) -> None:
+        value = self._value(product)
+        if not is_number(value):
+            return
+        if self._unsorted:
+            self._entries.append((value, product["id"]))
+        else:
+            bisect.insort(self._entries, (value, product["id"]))
+
+    def _remove(self, product: dict) -> None:
+        value = self._value(product)
+        if not is_number(value):
+            return
+        entries = self._sorted()
+        entry = (value, product["id"])
+        i = bisect.bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    def _span(self, low: float | None, high: float | None) -> tuple[int, int]:
+        # Positions of low <= value <= high. (low,) sorts before every (low, id) and
+        # (high, inf) after every (high, id).
+        entries = self._sorted()
+        start = 0 if low is None else bisect.bisect_left(entries, (low,))
+        end = len(entries) if high is None else bisect.bisect_right(entries, (high, math.inf))
+        return start, max(start, end)
+
+    def count(self, low: float | None = None, high: float | None = None) -> int:
+        with self._lock:
+            start, end = self._span(low, high)
+        return end - start
+
+    def ids(self, low: float | None = None, high: float | None = None, limit: int | None = None) -> list[int]:
+        # Product ids with low <= value <= high (either bound optional), in value order
+        with self._lock:
+            start, end = self._span(low, high)
+            if limit is not None:
+                end = min(end, start + limit)
+            matched = self._entries[start:end]
+        return [product_id for _, product_id in matched]
+
+
+def build_indexes(store: ProductStore) -> dict[str, SortedIndex]:
+    indexes = {}
+    for field in INDEXED_FIELDS:
+        indexes[field] = SortedIndex(field)
+        store.subscribe(indexes[field].on_change)
+    return indexes
+
+
+def _sort_key(field: str):
+    # Ties (and missing / wrongly typed values, which go last) are broken by id
+    if field == "id":
+        return lambda product: product["id"]
+    if field == "name":
+        return lambda product: (
+            (0, product["name"].lower(), product["id"]) if isinstance(product.get("name"), str)
+            else (1, "", product["id"])
+        )
+    return lambda product: (
+        (0, product[field], product["id"]) if is_number(product.get(field)) else (1, 0, product["id"])
+    )
+
+
+def _matches(product: dict, ranges: dict, has_barcode: bool | None) -> bool:
+    for field, (low, high) in ranges.items():
+        value = product.get(field)
+        if not is_number(value):
+            return False
+        if (low is not None and value < low) or (high is not None and value > high):
+            return False
+    if has_barcode is not None and (product.get("barcode") is not None) != has_barcode:
+        return False
+    return True
+
+
+def find_products(
+    store: ProductStore,
+    indexes: dict[str, SortedIndex],
+    ranges: dict[str, tuple[float | None, float | None]] | None = None,
+    barcode: str | None = None,
+    has_barcode: bool | None = None,
+    sort: str = "id",
+    descending: bool = False,
+    offset: int = 0,
+    limit: int | None = None,
+) -> tuple[list[dict], int]:
+    # Returns (products[offset:offset + limit], total number of matches).
+    # ranges: field -> (low, high), inclusive, either bound may be None.
+    # Candidates come from the cheapest source: the barcode index, else the sorted index whose
+    # range matches the fewest products, else (only for an unfiltered sort on an indexed
+    # field) that field's whole index, else a scan. Every candidate is then checked against all
+    # the filters, since an index only narrows things down by one field.
+    ranges = ranges or {}
+    end = None if limit is None else offset + limit
+
+    ids = None
+    if barcode is not None:
+        candidates: Iterable[dict] = store.find_by_barcode(barcode)
+        ordered_by = None
+    elif ranges:
+        ordered_by = min(ranges, key=lambda name: indexes[name].count(*ranges[name]))
+        ids = indexes[ordered_by].ids(*ranges[ordered_by])
+    elif sort in indexes and len(indexes[sort]) == len(store):
+        # Every product has a numeric value, so the index order is the sort order
+        ordered_by = sort
+        ids = indexes[sort].ids()
+    else:
+        candidates = store.iter_products()
+        ordered_by = "id"
+
+    if ids is not None:
+        if ordered_by == sort and len(ranges) <= 1 and has_barcode is None:
+            # The index alone answers the query: only fetch the requested page. (A product
+            # written since the index was read is returned as it is now.)
+            if descending:
+                ids.reverse()
+            return list(_get_all(store, ids[offset:end])), len(ids)
+        candidates = _get_all(store, ids)
+
+    products = [product for product in candidates if _matches(product, ranges, has_barcode)]
+    if ordered_by == sort:
+        if descending:
+            products.reverse()
+    else:
+        products.sort(key=_sort_key(sort), reverse=descending)
+    return products[offset:end], len(products)
+
+
+def _get_all(store: ProductStore, ids: list[int]) -> Iterable[dict]:
+    # Skip ids deleted since the index was read
+    for product_id in ids:
+        product = store.get(product_id)
+        if product is not None:
+            yield product
@@ -0,0 +1,122 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from services.ratelimit import RateLimiter
+
+# How many finished jobs we remember for the status endpoint before dropping the oldest
+MAX_JOBS_KEPT = 100
+
+
+class EnrichmentJob:
+    # Progress + per-product outcome for one bulk enrichment run.
+    # Outcomes: "enriched", "not_found" (OFF has no such barcode), "no_barcode",
+    # "missing" (product was deleted before we got to it) and "failed" (lookup blew up).
+
+    def __init__(self, product_ids: list[int]):
+        self.id = uuid.uuid4().hex[:12]
+        self.product_ids = product_ids
+        self.total = len(product_ids)
+        self.counts = {"enriched": 0, "not_found": 0, "no_barcode": 0, "missing": 0, "failed": 0}
+        self.results: list[dict] = []
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def processed(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def status(self) -> str:
+        return "done" if self._done.is_set() else "running"
+
+    def record(self, product_id: int, outcome: str) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+            self.results.append({"id": product_id, "outcome": outcome})
+            if self.processed == self.total:
+                self.finished_at = time.time()
+                self._done.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self, include_results: bool = False) -> dict:
+        with self._lock:
+            body = {
+                "job_id": self.id,
+                "status": self.status,
+                "total": self.total,
+                "processed": self.processed,
+                "counts": dict(self.counts),
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+            if include_results:
+                body["results"] = list(self.results)
+        return body
+
+
+class JobManager:
+    # Runs enrichment jobs on one bounded thread pool, with a global requests-per-second
+    # limit shared by every job so a big batch can't hammer OpenFoodFacts.
+
+    def __init__(self, max_workers: int = 8, rate_per_sec: float = 10):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="enrich")
+        self._limiter = RateLimiter(rate_per_sec, burst=max_workers)
+        self._jobs: dict[str, EnrichmentJob] = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> EnrichmentJob | None:
+        return self._jobs.get(job_id)
+
+    def start(self, store, product_ids: list[int], fetch: Callable[[str], dict | None]) -> EnrichmentJob:
+        # Queue every product and return right away; progress shows up on the job object
+        job = EnrichmentJob(product_ids)
+
+        with self._lock:
+            self._jobs[job.id] = job
+            # dicts keep insertion order, so the first key is the oldest job
+            while len(self._jobs) > MAX_JOBS_KEPT:
+                del self._jobs[next(iter(self._jobs))]
+
+        if not product_ids:
+            job.finished_at = time.time()
+            job._done.set()
+
+        for product_id in product_ids:
+            self._executor.submit(self._enrich_one, job, store, product_id, fetch)
+
+        return job
+
+    def _enrich_one(self, job: EnrichmentJob, store, product_id: int, fetch) -> None:
+        product = store.get(product_id)
+        if product is None:
+            job.record(product_id, "missing")
+            return
+
+        barcode = product.get("barcode")
+        if not barcode:
+            job.record(product_id, "no_barcode")
+            return
+
+        # Only the actual upstream call counts against the rate limit
+        self._limiter.acquire()
+        try:
+            details = fetch(barcode)
+        except Exception:
+            job.record(product_id, "failed")
+            return
+
+        if details is None:
+            job.record(product_id, "not_found")
+            return
+
+        if store.update(product_id, {"details": details}) is None:
+            job.record(product_id, "missing")
+        else:
+            job.record(product_id, "enriched")
@@ -0,0 +1,212 @@
+import bisect
+import itertools
+import math
+import os
+import threading
+import weakref
+from typing import Callable
+
+# Latency buckets in seconds. Most of our routes answer in well under a millisecond, so the
+# low end is finer than Prometheus' defaults.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _ThreadSlot:
+    # Lives in a threading.local; when its thread exits this gets garbage collected and the
+    # registry folds the thread's numbers into the retired totals (see MetricsRegistry._retire)
+    __slots__ = ("data", "__weakref__")
+
+    def __init__(self, data: dict):
+        self.data = data
+
+
+class MetricsRegistry:
+    # Counters and histograms with Prometheus text output, cheap enough to call on every
+    # request. Recording never takes a lock: each thread writes to its own dict of
+    # (metric, label values) -> numbers, and a scrape merges all of them.
+    #
+    # A scrape can catch a thread halfway through one observation (bucket bumped, sum not
+    # yet), which is off by one sample for a moment and fine for monitoring.
+    #
+    # Threaded servers often use a thread per connection, so finished threads don't stay
+    # registered forever: their totals are merged into _retired when they exit.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._keys = itertools.count()
+        self._live: dict[int, dict] = {}
+        self._retired: dict = {}
+        self._metrics: dict[str, "_Metric"] = {}
+        self._callbacks: list[tuple[str, str, str, Callable[[], float]]] = []
+
+    # ---------- declaring metrics ----------
+    def counter(self, name: str, help_text: str, labels: tuple[str, ...] = ()) -> "Counter":
+        return self._register(Counter(self, name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> "Histogram":
+        return self._register(Histogram(self, name, help_text, labels, tuple(buckets)))
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], float], kind: str = "gauge") -> None:
+        # Value computed at scrape time (product count, memory, ...). kind="counter" for
+        # cumulative numbers that something else already tracks (e.g. cache hits).
+        self._callbacks.append((name, help_text, kind, fn))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    # ---------- per-thread storage ----------
+    def _thread_data(self) -> dict:
+        slot = getattr(self._local, "slot", None)
+        if slot is None:
+            data = {}
+            key = next(self._keys)
+            with self._lock:
+                self._live[key] = data
+            slot = self._local.slot = _ThreadSlot(data)
+            weakref.finalize(slot, self._retire, key)
+        return slot.data
+
+    def _retire(self, key: int) -> None:
+        with self._lock:
+            data = self._live.pop(key, None)
+            if data:
+                _merge(self._retired, data)
+
+    def _snapshot(self) -> dict:
+        with self._lock:
+            merged = {key: list(value) if isinstance(value, list) else value for key, value in self._retired.items()}
+            for data in self._live.values():
+                # Copying the items is one C call, so a thread adding a new key meanwhile is safe
+                _merge(merged, dict(data.items()))
+        return merged
+
+    # ---------- output ----------
+    def render(self) -> str:
+        # Prometheus text exposition format
+        values = self._snapshot()
+        by_metric: dict[str, list] = {}
+        for (name, label_values), value in values.items():
+            by_metric.setdefault(name, []).append((label_values, value))
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help_text}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for label_values, value in sorted(by_metric.get(name, [])):
+                lines.extend(metric.render(label_values, value))
+
+        for name, help_text, kind, fn in self._callbacks:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_format_value(fn())}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _merge(into: dict, data: dict) -> None:
+    for key, value in data.items():
+        if isinstance(value, list):
+            current = into.get(key)
+            if current is None:
+                into[key] = list(value)
+            else:
+                for i, number in enumerate(value):
+                    current[i] += number
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: MetricsRegistry, name: str, help_text: str, labels: tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+
+    def _check(self, label_values: tuple) -> None:
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {label_values}")
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._check(label_values)
+        data = self.registry._thread_data()
+        key = (self.name, label_values)
+        data[key] = data.get(key, 0) + amount
+
+    def render(self, label_values: tuple, value) -> list[str]:
+        return [f"{self.name}{_labels(self.labels, label_values)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labels, buckets: tuple[float, ...]):
+        super().__init__(registry, name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *label_values) -> None:
+        # Stored as [count per bucket..., count above the last bucket, sum]
+        self._check(label_values)
+        data = self.registry._thread_data()
+        key = (self.name, label_values)
+        entry = data.get(key)
+        if entry is None:
+            entry = data[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def render(self, label_values: tuple, entry: list) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labels, label_values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {_format_value(entry[-1])}")
+        lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {cumulative}")
+        return lines
+
+
+def process_memory_bytes() -> int:
+    # Current resident set size. /proc is Linux only; elsewhere fall back to the peak RSS.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux but bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,214 @@
+import threading
+import time
+from typing import Callable
+
+from indexes import SortedIndex
+from services.breaker import CircuitOpenError
+from services.ratelimit import RateLimiter
+from store import ProductStore
+
+# How long to leave a product alone after a refresh didn't work. A barcode OFF no longer knows
+# keeps its old details and is asked about again after another max age; a failed lookup (OFF
+# down, timeout) is retried sooner.
+FAILURE_BACKOFF = 3600
+
+
+def fetched_at(product: dict):
+    # When the product's details were last fetched from OFF (see stamp_fetched). Details set
+    # by hand or imported from a dump don't have it and are never refreshed.
+    details = product.get("details")
+    return details.get("fetched_at") if isinstance(details, dict) else None
+
+
+def stamp_fetched(details: dict | None, when: float | None = None) -> dict | None:
+    # OFF details as they're stored on a product: a copy with the time they were fetched.
+    # Only stored products carry it; what the OFF clients return (and /products/search
+    # sends) is just OFF's data.
+    if details is None:
+        return None
+    return dict(details, fetched_at=time.time() if when is None else when)
+
+
+class DetailsRefresher:
+    # Stale-while-revalidate for OFF details: reads keep getting whatever details are stored,
+    # while a background worker re-fetches the ones older than max_age, oldest first.
+    #
+    # Each run takes one batch of at most batch_size stale products (every `interval` seconds,
+    # or right away on trigger()), paced by a requests-per-second limit, so at most
+    # batch_size / interval refreshes happen on average however much is stale.
+    # A sorted index on fetched_at (kept current through ProductStore.subscribe()) finds the
+    # oldest products without a scan.
+    #
+    # fetch(barcode) should always go to OFF and return details, None if OFF doesn't have the
+    # barcode, or raise if the lookup failed. While the OFF circuit breaker is open the rest of
+    # the batch is left for the next run ("deferred") instead of each product backing off.
+
+    def __init__(
+        self,
+        store: ProductStore,
+        fetch: Callable[[str], dict | None],
+        max_age: float = 7 * 24 * 3600,
+        batch_size: int = 20,
+        rate_per_sec: float = 1,
+        interval: float = 600,
+        clock: Callable[[], float] = time.time,
+    ):
+        if max_age <= 0 or batch_size <= 0:
+            raise ValueError("max_age and batch_size must be positive")
+        self.store = store
+        self.fetch = fetch
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.rate_per_sec = rate_per_sec
+        self.interval = interval
+        self.clock = clock
+        self.index = SortedIndex("fetched_at", value=fetched_at)
+        self._limiter = RateLimiter(rate_per_sec)
+
+        # product id -> time before which it isn't retried
+        self._backoff: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._current: dict | None = None
+        self._last_run: dict | None = None
+        self._totals = {"refreshed": 0, "not_found": 0, "failed": 0, "skipped": 0, "deferred": 0}
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        store.subscribe(self.on_change)
+
+    def on_change(self, action: str, old: dict | None, new: dict | None) -> None:
+        # Store listener
+        self.index.on_change(action, old, new)
+        with self._lock:
+            if action == "clear":
+                self._backoff.clear()
+            elif old is not None and (new is None or fetched_at(new) != fetched_at(old)):
+                # Deleted, or got new details some other way: nothing to back off from
+                self._backoff.pop(old["id"], None)
+
+    def stale_count(self) -> int:
+        return self.index.count(high=self.clock() - self.max_age)
+
+    def _pick(self, now: float) -> list[int]:
+        # The oldest stale ids that aren't backing off. Backing-off products are the oldest too,
+        # so read past them.
+        with self._lock:
+            backoff = {product_id for product_id, until in self._backoff.items() if until > now}
+        ids = self.index.ids(high=now - self.max_age, limit=self.batch_size + len(backoff))
+        return [product_id for product_id in ids if product_id not in backoff][:self.batch_size]
+
+    def run_once(self) -> dict | None:
+        # Refresh one batch and return its summary, or None if a run is already going
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        try:
+            started = self.clock()
+            ids = self._pick(started)
+            counts = {"refreshed": 0, "not_found": 0, "failed": 0, "skipped": 0, "deferred": 0}
+            with self._lock:
+                self._current = {"started_at": started, "total": len(ids), "processed": 0, "counts": counts}
+
+            for product_id in ids:
+                if self._stop.is_set():
+                    break
+                outcome = self._refresh_one(product_id)
+                with self._lock:
+                    counts[outcome] += 1
+                    self._totals[outcome] += 1
+                    self._current["processed"] += 1
+                if outcome == "deferred":
+                    break
+
+            with self._lock:
+                self._last_run = dict(self._current, finished_at=self.clock(), counts=dict(counts))
+                self._current = None
+                return dict(self._last_run)
+        finally:
+            self._run_lock.release()
+
+    def _refresh_one(self, product_id: int) -> str:
+        product = self.store.get(product_id)
+        barcode = product.get("barcode") if product is not None else None
+        if not barcode:
+            # Deleted, or its barcode was removed, since the batch was picked
+            return "skipped"
+        before = product.get("details")
+
+        # Only the actual upstream call counts against the rate limit
+        self._limiter.acquire()
+        try:
+            details = self.fetch(barcode)
+        except CircuitOpenError:
+            return "deferred"
+        except Exception:
+            self._back_off(product_id, FAILURE_BACKOFF)
+            return "failed"
+
+        if details is None:
+            self._back_off(product_id, self.max_age)
+            return "not_found"
+
+        # Don't overwrite details (or a barcode) that changed while we were asking OFF. There's
+        # still a tiny window between this check and the update, in which case the other write
+        # loses - the same as two clients racing on PATCH.
+        current = self.store.get(product_id)
+        if current is None or current.get("barcode") != barcode or current.get("details") != before:
+            return "skipped"
+        self.store.update(product_id, {"details": stamp_fetched(details, self.clock())})
+        return "refreshed"
+
+    def _back_off(self, product_id: int, seconds: float) -> None:
+        with self._lock:
+            self._backoff[product_id] = self.clock() + seconds
+
+    def start(self) -> None:
+        # Background worker: a run every `interval` seconds (only on trigger() if interval <= 0)
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="details-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def trigger(self) -> None:
+        # Start a run now instead of waiting for the next interval
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval if self.interval > 0 else None)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.run_once()
+            except Exception:
+                # A broken store read shouldn't kill the worker; the next run tries again
+                with self._lock:
+                    self._current = None
+
+    def status(self) -> dict:
+        now = self.clock()
+        with self._lock:
+            current = None
+            if self._current is not None:
+                current = dict(self._current, counts=dict(self._current["counts"]))
+            body = {
+                "state": "running" if current is not None else "idle",
+                "max_age": self.max_age,
+                "batch_size": self.batch_size,
+                "rate_per_sec": self.rate_per_sec,
+                "interval": self.interval,
+                "current": current,
+                "last_run": self._last_run,
+                "totals": dict(self._totals),
+                "backing_off": sum(until > now for until in self._backoff.values()),
+            }
+        body["stale"] = self.index.count(high=now - self.max_age)
+        return body
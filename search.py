@@ -0,0 +1,199 @@
+import heapq
+import math
+import re
+import threading
+
+# How much a match in each field counts toward a product's score.
+# Name is what employees type most, so it wins over brand/category/ingredient hits.
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "product_name": 2.0,
+    "brands": 2.0,
+    "categories_tags": 1.0,
+    "ingredients_text": 0.5,
+}
+
+# Fuzzy matching knobs: how similar (trigram Jaccard) a word must be to count as a typo match,
+# and how much fuzzy / substring matches are worth compared to an exact word match
+MIN_SIMILARITY = 0.3
+SUBSTRING_FACTOR = 0.8
+FUZZY_FACTOR = 0.7
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str | None) -> list[str]:
+    # Anything that isn't a string (a number or list stored as a name, say) has no words
+    if not text or not isinstance(text, str):
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _trigrams(token: str) -> set[str]:
+    # Pad with boundary markers so short words still produce grams and prefixes/suffixes count
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _product_terms(product: dict) -> dict[str, float]:
+    # Flatten a product into token -> weight (best field weight wins if a word shows up twice)
+    details = product.get("details")
+    if not isinstance(details, dict):
+        details = {}
+    tags = details.get("categories_tags")
+    fields = {
+        "name": product.get("name"),
+        "product_name": details.get("product_name"),
+        "brands": details.get("brands"),
+        "ingredients_text": details.get("ingredients_text"),
+        # OFF tags look like "en:breakfast-cereals", so drop the language prefix
+        "categories_tags": " ".join(
+            tag.split(":")[-1] for tag in (tags if isinstance(tags, list) else []) if isinstance(tag, str)
+        ),
+    }
+
+    terms: dict[str, float] = {}
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS[field]
+        for token in tokenize(text):
+            if weight > terms.get(token, 0.0):
+                terms[token] = weight
+    return terms
+
+
+class SearchIndex:
+    # Inverted index over our own inventory (name, brand, categories, ingredients).
+    #   _postings -> token -> {product id: field weight}
+    #   _docs     -> product id -> the terms we indexed for it (needed to unindex on change)
+    #   _grams    -> trigram -> tokens containing it (for substring + typo tolerant lookups)
+    # It's kept current through ProductStore.subscribe(), so there is never a full rebuild.
+    # Writers for different products can call in from several threads at once, so every
+    # public method runs under one lock.
+
+    def __init__(self):
+        self._postings: dict[str, dict[int, float]] = {}
+        self._docs: dict[int, dict[str, float]] = {}
+        self._grams: dict[str, set[str]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ---------- maintenance ----------
+    def on_change(self, action: str, old: dict | None, new: dict | None) -> None:
+        # Store listener: keep the index in sync with every add/update/delete
+        with self._lock:
+            if action == "clear":
+                self._postings.clear()
+                self._docs.clear()
+                self._grams.clear()
+                return
+
+            if old is not None:
+                self.remove(old["id"])
+            if new is not None:
+                self.add(new)
+
+    def add(self, product: dict) -> None:
+        with self._lock:
+            self._add(product)
+
+    def _add(self, product: dict) -> None:
+        product_id = product["id"]
+        terms = _product_terms(product)
+        self._docs[product_id] = terms
+
+        for token, weight in terms.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                # First time we've seen this word, so register its trigrams
+                postings = self._postings[token] = {}
+                for gram in _trigrams(token):
+                    self._grams.setdefault(gram, set()).add(token)
+            postings[product_id] = weight
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id: int) -> None:
+        terms = self._docs.pop(product_id, None)
+        if not terms:
+            return
+
+        for token in terms:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+
+            if not postings:
+                # Word no longer appears anywhere, so drop it from the trigram index too
+                del self._postings[token]
+                for gram in _trigrams(token):
+                    tokens = self._grams.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._grams[gram]
+
+    # ---------- querying ----------
+    def _matching_tokens(self, query_token: str) -> dict[str, float]:
+        # Indexed words that match one query word, with how good the match is (1.0 = exact)
+        matches = {}
+        if query_token in self._postings:
+            matches[query_token] = 1.0
+
+        # Very short words make terrible trigrams, so those only match exactly
+        if len(query_token) < 3:
+            return matches
+
+        query_grams = _trigrams(query_token)
+        shared: dict[str, int] = {}
+        for gram in query_grams:
+            for token in self._grams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+
+        for token, count in shared.items():
+            if token in matches:
+                continue
+
+            if query_token in token:
+                # Substring hit ("butter" inside "peanutbutter")
+                matches[token] = SUBSTRING_FACTOR
+                continue
+
+            # Trigram Jaccard similarity (a padded word of length n has about n trigrams)
+            similarity = count / (len(query_grams) + len(token) - count)
+            if similarity >= MIN_SIMILARITY:
+                # Close enough to be a typo ("banan" vs "bananas", "peanot" vs "peanut")
+                matches[token] = FUZZY_FACTOR * similarity
+
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, float]]:
+        # Returns [(product id, score)] best first. Each query word contributes its best
+        # match per product, scaled by IDF so rare words outrank common ones.
+        with self._lock:
+            return self._search(query, limit)
+
+    def _search(self, query: str, limit: int) -> list[tuple[int, float]]:
+        total = len(self._docs)
+        scores: dict[int, float] = {}
+
+        for query_token in set(tokenize(query)):
+            best: dict[int, float] = {}
+            for token, quality in self._matching_tokens(query_token).items():
+                postings = self._postings[token]
+                idf = math.log(1 + total / len(postings))
+                for product_id, weight in postings.items():
+                    score = weight * quality * idf
+                    if score > best.get(product_id, 0.0):
+                        best[product_id] = score
+
+            for product_id, score in best.items():
+                scores[product_id] = scores.get(product_id, 0.0) + score
+
+        # Ties go to the lower (older) id so results are stable
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(product_id, round(score, 4)) for product_id, score in top]
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+import requests
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.RequestException):
+    # Raised instead of calling upstream while the breaker is open. retry_after is roughly
+    # how long until it lets a probe through.
+    def __init__(self, retry_after: float):
+        super().__init__("OpenFoodFacts circuit is open")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    # Stops calling an upstream that is failing or too slow, so callers fail in microseconds
+    # instead of each waiting out a timeout.
+    #
+    # closed:    calls go through and their outcomes go into a rolling window of the last
+    #            `window` seconds. Once it holds at least min_calls, it opens if the share of
+    #            failures reaches failure_ratio, or the share of calls slower than slow_call
+    #            seconds reaches slow_ratio.
+    # open:      every call is rejected with CircuitOpenError for open_seconds.
+    # half_open: up to `probes` calls at a time go through. A fast success closes the breaker
+    #            (with an empty window); a failure or a slow success opens it again.
+    #
+    # Callers do allow() before the call and record() after it. "Not found" is a success.
+
+    def __init__(
+        self,
+        window: float = 30,
+        min_calls: int = 10,
+        failure_ratio: float = 0.5,
+        slow_call: float = 2.0,
+        slow_ratio: float = 0.8,
+        open_seconds: float = 15,
+        probes: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call = slow_call
+        self.slow_ratio = slow_ratio
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.clock = clock
+        self.state = CLOSED
+        # How many times it has opened, and calls it turned away (for /metrics)
+        self.opened = 0
+        self.rejected = 0
+        # (time, failed, slow) per call, oldest first, plus running totals for the window
+        self._calls: deque[tuple[float, bool, bool]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probing = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        with self._lock:
+            if self.state == OPEN:
+                wait = self._opened_at + self.open_seconds - self.clock()
+                if wait > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(wait)
+                self.state = HALF_OPEN
+                self._probing = 0
+            if self.state == HALF_OPEN:
+                if self._probing >= self.probes:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.open_seconds)
+                self._probing += 1
+
+    def record(self, ok: bool, seconds: float) -> None:
+        slow = seconds >= self.slow_call
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                self._probing = max(0, self._probing - 1)
+                if ok and not slow:
+                    self.state = CLOSED
+                    self._reset_window()
+                else:
+                    self._open(now)
+                return
+            if self.state == OPEN:
+                # Started before the breaker opened; the window starts over on close anyway
+                return
+
+            self._calls.append((now, not ok, slow))
+            self._failures += not ok
+            self._slow += slow
+            self._trim(now)
+            total = len(self._calls)
+            if total >= self.min_calls and (
+                self._failures >= self.failure_ratio * total or self._slow >= self.slow_ratio * total
+            ):
+                self._open(now)
+
+    def _trim(self, now: float) -> None:
+        while self._calls and self._calls[0][0] <= now - self.window:
+            _, failed, slow = self._calls.popleft()
+            self._failures -= failed
+            self._slow -= slow
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = now
+        self._reset_window()
+
+    def _reset_window(self) -> None:
+        self._calls.clear()
+        self._failures = 0
+        self._slow = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._trim(self.clock())
+            return {
+                "state": self.state,
+                "calls": len(self._calls),
+                "failures": self._failures,
+                "slow": self._slow,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
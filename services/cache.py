@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+class TTLCache:
+    # Small thread-safe LRU cache with expiry, used in front of OpenFoodFacts lookups.
+    # - maxsize: once full, the least recently used entry gets evicted
+    # - ttl: how long a real result stays fresh (seconds)
+    # - negative_ttl: how long a "not found" (None) result is remembered, usually much shorter
+    #   so products that get added to OFF later show up without waiting a whole ttl
+    # - path: optional JSON file so the cache survives restarts (see load()/save())
+    # Expiry uses wall clock time (not monotonic) so saved entries still mean something after a restart.
+
+    def __init__(
+        self,
+        maxsize: int = 4096,
+        ttl: float = 24 * 3600,
+        negative_ttl: float = 300,
+        path: str | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.path = path
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        # Returns (hit, value). A hit can carry a None value (cached "not found").
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.misses += 1
+                return False, None
+
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key: str, value: Any) -> None:
+        ttl = self.negative_ttl if value is None else self.ttl
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+    # ---------- persistence ----------
+    def load(self) -> None:
+        # Missing or corrupt cache file just means we start cold
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        now = self._clock()
+        with self._lock:
+            # Saved oldest -> newest, so replaying in order rebuilds the LRU order too
+            for key, (expires_at, value) in saved.items():
+                if expires_at > now:
+                    self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+
+        with self._lock:
+            snapshot = {key: [expires_at, value] for key, (expires_at, value) in self._entries.items()}
+
+        # Write to a temp file then swap it in, so a crash mid-write can't leave half a file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
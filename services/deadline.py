@@ -0,0 +1,63 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+import requests
+
+# Latency budget for the current unit of work (an API request, usually). Upstream calls made
+# inside `with deadline(2.0):` cap their timeouts at what's left and don't start (or retry)
+# once it's spent, so a slow OpenFoodFacts can't hold a worker longer than the budget.
+# A ContextVar, so concurrent requests (threads or asyncio tasks) each see their own.
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(requests.Timeout):
+    # A Timeout, so callers that already handle upstream timeouts handle this too
+    pass
+
+
+@contextmanager
+def deadline(seconds: float | None):
+    # Nested budgets can only shrink: the inner one is capped by the outer. None = no new limit.
+    current = _deadline.get()
+    if seconds is not None:
+        ends = time.monotonic() + seconds
+        current = ends if current is None else min(current, ends)
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def ends_at() -> float | None:
+    # When the current budget runs out (time.monotonic()), or None without one
+    return _deadline.get()
+
+
+def outlives(ends: float | None) -> bool:
+    # Does the current budget end later than `ends`? No budget outlives any budget.
+    current = _deadline.get()
+    return ends is not None and (current is None or current > ends)
+
+
+def remaining() -> float | None:
+    # Seconds left in the current budget (can be negative), or None without one
+    ends = _deadline.get()
+    return None if ends is None else ends - time.monotonic()
+
+
+def check() -> None:
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def cap_timeout(timeout: tuple[float, float]) -> tuple[float, float]:
+    # (connect, read) timeouts for one attempt, cut down to the time left
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(timeout[0], left), min(timeout[1], left)
@@ -0,0 +1,37 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services import deadline
+
+# Statuses worth retrying: rate limiting plus the usual "server is having a moment" errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class DeadlineRetry(Retry):
+    # Gives up instead of backing off past the current request deadline (services.deadline).
+    # An attempt that does start keeps the timeout it was given when the call began.
+    def is_exhausted(self) -> bool:
+        left = deadline.remaining()
+        return super().is_exhausted() or (left is not None and left <= self.get_backoff_time())
+
+
+def build_session(pool_size: int = 10, retries: int = 2, backoff: float = 0.3) -> requests.Session:
+    # One Session = keep-alive connections that get reused instead of a fresh TCP+TLS
+    # handshake per call. pool_size caps how many connections we keep open per host.
+    # Retries back off exponentially (backoff, 2*backoff, ...) and honor Retry-After on 429.
+    # Only idempotent methods are retried, so a POST is never sent twice.
+    retry = DeadlineRetry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+        # Hand back the last response instead of raising, so callers keep their own status handling
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,131 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import sqlite3
+import sys
+import threading
+from typing import Iterator
+
+from services.openfoodfacts import FIELDS, _clean_product
+
+# OFF's CSV export has some enormous text columns (ingredients in every language...)
+csv.field_size_limit(sys.maxsize)
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS products (barcode TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID"
+
+
+def _open_text(path: str) -> io.TextIOBase:
+    # Dumps are usually shipped gzipped; read them straight from the .gz without unpacking
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def _iter_jsonl(f) -> Iterator[dict]:
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Real dumps have the odd broken line; skip it rather than abort a multi-GB import
+            continue
+
+
+def _iter_csv(f) -> Iterator[dict]:
+    # The official "CSV" export is actually tab separated
+    for row in csv.DictReader(f, delimiter="\t"):
+        tags = row.get("categories_tags")
+        # Tags come as one comma separated string in CSV, but a list in JSON/the API
+        row["categories_tags"] = [t for t in tags.split(",") if t] if tags else None
+        yield row
+
+
+def iter_dump(path: str) -> Iterator[tuple[str, dict]]:
+    # Stream (barcode, cleaned details) pairs from a JSONL or CSV dump, one record at a time
+    name = path[:-3] if path.endswith(".gz") else path
+    reader = _iter_csv if name.endswith((".csv", ".tsv")) else _iter_jsonl
+
+    with _open_text(path) as f:
+        for record in reader(f):
+            barcode = (record.get("code") or "").strip()
+            if barcode:
+                yield barcode, _clean_product(record)
+
+
+def import_dump(path: str, db_path: str, batch_size: int = 5000) -> int:
+    # Load a dump into a SQLite file keyed by barcode, keeping only the FIELDS we serve.
+    # Rows go in batches inside one transaction each, so memory stays flat for any dump size.
+    conn = sqlite3.connect(db_path)
+    try:
+        # This is a rebuildable cache, so trade crash safety for import speed
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(SCHEMA)
+
+        count = 0
+        batch = []
+        for barcode, details in iter_dump(path):
+            batch.append((barcode, json.dumps(details, separators=(",", ":"), ensure_ascii=False)))
+            if len(batch) >= batch_size:
+                count += _write_batch(conn, batch)
+                batch = []
+        if batch:
+            count += _write_batch(conn, batch)
+        return count
+    finally:
+        conn.close()
+
+
+def _write_batch(conn: sqlite3.Connection, batch: list[tuple[str, str]]) -> int:
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO products (barcode, data) VALUES (?, ?)", batch)
+    return len(batch)
+
+
+class LocalIndex:
+    # Read-only barcode -> details lookups against a database built by import_dump().
+    # Each thread gets its own connection (sqlite connections shouldn't be shared), and the
+    # file is memory-mapped so hot pages are served straight from the OS page cache.
+
+    def __init__(self, db_path: str, mmap_size: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        # Open once up front so a bad path fails at startup instead of on the first lookup
+        self._conn()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def get(self, barcode: str) -> dict | None:
+        row = self._conn().execute("SELECT data FROM products WHERE barcode = ?", (barcode,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def main(argv=None) -> int:
+    # python -m services.offdump openfoodfacts-products.jsonl.gz off.sqlite
+    parser = argparse.ArgumentParser(description="Import an OpenFoodFacts JSONL/CSV dump into a local SQLite index")
+    parser.add_argument("dump", help="Path to the dump (.jsonl, .csv/.tsv, optionally .gz)")
+    parser.add_argument("db", help="SQLite file to create or update")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    count = import_dump(args.dump, args.db, batch_size=args.batch_size)
+    print(f"imported {count} products into {args.db} (fields: {FIELDS})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,45 @@
+import atexit
+import os
+import time
+from typing import Callable
+
 import requests
+from urllib3.exceptions import NewConnectionError, TimeoutError as Urllib3TimeoutError
+
+from services import deadline
+from services.breaker import CircuitBreaker, CircuitOpenError
+from services.cache import TTLCache
+from services.http import build_session
+from search import tokenize
+from services.singleflight import SingleFlight
 
 # OpenFoodFacts base URL for exact barcode lookups (fast + consistent)
 OFF_BASE = "https://world.openfoodfacts.net/api/v2"
 
+# Name search is surprisingly flaky on the v2 search endpoint, so we use the classic one.
+# This gives better relevance for simple keyword searches.
+OFF_SEARCH_URL = "https://world.openfoodfacts.org/cgi/search.pl"
+
 # Only request the fields we actually care about (keeps responses small and clean)
 FIELDS = "product_name,brands,ingredients_text,image_url,quantity,categories_tags"
 
+# Observer signature: observer(endpoint, outcome, seconds) with endpoint "product" (barcode
+# lookups) or "search" (name search) and outcome one of "hit" (cache), "local" (offline index),
+# "found", "not_found", "error", "timeout" or "rejected" (circuit breaker open)
+Observer = Callable[[str, str, float], None]
+
+# How many candidates a name search asks OFF for. Thanks to the `fields` projection each one
+# is a few hundred bytes instead of a full product document, so a decent pool is cheap.
+NAME_CANDIDATES = 25
+
+# Relevance weights for ranking name search candidates (see _score_candidate)
+EXACT_TOKEN_SCORE = 1.0
+PREFIX_TOKEN_SCORE = 0.6
+BRAND_TOKEN_SCORE = 0.5
+NAME_PREFIX_BONUS = 0.5
+EXACT_NAME_BONUS = 1.0
+EXTRA_TOKEN_PENALTY = 0.05
+
 
 def _clean_product(product: dict) -> dict:
     # Return a clean subset (this becomes our "details" blob)
@@ -20,20 +54,165 @@ def _clean_product(product: dict) -> dict:
     }
 
 
-def fetch_by_barcode(barcode: str) -> dict | None:
-    # Barcode lookups are super direct: /product/<barcode>
-    url = f"{OFF_BASE}/product/{barcode}"
+class OpenFoodFactsClient:
+    # Reusable OFF client: one pooled keep-alive session (see services.http.build_session)
+    # plus the lookup cache. Timeouts are (connect, read) so a dead host fails fast while
+    # a slow-but-alive one still gets the full read budget, cut down to the caller's
+    # services.deadline budget when there is one.
+    #
+    # Lookups return details, or None when OFF says there's no such product. When OFF can't
+    # be asked (network error, timeout, 5xx, breaker open, deadline spent) they raise a
+    # requests.RequestException instead, so an outage never looks like "not found".
 
-    try:
-        resp = requests.get(url, params={"fields": FIELDS}, timeout=5)
-    except requests.RequestException:
-        # Network issues / timeout / DNS / etc. -> treat as "no result" for our app
-        return None
+    def __init__(
+        self,
+        base_url: str = OFF_BASE,
+        search_url: str = OFF_SEARCH_URL,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 5,
+        pool_size: int = 10,
+        retries: int = 2,
+        backoff: float = 0.3,
+        cache: TTLCache | None = None,
+        local_index=None,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.base_url = base_url
+        self.search_url = search_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = build_session(pool_size=pool_size, retries=retries, backoff=backoff)
+        self.cache = cache if cache is not None else TTLCache()
+        # Optional offline index (services.offdump.LocalIndex) checked before the network
+        self.local_index = local_index
+        # Concurrent lookups for the same key share one upstream request
+        self.inflight = SingleFlight(is_timeout=_is_lookup_timeout)
+        # Fails lookups fast while OFF is down or too slow, shared by both endpoints
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        # Optional timing hook (see Observer), e.g. the app's /metrics histograms
+        self.observer: Observer | None = None
 
-    if resp.status_code != 200:
-        return None
+    def close(self) -> None:
+        self.session.close()
+
+    def _observe(self, endpoint: str, outcome: str, started: float) -> None:
+        if self.observer is not None:
+            self.observer(endpoint, outcome, time.perf_counter() - started)
+
+    # ---------- public lookups ----------
+    def fetch_by_barcode(self, barcode: str) -> dict | None:
+        barcode = barcode.strip()
+
+        # Local-first: an imported dump answers in microseconds, the network is only for misses
+        if self.local_index is not None:
+            started = time.perf_counter()
+            details = self.local_index.get(barcode)
+            if details is not None:
+                self._observe("product", "local", started)
+                return details
+
+        return self._cached("product", f"barcode:{barcode}", lambda: self._lookup_barcode(barcode))
+
+    def refresh_by_barcode(self, barcode: str) -> dict | None:
+        # Always asks OFF (skipping the local index and cached answers) and caches the new answer
+        barcode = barcode.strip()
+        key = f"barcode:{barcode}"
+        return self.inflight.do(key, lambda: self._lookup_and_store("product", key, lambda: self._lookup_barcode(barcode)))
+
+    def fetch_by_name(self, name: str) -> dict | None:
+        # Best single match (or None); search_by_name has the full ranking
+        results = self.search_by_name(name, limit=1)
+        return results[0]["product"] if results else None
+
+    def search_by_name(self, name: str, limit: int = 5) -> list[dict]:
+        # Top `limit` candidates as [{"score": ..., "product": details}], best first.
+        # The whole ranked pool is cached, so any limit is served from one upstream call.
+        ranked = self._cached("search", _name_key(name), lambda: self._lookup_name(name))
+        return (ranked or [])[:limit]
+
+    # ---------- internals ----------
+    def _cached(self, endpoint: str, key: str, lookup):
+        # Serve from cache when we can. Otherwise do the real lookup and remember the answer,
+        # including "not found" (None), which gets the shorter negative TTL. Failures aren't
+        # cached, since the product might exist once OFF is reachable again.
+        started = time.perf_counter()
+        hit, value = self.cache.get(key)
+        if hit:
+            self._observe(endpoint, "hit", started)
+            return value
+
+        # On a miss, a burst of callers for the same barcode/name waits on one request
+        return self.inflight.do(key, lambda: self._lookup_and_store(endpoint, key, lookup))
+
+    def _lookup_and_store(self, endpoint: str, key: str, lookup):
+        started = time.perf_counter()
+        # A spent budget is the caller's problem, not OFF's, so it's checked before the breaker
+        deadline.check()
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            self._observe(endpoint, "rejected", started)
+            raise
+
+        try:
+            value = lookup()
+        except Exception as e:
+            # Anything that kept us from getting an answer (including a garbled body) counts
+            self.breaker.record(False, time.perf_counter() - started)
+            if isinstance(e, requests.RequestException):
+                self._observe(endpoint, "timeout" if _is_timeout(e) else "error", started)
+            raise
+
+        self.breaker.record(True, time.perf_counter() - started)
+        self._observe(endpoint, "not_found" if value is None else "found", started)
+        self.cache.set(key, value)
+        return value
+
+    def _get(self, url: str, params: dict) -> requests.Response:
+        return self.session.get(url, params=params, timeout=deadline.cap_timeout(self.timeout))
+
+    def _lookup_barcode(self, barcode: str) -> dict | None:
+        # Barcode lookups are super direct: /product/<barcode>
+        resp = self._get(f"{self.base_url}/product/{barcode}", {"fields": FIELDS})
+
+        # 404 is OFF's real "no such product" answer; anything else non-200 is an upstream problem
+        if resp.status_code == 404:
+            return None
+        if resp.status_code != 200:
+            raise requests.HTTPError(f"OpenFoodFacts returned HTTP {resp.status_code}", response=resp)
+
+        return _barcode_result(resp.json())
+
+    def _lookup_name(self, name: str) -> list[dict] | None:
+        resp = self._get(self.search_url, _name_params(name))
+
+        if resp.status_code != 200:
+            raise requests.HTTPError(f"OpenFoodFacts returned HTTP {resp.status_code}", response=resp)
+
+        return _name_result(name, resp.json())
+
+
+def _is_timeout(error: requests.RequestException) -> bool:
+    # Once retries run out, a read timeout surfaces as a ConnectionError wrapping urllib3's
+    # MaxRetryError, so look at the underlying reason too. (urllib3's NewConnectionError, e.g.
+    # DNS failure or connection refused, subclasses its timeout error for historical reasons.)
+    if isinstance(error, requests.Timeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, Urllib3TimeoutError) and not isinstance(reason, NewConnectionError)
 
-    payload = resp.json()
+
+def _is_lookup_timeout(error: BaseException) -> bool:
+    return isinstance(error, requests.RequestException) and _is_timeout(error)
+
+
+def _name_key(name: str) -> str:
+    # Case/whitespace don't change the search, so they shouldn't change the cache key either.
+    # ("names:" because these entries hold a ranked list; older "name:" entries held one dict.)
+    return "names:" + " ".join(name.lower().split())
+
+
+# Response handling shared by the sync client and the async one (services/openfoodfacts_async.py)
+def _barcode_result(payload: dict) -> dict | None:
     product = payload.get("product")
     if not product:
         return None
@@ -41,50 +220,122 @@ def fetch_by_barcode(barcode: str) -> dict | None:
     return _clean_product(product)
 
 
-def fetch_by_name(name: str) -> dict | None:
-    # Name search is surprisingly flaky on the v2 search endpoint, so we use the classic one.
-    # This gives better relevance for simple keyword searches.
-    url = "https://world.openfoodfacts.org/cgi/search.pl"
-
-    params = {
+def _name_params(name: str) -> dict:
+    return {
         "search_terms": name,
         "search_simple": 1,
         "action": "process",
         "json": 1,
-        "page_size": 25,  # pull a handful so we can pick a good match
+        "page_size": NAME_CANDIDATES,
+        # Only the fields we keep, instead of every field of every candidate
+        "fields": FIELDS,
     }
 
-    try:
-        resp = requests.get(url, params=params, timeout=5)
-    except requests.RequestException:
-        return None
-
-    if resp.status_code != 200:
-        return None
 
-    payload = resp.json()
-    products = payload.get("products") or []
-    if not products:
-        return None
+def _name_result(name: str, payload: dict) -> list[dict] | None:
+    # None (not an empty list) when nothing came back, so it gets the negative cache TTL
+    ranked = _rank_candidates(name, payload.get("products") or [])
+    return ranked or None
 
-    q = name.strip().lower()
 
-    # Prefer a product whose product_name actually contains the query (closer match)
-    best = None
-    for p in products:
-        pname = (p.get("product_name") or "").strip()
-        if not pname:
+def _rank_candidates(name: str, products: list[dict]) -> list[dict]:
+    # Score every named candidate and sort best first. OFF's own order breaks ties, since
+    # it already put candidates it considers relevant first.
+    query_tokens = tokenize(name)
+    scored = []
+    for rank, product in enumerate(products):
+        if not (product.get("product_name") or "").strip():
             continue
+        scored.append((_score_candidate(name, query_tokens, product), rank, product))
+
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [{"score": round(score, 4), "product": _clean_product(product)} for score, _, product in scored]
+
+
+def _score_candidate(name: str, query_tokens: list[str], product: dict) -> float:
+    # Per query word: exact word in the product name > a name word starting with it > a brand
+    # hit. Averaged over the query words, plus bonuses when the name starts with / equals the
+    # whole query, minus a little for every extra word so "Milk" beats "Milk chocolate bar".
+    if not query_tokens:
+        return 0.0
 
-        if q and q in pname.lower():
-            best = p
-            break
+    product_name = product.get("product_name") or ""
+    name_tokens = tokenize(product_name)
+    name_set = set(name_tokens)
+    brand_set = set(tokenize(product.get("brands")))
 
-        # Fallback: first product that at least has a name
-        if best is None:
-            best = p
+    total = 0.0
+    for token in query_tokens:
+        if token in name_set:
+            total += EXACT_TOKEN_SCORE
+        elif any(word.startswith(token) for word in name_tokens):
+            total += PREFIX_TOKEN_SCORE
+        elif token in brand_set:
+            total += BRAND_TOKEN_SCORE
+    score = total / len(query_tokens)
 
-    if best is None:
+    query = " ".join(query_tokens)
+    normalized_name = " ".join(name_tokens)
+    if normalized_name == query:
+        score += EXACT_NAME_BONUS
+    elif normalized_name.startswith(query):
+        score += NAME_PREFIX_BONUS
+
+    extra_words = len(name_set - set(query_tokens) - brand_set)
+    return max(score - EXTRA_TOKEN_PENALTY * extra_words, 0.0)
+
+
+def _local_index_from_env():
+    # OFF_LOCAL_DB points at a database built with `python -m services.offdump`
+    path = os.getenv("OFF_LOCAL_DB")
+    if not path:
         return None
 
-    return _clean_product(best)
+    # Imported here because offdump itself imports this module
+    from services.offdump import LocalIndex
+
+    return LocalIndex(path)
+
+
+# Shared client for the app. Everything is tunable via env vars; set OFF_CACHE_PATH to keep
+# the lookup cache across restarts.
+default_client = OpenFoodFactsClient(
+    # OFF_BASE_URL / OFF_SEARCH_URL point the app at another server (e.g. benchmarks/fake_off.py)
+    base_url=os.getenv("OFF_BASE_URL", OFF_BASE),
+    search_url=os.getenv("OFF_SEARCH_URL", OFF_SEARCH_URL),
+    connect_timeout=float(os.getenv("OFF_CONNECT_TIMEOUT", "3.05")),
+    read_timeout=float(os.getenv("OFF_READ_TIMEOUT", "5")),
+    pool_size=int(os.getenv("OFF_POOL_SIZE", "10")),
+    retries=int(os.getenv("OFF_RETRIES", "2")),
+    backoff=float(os.getenv("OFF_BACKOFF", "0.3")),
+    cache=TTLCache(
+        maxsize=int(os.getenv("OFF_CACHE_SIZE", "4096")),
+        ttl=float(os.getenv("OFF_CACHE_TTL", str(24 * 3600))),
+        negative_ttl=float(os.getenv("OFF_CACHE_NEGATIVE_TTL", "300")),
+        path=os.getenv("OFF_CACHE_PATH") or None,
+    ),
+    local_index=_local_index_from_env(),
+    breaker=CircuitBreaker(
+        window=float(os.getenv("OFF_BREAKER_WINDOW", "30")),
+        min_calls=int(os.getenv("OFF_BREAKER_MIN_CALLS", "10")),
+        failure_ratio=float(os.getenv("OFF_BREAKER_FAILURE_RATIO", "0.5")),
+        slow_call=float(os.getenv("OFF_BREAKER_SLOW_CALL", "2")),
+        slow_ratio=float(os.getenv("OFF_BREAKER_SLOW_RATIO", "0.8")),
+        open_seconds=float(os.getenv("OFF_BREAKER_OPEN_SECONDS", "15")),
+    ),
+)
+cache = default_client.cache
+if cache.path:
+    atexit.register(cache.save)
+
+
+def fetch_by_barcode(barcode: str) -> dict | None:
+    return default_client.fetch_by_barcode(barcode)
+
+
+def fetch_by_name(name: str) -> dict | None:
+    return default_client.fetch_by_name(name)
+
+
+def search_by_name(name: str, limit: int = 5) -> list[dict]:
+    return default_client.search_by_name(name, limit)
@@ -0,0 +1,197 @@
+import asyncio
+import time
+
+import httpx
+import requests
+
+from services import deadline, openfoodfacts
+from services.breaker import CircuitBreaker, CircuitOpenError
+from services.cache import TTLCache
+from services.http import RETRY_STATUSES
+from services.openfoodfacts import FIELDS, OFF_BASE, OFF_SEARCH_URL, Observer
+from services.singleflight import AsyncSingleFlight
+
+
+class AsyncOpenFoodFactsClient:
+    # asyncio version of OpenFoodFactsClient for code that runs many lookups at once (bulk
+    # enrichment, an async serving path). Waiting on OFF costs a suspended coroutine instead
+    # of a blocked thread, so hundreds of lookups can be in flight on one thread.
+    #
+    # Same behavior as the sync client: (connect, read) timeouts, a keep-alive pool capped at
+    # pool_size connections, retries with exponential backoff on 429/5xx and connection
+    # errors, local-first barcode lookups, the same TTL cache and circuit breaker (shared
+    # with the sync client by default), the caller's services.deadline budget and coalescing
+    # of concurrent lookups for the same key. Lookups that can't reach OFF raise rather than
+    # returning None: httpx.HTTPError, or CircuitOpenError / DeadlineExceeded like the sync
+    # client.
+    #
+    # The connection pool belongs to the event loop that first uses it, so create one client
+    # per loop, ideally as `async with AsyncOpenFoodFactsClient() as client:`.
+
+    def __init__(
+        self,
+        base_url: str = OFF_BASE,
+        search_url: str = OFF_SEARCH_URL,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 5,
+        pool_size: int = 100,
+        retries: int = 2,
+        backoff: float = 0.3,
+        cache: TTLCache | None = None,
+        local_index=None,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.base_url = base_url
+        self.search_url = search_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self.cache = cache if cache is not None else openfoodfacts.cache
+        self.local_index = local_index if local_index is not None else openfoodfacts.default_client.local_index
+        # Sharing the sync client's breaker means an outage seen by either trips both
+        self.breaker = breaker if breaker is not None else openfoodfacts.default_client.breaker
+        self.inflight = AsyncSingleFlight(is_timeout=_is_timeout)
+        self.observer: Observer | None = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.http.aclose()
+
+    def _observe(self, endpoint: str, outcome: str, started: float) -> None:
+        if self.observer is not None:
+            self.observer(endpoint, outcome, time.perf_counter() - started)
+
+    # ---------- public lookups ----------
+    async def fetch_by_barcode(self, barcode: str) -> dict | None:
+        barcode = barcode.strip()
+
+        # The local index is a single indexed SQLite read, cheap enough to do inline on the loop
+        if self.local_index is not None:
+            started = time.perf_counter()
+            details = self.local_index.get(barcode)
+            if details is not None:
+                self._observe("product", "local", started)
+                return details
+
+        return await self._cached("product", f"barcode:{barcode}", lambda: self._lookup_barcode(barcode))
+
+    async def fetch_by_name(self, name: str) -> dict | None:
+        results = await self.search_by_name(name, limit=1)
+        return results[0]["product"] if results else None
+
+    async def search_by_name(self, name: str, limit: int = 5) -> list[dict]:
+        ranked = await self._cached("search", openfoodfacts._name_key(name), lambda: self._lookup_name(name))
+        return (ranked or [])[:limit]
+
+    async def fetch_many(self, barcodes, concurrency: int = 50) -> dict[str, dict | Exception | None]:
+        # Look up many barcodes with at most `concurrency` requests in flight at once.
+        # Returns {barcode: details, None if OFF has no such product, or the exception if the
+        # lookup failed (network error, a garbled body, breaker open, ...)}; duplicates are
+        # only looked up once. One bad barcode doesn't lose the rest of the batch, and an
+        # outage never looks like "not found".
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(barcode: str) -> dict | Exception | None:
+            async with semaphore:
+                try:
+                    return await self.fetch_by_barcode(barcode)
+                except Exception as e:
+                    return e
+
+        unique = list(dict.fromkeys(barcode.strip() for barcode in barcodes))
+        results = await asyncio.gather(*(one(barcode) for barcode in unique))
+        return dict(zip(unique, results))
+
+    # ---------- internals ----------
+    async def _cached(self, endpoint: str, key: str, lookup):
+        started = time.perf_counter()
+        hit, value = self.cache.get(key)
+        if hit:
+            self._observe(endpoint, "hit", started)
+            return value
+
+        # Failures aren't cached, same as the sync client
+        return await self.inflight.do(key, lambda: self._lookup_and_store(endpoint, key, lookup))
+
+    async def _lookup_and_store(self, endpoint: str, key: str, lookup):
+        # Same order as the sync client: the budget, then the breaker, then OFF
+        started = time.perf_counter()
+        deadline.check()
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            self._observe(endpoint, "rejected", started)
+            raise
+
+        try:
+            value = await lookup()
+        except Exception as e:
+            self.breaker.record(False, time.perf_counter() - started)
+            if isinstance(e, (httpx.HTTPError, requests.RequestException)):
+                self._observe(endpoint, "timeout" if _is_timeout(e) else "error", started)
+            raise
+
+        self.breaker.record(True, time.perf_counter() - started)
+        self._observe(endpoint, "not_found" if value is None else "found", started)
+        self.cache.set(key, value)
+        return value
+
+    async def _get(self, url: str, params: dict) -> httpx.Response:
+        # Retry loop mirroring services.http.build_session: backoff, 2*backoff, 4*backoff...
+        # and honor Retry-After (in seconds) when OFF rate limits us. Each attempt's timeouts
+        # are cut down to the budget left, and none starts once it's spent.
+        for attempt in range(self.retries + 1):
+            last_try = attempt == self.retries
+            connect, read = deadline.cap_timeout(self.timeout)
+            try:
+                resp = await self.http.get(url, params=params, timeout=httpx.Timeout(read, connect=connect))
+            except httpx.TransportError:
+                if last_try:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            if resp.status_code not in RETRY_STATUSES or last_try:
+                return resp
+
+            delay = self.backoff * 2 ** attempt
+            retry_after = resp.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            await asyncio.sleep(delay)
+
+    async def _lookup_barcode(self, barcode: str) -> dict | None:
+        resp = await self._get(f"{self.base_url}/product/{barcode}", {"fields": FIELDS})
+
+        if resp.status_code == 404:
+            return None
+        if resp.status_code != 200:
+            raise httpx.HTTPStatusError(
+                f"OpenFoodFacts returned HTTP {resp.status_code}", request=resp.request, response=resp
+            )
+
+        return openfoodfacts._barcode_result(resp.json())
+
+    async def _lookup_name(self, name: str) -> list[dict] | None:
+        resp = await self._get(self.search_url, openfoodfacts._name_params(name))
+
+        if resp.status_code != 200:
+            raise httpx.HTTPStatusError(
+                f"OpenFoodFacts returned HTTP {resp.status_code}", request=resp.request, response=resp
+            )
+
+        return openfoodfacts._name_result(name, resp.json())
+
+
+def _is_timeout(error: BaseException) -> bool:
+    # DeadlineExceeded is a requests.Timeout
+    return isinstance(error, (httpx.TimeoutException, requests.Timeout))
@@ -0,0 +1,32 @@
+import threading
+import time
+
+
+class RateLimiter:
+    # Token bucket shared by every worker thread: at most `rate` calls per second on average,
+    # with short bursts of up to `burst` calls. acquire() blocks until a token is available.
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                # Not enough tokens yet: work out how long until the next one shows up
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
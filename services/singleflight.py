@@ -0,0 +1,127 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable
+
+import requests
+
+from services import deadline
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+        # The leader's budget: its timeouts are only final for waiters that don't have more
+        self.ends = deadline.ends_at()
+
+
+def _is_requests_timeout(error: BaseException) -> bool:
+    # DeadlineExceeded is one of these too
+    return isinstance(error, requests.Timeout)
+
+
+class SingleFlight:
+    # Collapses concurrent calls for the same key into one: the first caller (the "leader")
+    # runs fn, everyone who shows up while it's running waits and gets the same result or
+    # the same exception. Once the call finishes the key is free again.
+    #
+    # Waiters keep their own services.deadline budget: one whose budget runs out before the
+    # leader finishes gets DeadlineExceeded, and the leader carries on for the others. If the
+    # leader times out and a waiter's budget ends later, the waiter calls again (leading a
+    # new flight) rather than failing with a timeout that was never its own.
+
+    def __init__(self, is_timeout: Callable[[BaseException], bool] = _is_requests_timeout):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self.is_timeout = is_timeout
+        # How many callers got a shared result instead of making their own call
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                return self._lead(key, call, fn)
+            if not call.done.wait(deadline.remaining()):
+                raise deadline.DeadlineExceeded("Request deadline exceeded")
+            if call.error is None:
+                return call.result
+            # The leader timed out, maybe only because its budget was shorter than this one's
+            if not (self.is_timeout(call.error) and deadline.outlives(call.ends)):
+                raise call.error
+
+    def _join(self, key: str) -> tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        return call, leader
+
+    def _lead(self, key: str, call: _Call, fn: Callable[[], Any]) -> Any:
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+
+class AsyncSingleFlight:
+    # SingleFlight for coroutines on one event loop: the first caller for a key runs the
+    # coroutine, later callers await the same future. No lock needed since everything here
+    # runs on the loop's thread. Deadlines work like SingleFlight's, retries included.
+
+    def __init__(self, is_timeout: Callable[[BaseException], bool] = _is_requests_timeout):
+        # key -> (future, when the leader's budget ends)
+        self._calls: dict[str, tuple[asyncio.Future, float | None]] = {}
+        self.is_timeout = is_timeout
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while key in self._calls:
+            future, leader_ends = self._calls[key]
+            self.coalesced += 1
+            # shield() so one waiter being cancelled (or out of time) doesn't cancel the call
+            # for everyone else
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), deadline.remaining())
+            except asyncio.TimeoutError:
+                raise deadline.DeadlineExceeded("Request deadline exceeded") from None
+            except Exception as e:
+                if not (self.is_timeout(e) and deadline.outlives(leader_ends)):
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = (future, deadline.ends_at())
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved so a call nobody else waited on doesn't log "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
@@ -0,0 +1,462 @@
+import marshal
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from itertools import compress
+from typing import Iterable, Iterator, Sequence
+
+from storage.memory import SIZE_SAMPLE, _deep_size
+
+# Full scans read this many rows per batch (column slices are cheap C copies)
+SCAN_CHUNK = 1024
+
+# Sequence numbers are 32 bit and wrap around; readers only compare them for equality
+_SEQ_MASK = 0xFFFFFFFF
+_INT64_MIN, _INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+# load() stores a repeated name once. Only this many distinct names are remembered while
+# loading, so a load where every name is unique doesn't hold a second copy of all of them.
+LOAD_DEDUPE_NAMES = 65536
+
+# Renames leave their old bytes behind in the name buffer; the buffer is rewritten once that
+# garbage is more than half of it (and at least this big)
+NAME_GARBAGE_MIN = 1 << 20
+
+
+def _numeric_columns(product: dict) -> tuple[float, int, dict | None]:
+    # (price, stock, overflow). The API doesn't type-check, so a price that isn't a float
+    # (an int like 3, a string, None) or a stock that isn't a 64 bit int can't go in the typed
+    # arrays without changing what the client gets back. Those rare values are kept as-is in
+    # a per-row overflow dict instead.
+    price = product.get("price", 0.0)
+    stock = product.get("stock", 0)
+    overflow = None
+    if type(price) is not float:
+        overflow = {"price": price}
+        price = 0.0
+    if type(stock) is not int or not _INT64_MIN <= stock <= _INT64_MAX:
+        overflow = overflow or {}
+        overflow["stock"] = stock
+        stock = 0
+    return price, stock, overflow
+
+
+def _encode_details(details) -> bytes | None:
+    # Empty details (most products until they're enriched) cost nothing but the list slot.
+    # marshal handles every JSON type, is smaller than JSON text and decodes ~2.5x faster.
+    # Its format can change between Python versions, which is fine for bytes that only ever
+    # live in this process (the journal/snapshots store real product dicts).
+    if not details:
+        return None
+    return marshal.dumps(details)
+
+
+def _decode_details(blob: bytes | None) -> dict:
+    return marshal.loads(blob) if blob is not None else {}
+
+
+class _Columns:
+    # One generation of column storage. Row i of every column belongs to the product ids[i].
+    # Compaction builds a new _Columns and swaps it in, so a reader that grabbed the old one
+    # keeps a consistent (if slightly stale) view.
+    __slots__ = (
+        "ids", "prices", "stocks", "names", "name_starts", "name_lengths", "name_garbage",
+        "barcodes", "details", "alive", "seq", "overflow",
+    )
+
+    def __init__(self):
+        self.ids = array("q")
+        self.prices = array("d")
+        self.stocks = array("q")
+        # Names as UTF-8, back to back in one buffer: row i is names[name_starts[i]:][:name_lengths[i]],
+        # and a start of -1 means None. A str object per row costs ~50 bytes more than its text,
+        # plus an interned-dict slot, which is most of a row when names are unique.
+        self.names = bytearray()
+        self.name_starts = array("q")
+        self.name_lengths = array("I")
+        # Bytes in `names` no row points at any more (left behind by renames)
+        self.name_garbage = 0
+        # Barcodes stay str objects: the barcode index needs one per barcode as its key
+        # anyway, and the column shares it
+        self.barcodes: list[str | None] = []
+        self.details: list[bytes | None] = []
+        self.alive = bytearray()
+        self.seq = array("I")
+        # slot -> {field: value} for values the columns can't hold (see _numeric_columns)
+        self.overflow: dict[int, dict] = {}
+
+    def append(self, product: dict, seen: dict | None = None) -> None:
+        # ids goes last: a lock-free reader finds rows through ids, so every other column
+        # must already have the row by the time the id shows up
+        price, stock, overflow = _numeric_columns(product)
+        start, length = self.pack_name(product.get("name"), seen)
+        if start == -2:
+            overflow = dict(overflow or {}, name=product.get("name"))
+            start = -1
+        if overflow:
+            self.overflow[len(self.ids)] = overflow
+        self.prices.append(price)
+        self.stocks.append(stock)
+        self.name_starts.append(start)
+        self.name_lengths.append(length)
+        self.barcodes.append(product.get("barcode"))
+        self.details.append(_encode_details(product.get("details")))
+        self.alive.append(1)
+        self.seq.append(0)
+        self.ids.append(product["id"])
+
+    def pack_name(self, name, seen: dict | None = None) -> tuple[int, int]:
+        # Add a name to the buffer -> (start, length). (-1, 0) is None; (-2, 0) means it can't
+        # be stored as UTF-8 (not a str, or a lone surrogate) and belongs in the overflow.
+        if name is None:
+            return -1, 0
+        if type(name) is not str:
+            return -2, 0
+        if seen is not None:
+            known = seen.get(name)
+            if known is not None:
+                return known
+        try:
+            data = name.encode()
+        except UnicodeEncodeError:
+            return -2, 0
+        packed = len(self.names), len(data)
+        self.names += data
+        if seen is not None and len(seen) < LOAD_DEDUPE_NAMES:
+            seen[name] = packed
+        return packed
+
+    def name(self, slot: int) -> str | None:
+        start = self.name_starts[slot]
+        if start < 0:
+            return None
+        return self.names[start:start + self.name_lengths[slot]].decode()
+
+    def name_list(self, lo: int, hi: int) -> list[str | None]:
+        # Names of rows lo..hi-1 (None where the row has none, or keeps it in the overflow)
+        names = self.names
+        return [
+            names[start:start + length].decode() if start >= 0 else None
+            for start, length in zip(self.name_starts[lo:hi], self.name_lengths[lo:hi])
+        ]
+
+
+class CompactBackend:
+    # Column-oriented in-memory storage for big inventories. Instead of one dict per product
+    # (a few hundred bytes each before any enrichment data) products are spread over columns:
+    #   - id / price / stock in typed arrays (8 bytes per value, no Python objects)
+    #   - names packed as UTF-8 in one byte buffer with per-row offsets (a name repeated
+    #     across a load() is stored once)
+    #   - details kept as marshal-encoded bytes and only decoded when a product is read;
+    #     empty details cost nothing
+    # Reads build a fresh dict per call, so the JSON output is exactly what MemoryBackend gives.
+    # Whole-column scans (store.column("stock")) run over the arrays without building dicts.
+    #
+    # Concurrency, same guarantees as MemoryBackend:
+    #   - reads take no lock. An update rewrites several columns, so every row has a sequence
+    #     number (a seqlock): writers make it odd while they work, and readers retry if it was
+    #     odd or changed while they read, so nobody sees half an update.
+    #   - structural writes (insert/delete/barcode changes/compaction) take _lock.
+    #   - ids only ever grow (the store inserts in id order), so rows are found by bisecting ids.
+
+    # Contents are lost on exit unless storage.journal is attached
+    persistent = False
+
+    def __init__(self):
+        self._cols = _Columns()
+        self._by_barcode: dict[str, int | tuple[int, ...]] = {}
+        self._count = 0
+        self._tombstones = 0
+        self._lock = threading.Lock()
+
+    # ---------- bulk load ----------
+    def load(self, rows: Iterable[dict]) -> None:
+        cols = _Columns()
+        by_barcode: dict = {}
+        seen: dict = {}
+        # Seed rows might not be in id order, so sort once here (inserts are always appended)
+        for product in sorted(rows, key=lambda p: p["id"]):
+            cols.append(product, seen)
+            _index_barcode(by_barcode, cols.barcodes[-1], product["id"])
+
+        with self._lock:
+            self._cols = cols
+            self._by_barcode = by_barcode
+            self._count = len(cols.ids)
+            self._tombstones = 0
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    # ---------- reads ----------
+    def count(self) -> int:
+        return self._count
+
+    def max_id(self) -> int:
+        ids = self._cols.ids
+        return ids[-1] if ids else 0
+
+    def get(self, product_id: int) -> dict | None:
+        cols = self._cols
+        slot = bisect_left(cols.ids, product_id)
+        if slot == len(cols.ids) or cols.ids[slot] != product_id:
+            return None
+        return self._read(cols, slot)
+
+    def _read(self, cols: _Columns, slot: int) -> dict | None:
+        while True:
+            seq = cols.seq[slot]
+            if seq & 1:
+                # A writer is halfway through this row; let it finish
+                time.sleep(0)
+                continue
+            if not cols.alive[slot]:
+                return None
+            details = cols.details[slot]
+            product = {
+                "id": cols.ids[slot],
+                "name": cols.name(slot),
+                "barcode": cols.barcodes[slot],
+                "price": cols.prices[slot],
+                "stock": cols.stocks[slot],
+                "details": _decode_details(details),
+            }
+            overflow = cols.overflow.get(slot)
+            if overflow:
+                product.update(overflow)
+            if cols.seq[slot] == seq:
+                return product
+
+    def find_by_barcode(self, barcode: str) -> list[dict]:
+        ids = self._by_barcode.get(barcode)
+        if ids is None:
+            return []
+        if isinstance(ids, int):
+            ids = (ids,)
+        return [p for p in (self.get(i) for i in sorted(ids)) if p is not None]
+
+    def iter_products(self, after: int | None = None) -> Iterator[dict]:
+        # Rows are built a chunk at a time from column slices. If a writer touched the chunk
+        # while we copied it (seq changed or odd), that chunk is re-read row by row instead.
+        cols = self._cols
+        start = bisect_right(cols.ids, after) if after is not None else 0
+        end = len(cols.ids)
+        for lo in range(start, end, SCAN_CHUNK):
+            hi = min(lo + SCAN_CHUNK, end)
+            seq = cols.seq[lo:hi]
+            names = cols.names
+            products = [
+                {
+                    "id": product_id,
+                    # Inlined name() and _decode_details: a function call per row is
+                    # measurable at 1M rows
+                    "name": names[name_start:name_start + name_length].decode() if name_start >= 0 else None,
+                    "barcode": barcode,
+                    "price": price,
+                    "stock": stock,
+                    "details": marshal.loads(details) if details is not None else {},
+                }
+                for product_id, name_start, name_length, barcode, price, stock, details, alive in zip(
+                    cols.ids[lo:hi], cols.name_starts[lo:hi], cols.name_lengths[lo:hi], cols.barcodes[lo:hi],
+                    cols.prices[lo:hi], cols.stocks[lo:hi], cols.details[lo:hi], cols.alive[lo:hi],
+                )
+                if alive
+            ]
+
+            if seq != cols.seq[lo:hi] or any(value & 1 for value in seq):
+                products = [p for p in (self._read(cols, slot) for slot in range(lo, hi)) if p is not None]
+            elif cols.overflow:
+                for product in products:
+                    slot = bisect_left(cols.ids, product["id"], lo, hi)
+                    overflow = cols.overflow.get(slot)
+                    if overflow:
+                        product.update(overflow)
+
+            yield from products
+
+    def column(self, field: str) -> Sequence:
+        # One field for every product in id order, straight from the column storage. With no
+        # deleted rows in this generation that's a plain copy of the array (a memcpy).
+        cols = self._cols
+        rows = len(cols.ids)
+        alive = cols.alive[:rows]
+        all_alive = self._tombstones == 0 and alive.count(0) == 0
+        if field == "details":
+            return [_decode_details(d) for d in compress(cols.details, alive)]
+
+        if field in ("name", "price", "stock") and any(field in extra for extra in list(cols.overflow.values())):
+            # Rare slow path: some rows keep this field outside its column
+            values = {"name": cols.name_list(0, rows), "price": cols.prices, "stock": cols.stocks}[field]
+            out = []
+            for slot in range(rows):
+                if alive[slot]:
+                    extra = cols.overflow.get(slot)
+                    out.append(extra[field] if extra and field in extra else values[slot])
+            return out
+
+        if field == "name":
+            names = cols.name_list(0, rows)
+            return names if all_alive else list(compress(names, alive))
+
+        source = {
+            "id": cols.ids,
+            "barcode": cols.barcodes,
+            "price": cols.prices,
+            "stock": cols.stocks,
+        }[field]
+        if all_alive:
+            return source[:rows]
+        return list(compress(source, alive))
+
+    def size_bytes(self) -> int:
+        # Arrays, lists and the name buffer are measured exactly; barcodes and details blobs are sampled
+        cols = self._cols
+        fixed = sum(sys.getsizeof(c) for c in (
+            cols.ids, cols.prices, cols.stocks, cols.names, cols.name_starts, cols.name_lengths,
+            cols.barcodes, cols.details, cols.alive, cols.seq,
+        ))
+        rows = len(cols.ids)
+        step = max(rows // SIZE_SAMPLE, 1)
+        sampled = range(0, rows, step)[:SIZE_SAMPLE]
+        variable = 0
+        if sampled:
+            per_row = sum(_deep_size(cols.barcodes[i]) + _deep_size(cols.details[i]) for i in sampled)
+            variable = per_row * rows // len(sampled)
+        return fixed + variable + sys.getsizeof(self._by_barcode)
+
+    # ---------- writes ----------
+    def insert(self, product: dict) -> None:
+        with self._lock:
+            cols = self._cols
+            cols.append(product)
+            _index_barcode(self._by_barcode, cols.barcodes[-1], product["id"])
+            self._count += 1
+
+    def replace(self, old: dict, new: dict) -> None:
+        cols = self._cols
+        slot = bisect_left(cols.ids, new["id"])
+        barcode_changed = old.get("barcode") != new.get("barcode")
+
+        # The store already serializes writes to one product; _lock only matters for the
+        # barcode index and to keep a compaction from swapping columns mid-write
+        with self._lock:
+            if cols is not self._cols:
+                cols = self._cols
+                slot = bisect_left(cols.ids, new["id"])
+
+            price, stock, overflow = _numeric_columns(new)
+            details = _encode_details(new.get("details"))
+            name_start, name_length = cols.name_starts[slot], cols.name_lengths[slot]
+            if new.get("name") != old.get("name"):
+                # The new name goes on the end of the buffer; readers still slicing the old one
+                # are unaffected, and it's reclaimed when the buffer is rewritten
+                if name_start >= 0:
+                    cols.name_garbage += name_length
+                name_start, name_length = cols.pack_name(new.get("name"))
+            if name_start == -2 or (name_start == -1 and new.get("name") is not None):
+                overflow = dict(overflow or {}, name=new.get("name"))
+                name_start = -1
+            cols.seq[slot] = (cols.seq[slot] + 1) & _SEQ_MASK
+            cols.name_starts[slot] = name_start
+            cols.name_lengths[slot] = name_length
+            cols.barcodes[slot] = new.get("barcode")
+            cols.prices[slot] = price
+            cols.stocks[slot] = stock
+            cols.details[slot] = details
+            if overflow:
+                cols.overflow[slot] = overflow
+            else:
+                cols.overflow.pop(slot, None)
+            cols.seq[slot] = (cols.seq[slot] + 1) & _SEQ_MASK
+
+            if barcode_changed:
+                _unindex_barcode(self._by_barcode, old.get("barcode"), old["id"])
+                _index_barcode(self._by_barcode, cols.barcodes[slot], new["id"])
+
+            if cols.name_garbage > NAME_GARBAGE_MIN and cols.name_garbage * 2 > len(cols.names):
+                self._compact()
+
+    def delete(self, product_id: int) -> dict | None:
+        with self._lock:
+            cols = self._cols
+            slot = bisect_left(cols.ids, product_id)
+            if slot == len(cols.ids) or cols.ids[slot] != product_id or not cols.alive[slot]:
+                return None
+
+            product = self._read(cols, slot)
+            cols.alive[slot] = 0
+            cols.overflow.pop(slot, None)
+            if cols.name_starts[slot] >= 0:
+                cols.name_garbage += cols.name_lengths[slot]
+            _unindex_barcode(self._by_barcode, product.get("barcode"), product_id)
+            self._count -= 1
+
+            self._tombstones += 1
+            if self._tombstones > 1024 and self._tombstones * 2 > len(cols.ids):
+                self._compact()
+
+        return product
+
+    def _compact(self) -> None:
+        # Copy live rows into a fresh generation; readers holding the old one are unaffected
+        old = self._cols
+        cols = _Columns()
+        keep = [slot for slot in range(len(old.ids)) if old.alive[slot]]
+        cols.prices = array("d", (old.prices[i] for i in keep))
+        cols.stocks = array("q", (old.stocks[i] for i in keep))
+        # Rows that shared a name (from load()) keep sharing it
+        moved: dict[int, int] = {}
+        for i in keep:
+            start, length = old.name_starts[i], old.name_lengths[i]
+            if start >= 0:
+                if start not in moved:
+                    moved[start] = len(cols.names)
+                    cols.names += old.names[start:start + length]
+                start = moved[start]
+            cols.name_starts.append(start)
+            cols.name_lengths.append(length)
+        cols.barcodes = [old.barcodes[i] for i in keep]
+        cols.details = [old.details[i] for i in keep]
+        cols.alive = bytearray(b"\x01" * len(keep))
+        cols.seq = array("I", bytes(4 * len(keep)))
+        cols.overflow = {new: old.overflow[slot] for new, slot in enumerate(keep) if slot in old.overflow}
+        cols.ids = array("q", (old.ids[i] for i in keep))
+        self._cols = cols
+        self._tombstones = 0
+
+
+# ---------- barcode index helpers ----------
+# Values are a bare id (the usual case) or a tuple of ids; both are replaced, never edited.
+# Only string barcodes are indexed (a list or dict isn't hashable, and can't be looked up).
+def _index_barcode(index: dict, barcode: str | None, product_id: int) -> None:
+    if not barcode or not isinstance(barcode, str):
+        return
+    current = index.get(barcode)
+    if current is None:
+        index[barcode] = product_id
+    elif isinstance(current, int):
+        index[barcode] = (current, product_id)
+    else:
+        index[barcode] = current + (product_id,)
+
+
+def _unindex_barcode(index: dict, barcode: str | None, product_id: int) -> None:
+    current = index.get(barcode) if barcode and isinstance(barcode, str) else None
+    if current is None:
+        return
+    if isinstance(current, int):
+        if current == product_id:
+            del index[barcode]
+        return
+
+    rest = tuple(i for i in current if i != product_id)
+    if len(rest) > 1:
+        index[barcode] = rest
+    elif rest:
+        index[barcode] = rest[0]
+    else:
+        del index[barcode]
@@ -0,0 +1,257 @@
+import gc
+import glob
+import json
+import os
+import pickle
+import threading
+import time
+
+from store import PRODUCT_FIELDS
+
+SNAPSHOT_NAME = "snapshot.bin"
+SEGMENT_PATTERN = "journal-*.log"
+
+
+def _segment_start(path: str) -> int:
+    # journal-000000000042.log -> 42 (first seq that can be in the file)
+    return int(os.path.basename(path)[len("journal-"):-len(".log")])
+
+
+def _fsync_dir(directory: str) -> None:
+    # Renames/creates are only durable once the directory entry itself is flushed
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    # Durability for the in-memory store without slowing writes down much.
+    #
+    # Every store change is appended to a journal segment as one JSON line with a sequence
+    # number. Writers don't fsync themselves: a flusher thread batches everything that
+    # arrived in the last group_commit_ms into one write+fsync ("group commit"), then wakes
+    # the writers up. Every snapshot_every records we write a compact pickle snapshot of the
+    # whole store, start a new segment and delete the segments the snapshot covers.
+    #
+    # Startup = load the latest snapshot, then replay whatever journal entries came after it.
+    # Snapshots are taken while writes keep going, which is fine because replaying entries
+    # newer than the snapshot's seq is idempotent (adds/updates are upserts, deletes of
+    # missing rows are no-ops).
+
+    def __init__(self, directory: str, snapshot_every: int = 100_000, group_commit_ms: float = 2, sync: bool = True):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.group_commit_ms = group_commit_ms
+        self.sync = sync
+        os.makedirs(directory, exist_ok=True)
+
+        self._store = None
+        self._cond = threading.Condition()
+        self._pending: list[str] = []
+        self._seq = 0
+        self._flushed_seq = 0
+        self._since_snapshot = 0
+        self._snapshotting = False
+        self._snapshot_lock = threading.Lock()
+        self._closed = False
+        self._segment = None
+        self._flusher: threading.Thread | None = None
+
+    # ---------- startup ----------
+    def attach(self, store) -> int:
+        # Rebuild the store from disk, then start journaling its changes. Returns how many
+        # journal entries were replayed on top of the snapshot.
+        # Only for in-memory backends: restoring replaces the store's contents, which would wipe
+        # a database that keeps its own rows. A store that already has rows when there's nothing
+        # on disk yet is kept as is and snapshotted instead.
+        if getattr(store.backend, "persistent", False):
+            raise ValueError("The journal is for in-memory backends; this backend persists its own rows")
+        self._store = store
+
+        # Recovery allocates millions of long-lived objects; letting the cyclic GC rescan them
+        # over and over roughly doubles restart time, so pause it until we're done
+        gc.disable()
+        try:
+            snapshot_seq, next_id, rows = self._read_snapshot()
+            found = os.path.exists(os.path.join(self.directory, SNAPSHOT_NAME))
+
+            replayed = 0
+            self._seq = snapshot_seq
+            for path in self._segments():
+                for entry in self._read_segment(path):
+                    if entry["seq"] <= snapshot_seq:
+                        continue
+                    self._apply(rows, entry)
+                    self._seq = entry["seq"]
+                    replayed += 1
+                    found = True
+                    if entry["op"] == "add":
+                        next_id = max(next_id, entry["product"]["id"] + 1)
+
+            adopt = not found and len(store) > 0
+            if not adopt:
+                store.load(rows.values(), next_id=next_id)
+        finally:
+            gc.enable()
+        self._flushed_seq = self._seq
+
+        # Always start a fresh segment, so a torn last line in the old one never gets appended to
+        self._open_segment(self._seq + 1)
+        self._flusher = threading.Thread(target=self._flush_loop, name="journal-flusher", daemon=True)
+        self._flusher.start()
+
+        store.subscribe(self.on_change, replay=False)
+        if adopt:
+            self.snapshot()
+        return replayed
+
+    @staticmethod
+    def _apply(rows: dict, entry: dict) -> None:
+        op = entry["op"]
+        if op == "clear":
+            rows.clear()
+        elif op == "delete":
+            rows.pop(entry["id"], None)
+        else:
+            product = entry["product"]
+            rows[product["id"]] = product
+
+    def _read_snapshot(self) -> tuple[int, int, dict]:
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if not os.path.exists(path):
+            return 0, 1, {}
+
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+
+        # Rows are stored as (id, *PRODUCT_FIELDS) tuples, much smaller and faster than dicts
+        keys = ("id",) + PRODUCT_FIELDS
+        rows = {values[0]: dict(zip(keys, values)) for values in snapshot["rows"]}
+        return snapshot["seq"], snapshot["next_id"], rows
+
+    def _segments(self) -> list[str]:
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)), key=_segment_start)
+
+    @staticmethod
+    def _read_segment(path: str):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A crash mid-write can leave a partial last line; everything before it is good
+                    return
+
+    # ---------- writing ----------
+    def on_change(self, action: str, old: dict | None, new: dict | None) -> None:
+        # Store listener: turn the change into a journal record and (optionally) wait until
+        # it's on disk before the request that caused it returns
+        if action == "delete":
+            record = {"op": "delete", "id": old["id"]}
+        elif action == "clear":
+            record = {"op": "clear"}
+        else:
+            record = {"op": action, "product": new}
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("journal is closed")
+            self._seq += 1
+            seq = record["seq"] = self._seq
+            self._pending.append(json.dumps(record, separators=(",", ":")) + "\n")
+            self._cond.notify_all()
+
+            if self.sync:
+                while self._flushed_seq < seq and not self._closed:
+                    self._cond.wait()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+
+            # Give other writers a moment to join this batch, then take everything at once
+            if self.group_commit_ms:
+                time.sleep(self.group_commit_ms / 1000)
+
+            with self._cond:
+                batch, self._pending = self._pending, []
+                batch_seq = self._seq
+
+            self._segment.write("".join(batch))
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+
+            with self._cond:
+                self._flushed_seq = batch_seq
+                self._since_snapshot += len(batch)
+                self._cond.notify_all()
+                start_snapshot = self._since_snapshot >= self.snapshot_every and not self._snapshotting
+                if start_snapshot:
+                    self._snapshotting = True
+
+            if start_snapshot:
+                threading.Thread(target=self.snapshot, name="journal-snapshot", daemon=True).start()
+
+    def _open_segment(self, start_seq: int) -> None:
+        path = os.path.join(self.directory, f"journal-{start_seq:012d}.log")
+        self._segment = open(path, "a", encoding="utf-8")
+        _fsync_dir(self.directory)
+
+    # ---------- snapshots ----------
+    def snapshot(self) -> None:
+        # Write a full snapshot and drop the journal segments it makes redundant
+        with self._snapshot_lock:
+            if not self._closed:
+                self._write_snapshot()
+        with self._cond:
+            self._snapshotting = False
+
+    def _write_snapshot(self) -> None:
+        with self._cond:
+            # Wait until everything journaled so far is on disk, then switch to a new segment.
+            # Entries up to snapshot_seq live in old segments; newer ones go to the new one.
+            while self._flushed_seq < self._seq:
+                self._cond.wait()
+            snapshot_seq = self._seq
+            old_segment = self._segment
+            self._open_segment(snapshot_seq + 1)
+            self._since_snapshot = 0
+        old_segment.close()
+
+        store = self._store
+        snapshot = {
+            "seq": snapshot_seq,
+            "next_id": store.next_id,
+            "rows": [(p["id"],) + tuple(p.get(f) for f in PRODUCT_FIELDS) for p in store.iter_products()],
+        }
+
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(self.directory)
+
+        # Segments that started at or before the snapshot are fully covered by it now
+        for segment in self._segments():
+            if _segment_start(segment) <= snapshot_seq:
+                os.remove(segment)
+
+    def close(self) -> None:
+        # Flush whatever is pending, stop the flusher thread and let a running snapshot finish
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._snapshot_lock:
+            if self._segment is not None:
+                self._segment.close()
@@ -0,0 +1,158 @@
+import sys
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+# How many products size_bytes() measures to estimate the average product size
+SIZE_SAMPLE = 200
+
+
+def _deep_size(obj) -> int:
+    # Rough footprint of a product: the object plus everything in it. Shared objects
+    # (interned strings, small ints) get counted every time, so this errs a little high.
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key) + _deep_size(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item) for item in obj)
+    return size
+
+
+class MemoryBackend:
+    # Everything lives in Python dicts (the original "list of dicts" database, but indexed).
+    #   _by_id      -> primary index: id -> product dict
+    #   _by_barcode -> secondary index: barcode -> frozenset of ids (barcodes aren't guaranteed unique)
+    #   _order      -> ids in ascending order, used for keyset pagination. Deletes leave
+    #                  tombstones that get skipped and compacted away once there are enough.
+    #
+    # Reads are lock-free: dict lookups are atomic, _order is only ever appended to or swapped
+    # for a new list, and barcode id sets are replaced rather than edited. Structural writes
+    # (insert/delete/barcode changes) take _lock so they can't trample each other.
+
+    # Contents are lost on exit unless storage.journal is attached
+    persistent = False
+
+    def __init__(self):
+        self._by_id: dict[int, dict] = {}
+        self._by_barcode: dict[str, frozenset[int]] = {}
+        self._order: list[int] = []
+        self._tombstones = 0
+        self._lock = threading.Lock()
+
+    # ---------- bulk load ----------
+    def load(self, rows: Iterable[dict]) -> None:
+        self._by_id = {}
+        self._by_barcode = {}
+
+        # Rows are kept as-is (no copy): the store never edits a product dict in place
+        for product in rows:
+            self._by_id[product["id"]] = product
+            self._index_barcode(product)
+
+        # Seed rows might not be in id order, so sort once here (inserts are always appended)
+        self._order = sorted(self._by_id)
+        self._tombstones = 0
+
+    @contextmanager
+    def transaction(self):
+        # Nothing to batch in memory; here so callers can treat every backend the same
+        yield
+
+    # ---------- reads ----------
+    def count(self) -> int:
+        return len(self._by_id)
+
+    def max_id(self) -> int:
+        return self._order[-1] if self._order else 0
+
+    def get(self, product_id: int) -> dict | None:
+        return self._by_id.get(product_id)
+
+    def find_by_barcode(self, barcode: str) -> list[dict]:
+        ids = self._by_barcode.get(barcode, ())
+        return [self._by_id[i] for i in sorted(ids)]
+
+    def column(self, field: str) -> list:
+        # One field for every product in id order (for scans/aggregates that don't need rows)
+        return [product[field] for product in self.iter_products()]
+
+    def size_bytes(self) -> int:
+        # Estimate of the heap used by products and indexes: measuring every product would
+        # make a /metrics scrape O(n), so measure an even sample and scale it up
+        order = self._order
+        count = len(self._by_id)
+        step = max(len(order) // SIZE_SAMPLE, 1)
+        sample = [p for p in (self._by_id.get(i) for i in order[::step][:SIZE_SAMPLE]) if p is not None]
+        products = sum(_deep_size(p) for p in sample) * count // len(sample) if sample else 0
+
+        # Barcode index: the dict itself plus one frozenset per barcode
+        barcodes = sys.getsizeof(self._by_barcode) + len(self._by_barcode) * sys.getsizeof(frozenset({0}))
+        return products + sys.getsizeof(self._by_id) + sys.getsizeof(order) + barcodes
+
+    def iter_products(self, after: int | None = None) -> Iterator[dict]:
+        # Walk products in id order starting right after the cursor.
+        # Holding onto the current _order list means a compaction mid-iteration can't break us.
+        order = self._order
+        start = bisect_right(order, after) if after is not None else 0
+
+        for i in range(start, len(order)):
+            product = self._by_id.get(order[i])
+            if product is not None:
+                yield product
+
+    # ---------- writes ----------
+    def insert(self, product: dict) -> None:
+        with self._lock:
+            self._by_id[product["id"]] = product
+            # The store inserts in id order, so appending keeps _order sorted
+            self._order.append(product["id"])
+            self._index_barcode(product)
+
+    def replace(self, old: dict, new: dict) -> None:
+        # Swap in the new row; the barcode index only changes if the barcode did
+        self._by_id[new["id"]] = new
+        if old.get("barcode") != new.get("barcode"):
+            with self._lock:
+                self._unindex_barcode(old)
+                self._index_barcode(new)
+
+    def delete(self, product_id: int) -> dict | None:
+        with self._lock:
+            product = self._by_id.pop(product_id, None)
+            if product is None:
+                return None
+
+            self._unindex_barcode(product)
+
+            # Leave the id in _order as a tombstone, and rebuild the list once they pile up
+            self._tombstones += 1
+            if self._tombstones > 1024 and self._tombstones * 2 > len(self._order):
+                self._compact_order()
+
+        return product
+
+    def _compact_order(self) -> None:
+        # Build a fresh list instead of editing in place so running iterators keep working
+        self._order = [i for i in self._order if i in self._by_id]
+        self._tombstones = 0
+
+    # ---------- barcode index helpers ----------
+    # Id sets are replaced, never edited, so find_by_barcode can iterate one without a lock.
+    # Only string barcodes are indexed (a list or dict isn't hashable, and can't be looked up).
+    def _index_barcode(self, product: dict) -> None:
+        barcode = product.get("barcode")
+        if barcode and isinstance(barcode, str):
+            self._by_barcode[barcode] = self._by_barcode.get(barcode, frozenset()) | {product["id"]}
+
+    def _unindex_barcode(self, product: dict) -> None:
+        barcode = product.get("barcode")
+        ids = self._by_barcode.get(barcode) if barcode and isinstance(barcode, str) else None
+        if ids is None:
+            return
+
+        ids = ids - {product["id"]}
+        if ids:
+            self._by_barcode[barcode] = ids
+        else:
+            del self._by_barcode[barcode]
@@ -0,0 +1,215 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        barcode TEXT,
+        price REAL NOT NULL DEFAULT 0,
+        stock INTEGER NOT NULL DEFAULT 0,
+        details TEXT NOT NULL DEFAULT '{}'
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_products_barcode ON products (barcode)",
+]
+
+# Every query is a fixed SQL string with ? placeholders, so sqlite3's per-connection
+# statement cache compiles each one once and reuses the prepared statement after that
+COLUMNS = "id, name, barcode, price, stock, details"
+SELECT_BY_ID = f"SELECT {COLUMNS} FROM products WHERE id = ?"
+SELECT_BY_BARCODE = f"SELECT {COLUMNS} FROM products WHERE barcode = ? ORDER BY id"
+SELECT_PAGE = f"SELECT {COLUMNS} FROM products WHERE id > ? ORDER BY id LIMIT ?"
+INSERT = f"INSERT INTO products ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)"
+UPDATE = "UPDATE products SET name = ?, barcode = ?, price = ?, stock = ?, details = ? WHERE id = ?"
+DELETE = "DELETE FROM products WHERE id = ?"
+# AUTOINCREMENT keeps the highest id ever inserted in sqlite_sequence, even after that row is
+# deleted, so a reopened store doesn't hand out a deleted product's id again
+MAX_ID = (
+    "SELECT MAX(COALESCE(MAX(id), 0), "
+    "COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'products'), 0)) FROM products"
+)
+
+# Rows per INSERT batch when bulk loading, and per SELECT page when iterating
+BATCH_SIZE = 1000
+
+
+def _to_row(product: dict) -> tuple:
+    return (
+        product["id"],
+        product.get("name"),
+        product.get("barcode"),
+        product.get("price", 0.0),
+        product.get("stock", 0),
+        json.dumps(product.get("details") or {}, separators=(",", ":")),
+    )
+
+
+def _from_row(row: tuple) -> dict:
+    return {
+        "id": row[0],
+        "name": row[1],
+        "barcode": row[2],
+        "price": row[3],
+        "stock": row[4],
+        "details": json.loads(row[5]),
+    }
+
+
+class SqliteBackend:
+    # Products on disk in SQLite, so inventory survives restarts. Only the rows stay on disk:
+    # the app's store listeners (search, price/stock indexes, stats) still hold derived state
+    # for every product in memory.
+    # - WAL mode: readers never block the writer (or each other)
+    # - one connection per thread (sqlite connections shouldn't be shared across threads)
+    # - writes go through one lock, and transaction() lets callers batch many writes into a
+    #   single commit instead of one fsync each
+
+    # Rows survive restarts on their own (storage.journal refuses to manage this backend)
+    persistent = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with self.transaction():
+            table = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'products'").fetchone()
+            if table is not None and "AUTOINCREMENT" not in table[0].upper():
+                # Files from before AUTOINCREMENT: copy the rows into a table that has it (the
+                # barcode index goes with the old table and is recreated below)
+                conn.execute("ALTER TABLE products RENAME TO products_old")
+                conn.execute(SCHEMA[0])
+                conn.execute(f"INSERT INTO products ({COLUMNS}) SELECT {COLUMNS} FROM products_old")
+                conn.execute("DROP TABLE products_old")
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None = autocommit; we open transactions explicitly with BEGIN
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=256)
+            # NORMAL is durable in WAL mode except for the very last commits on power loss
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+            self._local.after_commit = []
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        # Nested calls join the outer transaction, so a batch route can wrap many store writes
+        with self._write_lock:
+            conn = self._conn()
+            if self._local.depth == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            self._local.depth += 1
+            try:
+                yield conn
+            except BaseException:
+                self._local.depth -= 1
+                if self._local.depth == 0:
+                    self._local.after_commit = []
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                self._local.depth -= 1
+                if self._local.depth == 0:
+                    conn.execute("COMMIT")
+                    # Still under the write lock, so callbacks run in commit order
+                    callbacks, self._local.after_commit = self._local.after_commit, []
+                    for callback in callbacks:
+                        callback()
+
+    def defer(self, callback) -> bool:
+        # Run callback once the current transaction commits (and never if it rolls back), so
+        # listeners don't see writes a failed batch undoes. False outside a transaction.
+        if getattr(self._local, "depth", 0) == 0:
+            return False
+        self._local.after_commit.append(callback)
+        return True
+
+    # ---------- bulk load ----------
+    def load(self, rows: Iterable[dict]) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM products")
+            # A load replaces everything, the id high-water mark included (the store passes
+            # next_id when ids of deleted products have to stay retired)
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = 'products'")
+            batch = []
+            for row in rows:
+                batch.append(_to_row(row))
+                if len(batch) >= BATCH_SIZE:
+                    conn.executemany(INSERT, batch)
+                    batch = []
+            if batch:
+                conn.executemany(INSERT, batch)
+
+    # ---------- reads ----------
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def max_id(self) -> int:
+        return self._conn().execute(MAX_ID).fetchone()[0]
+
+    def get(self, product_id: int) -> dict | None:
+        row = self._conn().execute(SELECT_BY_ID, (product_id,)).fetchone()
+        return _from_row(row) if row else None
+
+    def find_by_barcode(self, barcode: str) -> list[dict]:
+        return [_from_row(row) for row in self._conn().execute(SELECT_BY_BARCODE, (barcode,))]
+
+    def column(self, field: str) -> list:
+        # One field for every product in id order. Field names come from a fixed whitelist,
+        # never from user input, so formatting them into the SQL is safe.
+        if field not in ("id", "name", "barcode", "price", "stock", "details"):
+            raise KeyError(field)
+        values = [row[0] for row in self._conn().execute(f"SELECT {field} FROM products ORDER BY id")]
+        return [json.loads(v) for v in values] if field == "details" else values
+
+    def size_bytes(self) -> int:
+        # Size of the database file (products live on disk; SQLite's page cache is bounded)
+        conn = self._conn()
+        return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+    def iter_products(self, after: int | None = None) -> Iterator[dict]:
+        # Keyset pages of BATCH_SIZE rows, so memory stays flat no matter how big the table is
+        cursor = after if after is not None else -1
+        while True:
+            rows = self._conn().execute(SELECT_PAGE, (cursor, BATCH_SIZE)).fetchall()
+            for row in rows:
+                yield _from_row(row)
+            if len(rows) < BATCH_SIZE:
+                return
+            cursor = rows[-1][0]
+
+    # ---------- writes ----------
+    def insert(self, product: dict) -> None:
+        with self.transaction() as conn:
+            conn.execute(INSERT, _to_row(product))
+
+    def replace(self, old: dict, new: dict) -> None:
+        row = _to_row(new)
+        with self.transaction() as conn:
+            conn.execute(UPDATE, row[1:] + row[:1])
+
+    def delete(self, product_id: int) -> dict | None:
+        with self.transaction() as conn:
+            row = conn.execute(SELECT_BY_ID, (product_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(DELETE, (product_id,))
+        return _from_row(row)
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
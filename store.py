@@ -0,0 +1,215 @@
+import copy
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Sequence
+
+from storage.compact import CompactBackend
+from storage.memory import MemoryBackend
+from storage.sqlite import SqliteBackend
+
+# Fields a client is allowed to set on a product (id is always assigned by the store)
+PRODUCT_FIELDS = ("name", "barcode", "price", "stock", "details")
+
+# What a new product gets for any field that wasn't provided
+PRODUCT_DEFAULTS = {"name": None, "barcode": None, "price": 0.0, "stock": 0, "details": {}}
+
+# Number of lock stripes for per-product writes (product id % LOCK_STRIPES picks the lock)
+LOCK_STRIPES = 64
+
+# Listener signature: listener(action, old, new) where action is "add", "update", "delete"
+# or "clear". old/new are the product before/after the change (None when it doesn't apply).
+Listener = Callable[[str, dict | None, dict | None], None]
+
+
+def backend_from_env():
+    # STORE_BACKEND=memory (default) keeps the original in-memory behavior.
+    # STORE_BACKEND=compact is in-memory too, but column-oriented: ~3-4x less memory per product.
+    # STORE_BACKEND=sqlite stores products in STORE_PATH (default inventory.db).
+    kind = os.getenv("STORE_BACKEND", "memory")
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "compact":
+        return CompactBackend()
+    if kind == "sqlite":
+        return SqliteBackend(os.getenv("STORE_PATH", "inventory.db"))
+    raise ValueError(f"Unknown STORE_BACKEND: {kind}")
+
+
+class ProductStore:
+    # The one place routes read and write products. Storage itself is pluggable
+    # (storage.memory.MemoryBackend, storage.compact.CompactBackend, storage.sqlite.SqliteBackend);
+    # the store adds:
+    #   - a monotonic id allocator (deleted ids are never handed out again)
+    #   - field whitelisting/defaults for writes
+    #   - change listeners, so derived state (search index, caches, ...) stays current
+    #
+    # Concurrency model (threaded WSGI servers):
+    #   - reads never take a lock. Product dicts are copy-on-write: an update builds a new dict
+    #     and swaps it in, so a dict a reader holds (or is serializing) never changes under it.
+    #   - writes to one product are serialized by a striped lock, so two PATCHes can't lose
+    #     each other's fields and listeners see a product's changes in the order they happened.
+    #     Writes to different products run in parallel.
+    #   - id allocation + insert happen under one small lock, so concurrent POSTs never share
+    #     an id and rows reach the backend in id order.
+    #   - every write opens a backend transaction *before* taking store locks. A bulk route
+    #     holding a SQLite transaction and a single write holding a stripe can then never end
+    #     up waiting on each other (the memory backend's transaction() is a no-op).
+    #   - load()/use_backend() replace everything and aren't meant to race with other writes.
+
+    def __init__(self, rows: Iterable[dict] = (), backend=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self._listeners: list[Listener] = []
+        self._next_id = self.backend.max_id() + 1
+        self._insert_lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        if rows:
+            self.load(rows)
+
+    # ---------- change listeners ----------
+    def subscribe(self, listener: Listener, replay: bool = True) -> None:
+        # Anything that keeps derived state hooks in here so it stays up to date
+        # incrementally. Existing products are replayed as "add" events unless replay=False
+        # (e.g. the journal, which already has them on disk).
+        self._listeners.append(listener)
+        if replay:
+            for product in self.iter_products():
+                listener("add", None, product)
+
+    def _lock_for(self, product_id: int) -> threading.Lock:
+        return self._stripes[product_id % LOCK_STRIPES]
+
+    def _notify(self, action: str, old: dict | None, new: dict | None) -> None:
+        # A backend with real transactions (SQLite) holds changes back until the commit, since
+        # a rollback would undo them; the in-memory ones apply writes (and notify) right away
+        defer = getattr(self.backend, "defer", None)
+        if defer is not None and defer(lambda: self._deliver(action, old, new)):
+            return
+        self._deliver(action, old, new)
+
+    def _deliver(self, action: str, old: dict | None, new: dict | None) -> None:
+        for listener in self._listeners:
+            listener(action, old, new)
+
+    def _replay(self) -> None:
+        # Listeners rebuild from scratch: wipe, then one "add" per product
+        if self._listeners:
+            self._deliver("clear", None, None)
+            for product in self.iter_products():
+                self._deliver("add", None, product)
+
+    # ---------- bulk load ----------
+    def load(self, rows: Iterable[dict], next_id: int | None = None) -> None:
+        # Replace everything with the given rows (used at startup and by tests to reset state).
+        # next_id lets a restore keep ids of deleted products retired.
+        self.backend.load(rows)
+        self._next_id = max(self.backend.max_id() + 1, next_id or 1)
+        self._replay()
+
+    def use_backend(self, backend) -> None:
+        # Switch storage (e.g. tests running the same suite on memory and SQLite)
+        self.backend = backend
+        self._next_id = backend.max_id() + 1
+        self._replay()
+
+    @contextmanager
+    def transaction(self):
+        # Group several writes into one backend transaction (one commit for SQLite)
+        with self.backend.transaction():
+            yield self
+
+    # ---------- reads ----------
+    def __len__(self) -> int:
+        return self.backend.count()
+
+    @property
+    def next_id(self) -> int:
+        return self._next_id
+
+    def all(self) -> list[dict]:
+        return list(self.iter_products())
+
+    def iter_products(self, after: int | None = None) -> Iterator[dict]:
+        return self.backend.iter_products(after)
+
+    def page(self, after: int | None = None, limit: int = 100) -> tuple[list[dict], int | None]:
+        # Keyset pagination: returns up to `limit` products with id > after, plus the cursor for
+        # the next page (None when this was the last page)
+        items = []
+        for product in self.iter_products(after):
+            if len(items) == limit:
+                return items, items[-1]["id"]
+            items.append(product)
+
+        return items, None
+
+    def get(self, product_id: int) -> dict | None:
+        return self.backend.get(product_id)
+
+    def column(self, field: str) -> Sequence:
+        # Values of one field (or "id") for every product, in id order. Much cheaper than
+        # iterating whole products on the compact backend, where it reads a typed array.
+        return self.backend.column(field)
+
+    def size_bytes(self) -> int:
+        # Approximate storage footprint (heap for the in-memory backends, file size for SQLite)
+        return self.backend.size_bytes()
+
+    def find_by_barcode(self, barcode: str) -> list[dict]:
+        return self.backend.find_by_barcode(barcode)
+
+    # ---------- writes ----------
+    def add(self, fields: dict) -> dict:
+        product = {"id": None}
+        for field in PRODUCT_FIELDS:
+            if field in fields:
+                product[field] = fields[field]
+            else:
+                # Copy so new products never share the same default details dict
+                product[field] = copy.copy(PRODUCT_DEFAULTS[field])
+
+        with self.backend.transaction():
+            with self._insert_lock:
+                # Grab the next id here so inserts never need to look at existing rows
+                product["id"] = self._next_id
+                self._next_id += 1
+
+                # Take the new id's stripe before the row becomes visible and keep it until
+                # listeners have seen the add, so a racing delete can't be reported first
+                lock = self._lock_for(product["id"])
+                lock.acquire()
+                try:
+                    self.backend.insert(product)
+                except BaseException:
+                    lock.release()
+                    raise
+
+            try:
+                self._notify("add", None, product)
+            finally:
+                lock.release()
+        return product
+
+    def update(self, product_id: int, changes: dict) -> dict | None:
+        with self.backend.transaction(), self._lock_for(product_id):
+            old = self.backend.get(product_id)
+            if old is None:
+                return None
+
+            new = dict(old)
+            for field in PRODUCT_FIELDS:
+                if field in changes:
+                    new[field] = changes[field]
+
+            self.backend.replace(old, new)
+            self._notify("update", old, new)
+        return new
+
+    def delete(self, product_id: int) -> dict | None:
+        with self.backend.transaction(), self._lock_for(product_id):
+            product = self.backend.delete(product_id)
+            if product is None:
+                return None
+
+            self._notify("delete", product, None)
+        return product
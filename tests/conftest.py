@@ -8,11 +8,36 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+# No background details refresher during tests: tests that want a run trigger one
+os.environ.setdefault("DETAILS_REFRESH_INTERVAL", "0")
+
 import data  # noqa: E402
+import app as app_module  # noqa: E402
+from services import openfoodfacts  # noqa: E402
+from services.breaker import CircuitBreaker  # noqa: E402
+from storage.compact import CompactBackend  # noqa: E402
+from storage.memory import MemoryBackend  # noqa: E402
+from storage.sqlite import SqliteBackend  # noqa: E402
+
+
+@pytest.fixture(params=["memory", "compact", "sqlite"])
+def make_backend(request, tmp_path):
+    # Every test runs once per storage backend. Tests that want their own store can call
+    # make_backend() to get a fresh, empty backend of the current kind.
+    counter = iter(range(1000))
+
+    def factory():
+        if request.param == "sqlite":
+            return SqliteBackend(str(tmp_path / f"inventory-{next(counter)}.db"))
+        if request.param == "compact":
+            return CompactBackend()
+        return MemoryBackend()
+
+    return factory
 
 
 @pytest.fixture(autouse=True)
-def reset_products():
+def reset_products(make_backend):
     # Since this app uses an in-memory list instead of a real DB, tests would leak state
     # into each other without a reset. This runs before every test automatically.
     data.products.clear()
@@ -21,3 +46,9 @@ def reset_products():
         {"id": 2, "name": "Bananas", "barcode": None, "price": 0.59, "stock": 120, "details": {}},
         {"id": 3, "name": "Peanut Butter", "barcode": "051500255872", "price": 4.99, "stock": 15, "details": {}},
     ])
+    # The app serves from a ProductStore seeded from data.products, so rebuild it too
+    app_module.store.use_backend(make_backend())
+    app_module.store.load(data.products)
+    # Cached OFF lookups would also leak between tests, and so would failures counted by the breaker
+    openfoodfacts.cache.clear()
+    openfoodfacts.default_client.breaker = CircuitBreaker()
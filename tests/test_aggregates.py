@@ -0,0 +1,98 @@
+import random
+
+from aggregates import InventoryStats
+from app import app
+from store import ProductStore
+
+
+def _brute_force(store: ProductStore) -> dict:
+    products = store.all()
+    numeric = [p for p in products if isinstance(p["stock"], int)]
+    categories = {}
+    for p in products:
+        for tag in set((p["details"] or {}).get("categories_tags", [])):
+            categories[tag] = categories.get(tag, 0) + 1
+    return {
+        "products": len(products),
+        "units": sum(p["stock"] for p in numeric),
+        "inventory_value": round(sum(p["price"] * p["stock"] for p in numeric if isinstance(p["price"], float)), 2),
+        "out_of_stock": sum(1 for p in numeric if p["stock"] <= 0),
+        "category_count": len(categories),
+        "categories": sorted(categories.items(), key=lambda item: (-item[1], item[0])),
+    }
+
+
+def test_stats_match_brute_force_after_random_writes(make_backend):
+    rng = random.Random(5)
+    tags = ["en:dairies", "en:snacks", "en:beverages", "en:spreads"]
+
+    def fields():
+        return {
+            "name": "p",
+            "price": rng.choice([0.5, 1.25, 2.99, "n/a"]),
+            "stock": rng.choice([0, 1, 7, 40, "unknown"]),
+            "details": {"categories_tags": rng.sample(tags, rng.randint(0, 2))} if rng.random() < 0.6 else {},
+        }
+
+    store = ProductStore([{"id": i, **fields()} for i in range(1, 101)], backend=make_backend())
+    stats = InventoryStats()
+    store.subscribe(stats.on_change)
+
+    for _ in range(300):
+        roll = rng.random()
+        if roll < 0.5:
+            store.update(rng.randint(1, store.next_id - 1), fields())
+        elif roll < 0.8:
+            store.add(fields())
+        else:
+            store.delete(rng.randint(1, store.next_id - 1))
+
+    snapshot = stats.snapshot()
+    snapshot["categories"] = [(c["category"], c["products"]) for c in snapshot["categories"]]
+    assert snapshot == _brute_force(store)
+
+    assert len(stats.snapshot(top_categories=2)["categories"]) == 2
+    store.load([])
+    assert stats.snapshot() == {
+        "products": 0, "units": 0, "inventory_value": 0.0, "out_of_stock": 0, "category_count": 0, "categories": [],
+    }
+
+
+def test_stats_endpoint_follows_writes():
+    client = app.test_client()
+
+    stats = client.get("/products/stats").get_json()
+    assert stats["products"] == 3
+    assert stats["units"] == 24 + 120 + 15
+    assert stats["inventory_value"] == round(3.49 * 24 + 0.59 * 120 + 4.99 * 15, 2)
+    assert stats["out_of_stock"] == 0
+    assert stats["low_stock"] == 0
+
+    client.patch("/products/1", json={"stock": 0, "details": {"categories_tags": ["en:dairies"]}})
+    client.delete("/products/2")
+    stats = client.get("/products/stats?threshold=20").get_json()
+    assert stats["units"] == 15
+    assert stats["out_of_stock"] == 1
+    assert stats["low_stock"] == 2
+    assert stats["low_stock_threshold"] == 20
+    assert stats["categories"] == [{"category": "en:dairies", "products": 1}]
+
+
+def test_low_stock_report_lists_lowest_first():
+    client = app.test_client()
+    client.patch("/products/2", json={"stock": 3})
+
+    resp = client.get("/products/low-stock?threshold=20")
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert [p["id"] for p in body["items"]] == [2, 3]
+    assert body["total"] == 2
+    assert body["threshold"] == 20
+
+    body = client.get("/products/low-stock?threshold=20&limit=1").get_json()
+    assert [p["id"] for p in body["items"]] == [2]
+    assert body["total"] == 2
+
+    assert client.get("/products/low-stock?threshold=lots").status_code == 400
+    assert client.get("/products/low-stock?limit=0").status_code == 400
+    assert client.get("/products/stats?top=-1").status_code == 400
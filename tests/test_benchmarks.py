@@ -0,0 +1,99 @@
+import json
+
+import requests
+
+from benchmarks import compare
+from benchmarks.common import percentile, summarize, write_results
+from benchmarks.datagen import generate_products
+from benchmarks.fake_off import start_server
+from store import ProductStore
+
+
+def test_datagen_is_deterministic_and_loads_into_store():
+    first = list(generate_products(500, seed=7))
+    assert first == list(generate_products(500, seed=7))
+    assert [p["id"] for p in first] == list(range(1, 501))
+
+    barcodes = [p["barcode"] for p in first if p["barcode"]]
+    assert len(barcodes) == len(set(barcodes))
+
+    store = ProductStore(generate_products(500, seed=7))
+    assert len(store) == 500
+    assert store.next_id == 501
+
+
+def test_summarize_percentiles():
+    latencies = [i / 1000 for i in range(1, 101)]
+    stats = summarize(latencies, elapsed=2.0, errors=1)
+    assert percentile(sorted(latencies), 50) == 0.05
+    assert stats["requests"] == 100
+    assert stats["rps"] == 50.0
+    assert stats["p50_ms"] == 50.0
+    assert stats["p99_ms"] == 99.0
+    assert stats["max_ms"] == 100.0
+    assert summarize([], elapsed=1.0)["p99_ms"] == 0.0
+
+
+def test_results_round_trip_and_compare(tmp_path):
+    old_path = write_results("routes", {"products": 10}, {"get": {"rps": 100.0, "p50_ms": 1.0}}, str(tmp_path / "old.json"))
+    new_path = write_results("routes", {"products": 10}, {"get": {"rps": 80.0, "p50_ms": 1.05}}, str(tmp_path / "new.json"))
+
+    with open(new_path) as f:
+        report = json.load(f)
+    assert report["suite"] == "routes"
+    assert report["params"] == {"products": 10}
+
+    with open(old_path) as f:
+        old = json.load(f)
+    rows = {row["metric"]: row for row in compare.compare(old, report)}
+    assert rows["rps"]["worse_pct"] == 20.0
+    assert rows["p50_ms"]["worse_pct"] == 5.0
+
+    assert compare.main([old_path, new_path, "--fail-over", "10"]) == 1
+    assert compare.main([old_path, new_path, "--fail-over", "25"]) == 0
+
+
+def test_fake_off_server():
+    server, url = start_server()
+    try:
+        found = requests.get(f"{url}/api/v2/product/123", timeout=5)
+        missing = requests.get(f"{url}/api/v2/product/120", timeout=5)
+        search = requests.get(f"{url}/cgi/search.pl", params={"search_terms": "milk"}, timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert found.json()["product"]["product_name"] == "Product 123"
+    assert missing.status_code == 404
+    assert search.json()["products"][0]["product_name"] == "milk"
+
+
+def test_memory_benchmark_measures_both_backends():
+    from benchmarks.memory import measure
+
+    memory = measure("memory", 300, seed=1, unique_names=True)
+    compact = measure("compact", 300, seed=1, unique_names=True)
+    assert memory["products"] == compact["products"] == 300
+    assert memory["stock_total"] == compact["stock_total"]
+    assert compact["bytes_per_product"] < memory["bytes_per_product"]
+    assert compact["list_json_warm_s"] >= 0
+
+
+def test_serialize_benchmark_runs(tmp_path):
+    from benchmarks.serialize import main
+
+    output = tmp_path / "serialize.json"
+    assert main(["--products", "200", "--seconds", "0", "--min-iterations", "1", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())["results"]
+    assert results["fragments_warm_all"]["requests"] >= 1
+    assert results["warm_all_speedup"] > 0
+
+
+def test_startup_benchmark_runs(tmp_path):
+    from benchmarks.startup import main
+
+    output = tmp_path / "startup.json"
+    assert main(["--runs", "1", "--commands", "3", "--concurrency", "2", "--products", "5", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())["results"]
+    assert results["update_batch"]["requests"] == 3
+    assert results["help"]["errors"] == 0
@@ -0,0 +1,195 @@
+import pytest
+import requests
+
+import app as app_module
+from app import app
+from services import deadline as deadline_module
+from services import openfoodfacts
+from services.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from services.cache import TTLCache
+from services.deadline import DeadlineExceeded, deadline
+from services.http import DeadlineRetry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResp:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def _breaker(clock, **kwargs):
+    options = {"window": 10, "min_calls": 4, "failure_ratio": 0.5, "slow_call": 1, "slow_ratio": 0.75, "open_seconds": 5}
+    return CircuitBreaker(clock=clock, **dict(options, **kwargs))
+
+
+def _fail(breaker, seconds=0.1):
+    breaker.allow()
+    breaker.record(False, seconds)
+
+
+def _succeed(breaker, seconds=0.1):
+    breaker.allow()
+    breaker.record(True, seconds)
+
+
+def test_breaker_opens_on_failure_ratio_and_probes():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+
+    # Not enough calls to judge yet
+    for _ in range(3):
+        _fail(breaker)
+    assert breaker.state == CLOSED
+    _succeed(breaker)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as rejected:
+        breaker.allow()
+    assert rejected.value.retry_after == pytest.approx(5)
+    assert breaker.rejected == 1
+
+    # After open_seconds one probe goes through; a second caller is still turned away
+    clock.now += 5
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    # A failed probe opens it again, a good one closes it
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    clock.now += 5
+    _succeed(breaker)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["calls"] == 0
+    assert breaker.opened == 2
+
+
+def test_breaker_opens_on_slow_calls_and_forgets_old_ones():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+
+    for _ in range(3):
+        _succeed(breaker, seconds=2)
+    # Old outcomes drop out of the window
+    clock.now += 11
+    _succeed(breaker, seconds=2)
+    assert breaker.snapshot()["slow"] == 1
+
+    for _ in range(3):
+        _succeed(breaker, seconds=2)
+    assert breaker.state == OPEN
+
+    # A probe that works but is still slow doesn't close it
+    clock.now += 5
+    _succeed(breaker, seconds=2)
+    assert breaker.state == OPEN
+
+
+def test_deadline_caps_timeouts_and_retries():
+    assert deadline_module.remaining() is None
+    assert deadline_module.cap_timeout((3, 5)) == (3, 5)
+
+    with deadline(10):
+        with deadline(2):
+            connect, read = deadline_module.cap_timeout((3, 5))
+            assert connect <= 2 and read <= 2
+        # Inner budgets can't extend the outer one
+        with deadline(60):
+            assert deadline_module.remaining() <= 10
+        assert deadline_module.remaining() > 2
+
+    retry = DeadlineRetry(total=3, backoff_factor=1).increment().increment()
+    assert not retry.is_exhausted()
+    with deadline(0.5):
+        # The next backoff (2s) would overrun the budget
+        assert retry.is_exhausted()
+
+    with deadline(0):
+        with pytest.raises(DeadlineExceeded):
+            deadline_module.check()
+
+
+def test_client_fails_fast_while_open(monkeypatch):
+    clock = FakeClock()
+    client = openfoodfacts.OpenFoodFactsClient(cache=TTLCache(), breaker=_breaker(clock))
+    seen = []
+    client.observer = lambda endpoint, outcome, seconds: seen.append(outcome)
+    calls = []
+
+    def down(url, params=None, timeout=5):
+        calls.append(url)
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(client.session, "get", down)
+    for barcode in "1234":
+        with pytest.raises(requests.ConnectionError):
+            client.fetch_by_barcode(barcode)
+
+    # Open: no upstream call at all, for either endpoint
+    with pytest.raises(CircuitOpenError):
+        client.fetch_by_barcode("5")
+    with pytest.raises(CircuitOpenError):
+        client.search_by_name("milk")
+    assert len(calls) == 4
+    assert seen[-2:] == ["rejected", "rejected"]
+
+    # A spent deadline fails before the breaker and doesn't count against OFF
+    with deadline(0):
+        with pytest.raises(DeadlineExceeded):
+            client.fetch_by_barcode("6")
+    assert client.breaker.rejected == 2
+
+    clock.now += 5
+    monkeypatch.setattr(client.session, "get", lambda url, params=None, timeout=5: FakeResp(404))
+    assert client.fetch_by_barcode("7") is None
+    assert client.breaker.state == CLOSED
+
+
+def test_api_maps_upstream_failures(monkeypatch):
+    client = app.test_client()
+    off = openfoodfacts.default_client
+
+    monkeypatch.setattr(off.session, "get", lambda url, params=None, timeout=5: FakeResp(404))
+    assert client.get("/products/search?barcode=404").status_code == 404
+
+    def slow(url, params=None, timeout=5):
+        raise requests.ReadTimeout("slow")
+
+    monkeypatch.setattr(off.session, "get", slow)
+    resp = client.get("/products/search?name=milk")
+    assert resp.status_code == 502
+    assert resp.get_json()["error"] == "External API timed out"
+
+    monkeypatch.setattr(off, "breaker", CircuitBreaker(min_calls=1, open_seconds=30))
+    assert client.patch("/products/1/enrich").status_code == 502
+    for path in ["/products/search?barcode=123", "/products/search?name=milk&limit=3"]:
+        resp = client.get(path)
+        assert resp.status_code == 503, path
+        assert 1 <= int(resp.headers["Retry-After"]) <= 30
+    assert client.patch("/products/3/enrich").status_code == 503
+    assert "openfoodfacts_circuit_state 2" in client.get("/metrics").get_data(as_text=True)
+
+
+def test_api_caps_upstream_timeouts_at_request_budget(monkeypatch):
+    monkeypatch.setattr(app_module, "OFF_REQUEST_BUDGET", 0.2)
+    timeouts = []
+
+    def fake_get(url, params=None, timeout=5):
+        timeouts.append(timeout)
+        return FakeResp(200, {"product": {"product_name": "Nutella"}})
+
+    monkeypatch.setattr(openfoodfacts.default_client.session, "get", fake_get)
+    assert app.test_client().get("/products/search?barcode=301").status_code == 200
+    assert max(timeouts[0]) <= 0.2
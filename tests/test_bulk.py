@@ -0,0 +1,88 @@
+import app as app_module
+from app import app
+
+
+def test_bulk_create_reports_per_item():
+    # Good rows get ids, bad rows get an error, and nothing else is affected
+    client = app.test_client()
+    resp = client.post("/products/bulk", json={"products": [
+        {"name": "Eggs", "stock": 12},
+        {"price": 1.0},
+        {"name": "Bread", "barcode": "111"},
+    ]})
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["created"] == 2
+    assert body["failed"] == 1
+    assert [r["status"] for r in body["results"]] == [201, 400, 201]
+    assert body["results"][2]["product"]["id"] == 5
+    assert len(client.get("/products").get_json()) == 5
+
+
+def test_bulk_bad_items_never_reach_the_store_or_its_listeners(monkeypatch):
+    client = app.test_client()
+    since = app_module.change_feed.seq
+
+    # Validation catches what it can up front...
+    body = client.post("/products/bulk", json=[{"name": "Good"}, {"name": None}, {"name": "Jam", "price": None}]).get_json()
+    assert [r["status"] for r in body["results"]] == [201, 400, 400]
+
+    # ...and a write the backend still refuses fails just that item
+    insert = app_module.store.backend.insert
+
+    def picky_insert(product):
+        if product["name"] == "Boom":
+            raise RuntimeError("disk full")
+        insert(product)
+
+    monkeypatch.setattr(app_module.store.backend, "insert", picky_insert)
+    body = client.post("/products/bulk", json=[{"name": "Boom"}, {"name": "Tea"}]).get_json()
+    assert [r["status"] for r in body["results"]] == [500, 201]
+
+    # Stats, the change feed and reads all agree on what was written
+    names = [p["name"] for p in client.get("/products").get_json()]
+    assert names[3:] == ["Good", "Tea"]
+    assert client.get("/products/stats").get_json()["products"] == 5
+    changes = client.get(f"/products/changes?since={since}").get_json()["changes"]
+    assert [c["product"]["name"] for c in changes] == ["Good", "Tea"]
+
+
+def test_bulk_create_accepts_bare_list():
+    client = app.test_client()
+    resp = client.post("/products/bulk", json=[{"name": "Eggs"}])
+    assert resp.get_json()["created"] == 1
+
+
+def test_bulk_create_rejects_non_list():
+    client = app.test_client()
+    assert client.post("/products/bulk", json={"products": "nope"}).status_code == 400
+
+
+def test_bulk_patch():
+    client = app.test_client()
+    resp = client.patch("/products/bulk", json=[
+        {"id": 1, "stock": 0},
+        {"id": 999, "stock": 1},
+        {"stock": 5},
+    ])
+    body = resp.get_json()
+    assert body["updated"] == 1
+    assert [r["status"] for r in body["results"]] == [200, 404, 400]
+    assert client.get("/products/1").get_json()["stock"] == 0
+
+
+def test_bulk_delete():
+    client = app.test_client()
+    resp = client.delete("/products/bulk", json={"ids": [1, 3, 999]})
+    body = resp.get_json()
+    assert body["deleted"] == 2
+    assert [r["status"] for r in body["results"]] == [200, 200, 404]
+    assert [p["id"] for p in client.get("/products").get_json()] == [2]
+
+
+def test_bulk_get():
+    client = app.test_client()
+    body = client.get("/products/bulk?ids=3,999,1").get_json()
+    assert [p["id"] for p in body["products"]] == [3, 1]
+    assert body["missing"] == [999]
+    assert client.get("/products/bulk?ids=a,b").status_code == 400
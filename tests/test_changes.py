@@ -0,0 +1,152 @@
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from app import app
+from changes import ChangeFeed, CursorExpired
+from store import ProductStore
+
+
+def _feed(make_backend, size=10_000):
+    store = ProductStore([{"id": 1, "name": "Milk"}], backend=make_backend())
+    feed = ChangeFeed(size=size)
+    store.subscribe(feed.on_change, replay=False)
+    return store, feed
+
+
+def test_feed_returns_changes_after_a_cursor(make_backend):
+    store, feed = _feed(make_backend)
+    start = feed.seq
+
+    store.add({"name": "Eggs"})
+    store.update(1, {"stock": 4})
+    store.delete(2)
+
+    changes = feed.read(start)
+    assert [(c["action"], c["id"]) for c in changes] == [("add", 2), ("update", 1), ("delete", 2)]
+    assert changes[1]["product"]["stock"] == 4
+    assert changes[2]["product"] is None
+    assert [c["seq"] for c in changes] == [start + 1, start + 2, start + 3]
+
+    assert feed.read(start, limit=1) == changes[:1]
+    assert feed.read(feed.seq) == []
+
+
+def test_feed_cursor_expires(make_backend):
+    store, feed = _feed(make_backend, size=4)
+    start = feed.seq
+    for stock in range(5):
+        store.update(1, {"stock": stock})
+
+    # Five changes don't fit in four slots
+    with pytest.raises(CursorExpired):
+        feed.read(start)
+    assert len(feed.read(start + 1)) == 4
+
+    # From the future, or from another process
+    with pytest.raises(CursorExpired):
+        feed.read(feed.seq + 1)
+    with pytest.raises(CursorExpired):
+        feed.read(feed.seq, epoch="other")
+
+    # A reload invalidates even a caught-up cursor
+    caught_up = feed.seq
+    store.load([{"id": 7, "name": "Salt"}])
+    with pytest.raises(CursorExpired):
+        feed.read(caught_up)
+
+
+def test_feed_wait_blocks_until_a_change(make_backend):
+    store, feed = _feed(make_backend)
+    start = feed.seq
+
+    timer = threading.Timer(0.1, lambda: store.update(1, {"stock": 9}))
+    timer.start()
+    began = time.monotonic()
+    changes = feed.read(start, wait=5)
+    timer.join()
+
+    assert [c["product"]["stock"] for c in changes] == [9]
+    assert time.monotonic() - began < 4
+
+    began = time.monotonic()
+    assert feed.read(feed.seq, wait=0.05) == []
+    assert time.monotonic() - began >= 0.04
+
+
+def test_feed_is_notified_after_versions():
+    # Otherwise a GET /products between the two listeners could send a change's seq with the
+    # cached body from before it, and the client would never see that change
+    listeners = app_module.store._listeners
+    assert listeners.index(app_module.versions.on_change) < listeners.index(app_module.change_feed.on_change)
+
+
+def test_changes_endpoint_syncs_from_list_cursor():
+    client = app.test_client()
+    listing = client.get("/products")
+    since = int(listing.headers["X-Change-Seq"])
+    epoch = listing.headers["X-Change-Epoch"]
+
+    client.patch("/products/1", json={"stock": 3})
+    client.delete("/products/2")
+
+    body = client.get(f"/products/changes?since={since}&epoch={epoch}").get_json()
+    assert [(c["action"], c["id"]) for c in body["changes"]] == [("update", 1), ("delete", 2)]
+    assert body["changes"][0]["product"]["stock"] == 3
+    assert body["more"] is False
+
+    page = client.get(f"/products/changes?since={since}&limit=1").get_json()
+    assert page["more"] is True
+    assert page["next_since"] == since + 1
+
+    empty = client.get(f"/products/changes?since={body['next_since']}").get_json()
+    assert empty["changes"] == []
+    assert empty["next_since"] == body["next_since"]
+
+
+def test_changes_endpoint_long_poll():
+    client = app.test_client()
+    since = app_module.change_feed.seq
+
+    timer = threading.Timer(0.1, lambda: app_module.store.update(3, {"stock": 1}))
+    timer.start()
+    body = client.get(f"/products/changes?since={since}&wait=5").get_json()
+    timer.join()
+    assert [c["id"] for c in body["changes"]] == [3]
+
+
+def test_changes_endpoint_resync_and_validation():
+    client = app.test_client()
+    seq = app_module.change_feed.seq
+
+    for query in [f"since={seq + 1}", "since=0", f"since={seq}&epoch=stale"]:
+        resp = client.get(f"/products/changes?{query}")
+        assert resp.status_code == 410, query
+        assert resp.get_json()["resync"] is True
+        assert resp.get_json()["seq"] == seq
+
+    for query in ["", "since=abc", f"since={seq}&wait=600", f"since={seq}&limit=0"]:
+        assert client.get(f"/products/changes?{query}").status_code == 400, query
+
+
+def test_changes_endpoint_server_sent_events():
+    client = app.test_client()
+    since = app_module.change_feed.seq
+    app_module.store.update(1, {"stock": 5})
+
+    timer = threading.Timer(0.1, lambda: app_module.store.delete(2))
+    timer.start()
+    resp = client.get(f"/products/changes?since={since}&stream=sse&duration=0.5")
+    body = resp.get_data(as_text=True)
+    timer.join()
+
+    assert resp.mimetype == "text/event-stream"
+    events = [block for block in body.split("\n\n") if block.startswith("id:")]
+    assert [event.splitlines()[0] for event in events] == [f"id: {since + 1}", f"id: {since + 2}"]
+    assert '"action":"delete"' in events[1]
+
+    # Reconnecting EventSource clients send the last id they saw
+    resp = client.get("/products/changes?stream=sse&duration=0.05", headers={"Last-Event-ID": str(since + 1)})
+    assert f"id: {since + 2}" in resp.get_data(as_text=True)
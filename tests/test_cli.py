@@ -1,11 +1,14 @@
+import json
+
 import cli
 
 
 class FakeResp:
     # Tiny fake response object so we can test CLI logic without making real HTTP calls
-    def __init__(self, status_code=200, payload=None):
+    def __init__(self, status_code=200, payload=None, headers=None):
         self.status_code = status_code
         self._payload = payload
+        self.headers = headers or {}
         self.content = b"1"  # non-empty so cli tries json()
 
     def json(self):
@@ -24,7 +27,7 @@ def test_cli_list_calls_products(monkeypatch, capsys):
         assert url.endswith("/products")
         return FakeResp(200, [{"id": 1}])
 
-    monkeypatch.setattr(cli.requests, "request", fake_request)
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
 
     cli.main(["--base-url", "http://127.0.0.1:5000", "list"])
     out = capsys.readouterr().out
@@ -38,7 +41,7 @@ def test_cli_find_name_builds_query(monkeypatch, capsys):
         assert "/products/search?name=" in url
         return FakeResp(200, {"product_name": "Nutella"})
 
-    monkeypatch.setattr(cli.requests, "request", fake_request)
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
 
     cli.main(["--base-url", "http://x", "find", "--name", "nutella"])
     out = capsys.readouterr().out
@@ -50,7 +53,7 @@ def test_cli_error_non_2xx(monkeypatch, capsys):
     def fake_request(method, url, json=None, timeout=8):
         return FakeResp(404, {"error": "Not found"})
 
-    monkeypatch.setattr(cli.requests, "request", fake_request)
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
 
     try:
         cli.main(["--base-url", "http://x", "show", "999"])
@@ -59,3 +62,270 @@ def test_cli_error_non_2xx(monkeypatch, capsys):
 
     err = capsys.readouterr().err
     assert "ERROR" in err
+
+
+def test_cli_list_pages_with_cursor(monkeypatch, capsys):
+    # --page-size should follow next_after until the server says there are no more pages
+    pages = {
+        "/products?limit=2": {"items": [{"id": 1}, {"id": 2}], "next_after": 2},
+        "/products?limit=2&after=2": {"items": [{"id": 3}], "next_after": None},
+    }
+
+    def fake_request(method, url, json=None, timeout=8):
+        return FakeResp(200, pages[url.replace("http://x", "")])
+
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
+
+    cli.main(["--base-url", "http://x", "list", "--page-size", "2"])
+    lines = capsys.readouterr().out.strip().split("\n")
+    assert lines == ['{"id": 1}', '{"id": 2}', '{"id": 3}']
+
+
+def test_cli_enrich_all_polls_until_done(monkeypatch, capsys):
+    # enrich --all should start a job and poll the status endpoint until it's done
+    statuses = iter([
+        {"job_id": "abc", "status": "running", "processed": 1, "total": 2},
+        {"job_id": "abc", "status": "done", "processed": 2, "total": 2},
+    ])
+
+    def fake_request(method, url, json=None, timeout=8):
+        if method == "POST":
+            assert url.endswith("/products/enrich")
+            assert json == {"missing": True}
+            return FakeResp(202, {"job_id": "abc", "status": "running", "processed": 0, "total": 2})
+        assert url.endswith("/products/enrich/abc")
+        return FakeResp(200, next(statuses))
+
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
+    monkeypatch.setattr(cli.time, "sleep", lambda s: None)
+
+    cli.main(["--base-url", "http://x", "enrich", "--all"])
+    captured = capsys.readouterr()
+    assert '"status": "done"' in captured.out
+    assert "2/2" in captured.err
+
+
+def test_cli_sends_conditional_requests(monkeypatch, tmp_path, capsys):
+    # Second GET of the same URL should send If-None-Match and reuse the cached body on 304
+    monkeypatch.setattr(cli, "CACHE_FILE", str(tmp_path / "cache.json"))
+    monkeypatch.setattr(cli, "_response_cache", None)
+    seen_headers = []
+
+    def fake_request(method, url, json=None, timeout=8, headers=None):
+        seen_headers.append(headers)
+        if headers and headers.get("If-None-Match") == '"v1"':
+            return FakeResp(304, None)
+        return FakeResp(200, {"id": 1, "name": "Milk"}, headers={"ETag": '"v1"'})
+
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
+
+    cli.main(["--base-url", "http://x", "show", "1"])
+    cli.main(["--base-url", "http://x", "show", "1"])
+
+    assert seen_headers == [None, {"If-None-Match": '"v1"'}]
+    assert capsys.readouterr().out.count('"name": "Milk"') == 2
+    # The cache file lets the next CLI process revalidate too
+    saved = json.loads((tmp_path / "cache.json").read_text())
+    assert saved["http://x/products/1"]["etag"] == '"v1"'
+
+
+def test_cli_response_cache_is_bounded_and_skips_lists(monkeypatch, tmp_path):
+    import io
+
+    monkeypatch.setattr(cli, "CACHE_FILE", str(tmp_path / "cache.json"))
+    monkeypatch.setattr(cli, "CACHE_SIZE", 2)
+    monkeypatch.setattr(cli, "_response_cache", None)
+    writes = []
+    real_open = open
+
+    def counting_open(path, mode="r", *args, **kwargs):
+        if "w" in mode:
+            writes.append(path)
+        return real_open(path, mode, *args, **kwargs)
+
+    def fake_request(method, url, json=None, timeout=8, headers=None):
+        if "limit=" in url:
+            return FakeResp(200, {"items": [{"id": 1}], "next_after": None}, headers={"ETag": '"p"'})
+        if url.endswith("/products"):
+            return FakeResp(200, [{"id": 1}], headers={"ETag": '"l"'})
+        return FakeResp(200, {"id": int(url.rsplit("/", 1)[1])}, headers={"ETag": '"v"'})
+
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
+    monkeypatch.setattr("builtins.open", counting_open)
+    monkeypatch.setattr("sys.stdin", io.StringIO("show 1\nshow 2\nshow 1\nshow 3\nlist --page-size 5\nlist\n"))
+    cli.main(["--base-url", "http://x", "batch"])
+
+    # 2 and then 1 were the least recently used, and the page was never cached; the full list is
+    saved = json.loads((tmp_path / "cache.json").read_text())
+    assert list(saved) == ["http://x/products/3", "http://x/products"]
+    # Written once at the end, not once per response
+    assert writes == [str(tmp_path / "cache.json.tmp")]
+
+
+def test_cli_import_sends_chunks(monkeypatch, tmp_path, capsys):
+    # import should stream the file in chunk-size batches through the bulk endpoint
+    path = tmp_path / "products.csv"
+    path.write_text("name,barcode,price,stock\nMilk,123,3.49,24\nEggs,,2.00,12\nBad,,notaprice,1\nBread,,1.99,5\n")
+    batches = []
+
+    def fake_request(method, url, json=None, timeout=8):
+        assert method == "POST" and url.endswith("/products/bulk")
+        batches.append(json["products"])
+        results = [{"index": i, "status": 201, "product": {}} for i in range(len(json["products"]))]
+        return FakeResp(200, {"created": len(results), "failed": 0, "results": results})
+
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
+
+    cli.main(["--base-url", "http://x", "import", str(path), "--chunk-size", "2"])
+    captured = capsys.readouterr()
+
+    assert [len(b) for b in batches] == [2, 1]
+    assert batches[0][0] == {"name": "Milk", "barcode": "123", "price": 3.49, "stock": 24}
+    assert '"created": 3' in captured.out
+    assert '"failed": 1' in captured.out
+    assert "line 4" in captured.err
+
+
+def test_cli_export_writes_csv(monkeypatch, tmp_path, capsys):
+    class FakeStream:
+        status_code = 200
+
+        def iter_lines(self, decode_unicode=False):
+            yield '{"id": 1, "name": "Milk", "barcode": null, "price": 3.49, "stock": 24, "details": {}}'
+            yield '{"id": 2, "name": "Eggs", "barcode": "9", "price": 2.0, "stock": 12, "details": {"a": 1}}'
+
+    def fake_get(url, stream=False, timeout=8):
+        assert url.endswith("/products?stream=ndjson")
+        return FakeStream()
+
+    monkeypatch.setattr(cli._get_session(), "get", fake_get)
+
+    out = tmp_path / "export.csv"
+    cli.main(["--base-url", "http://x", "export", str(out)])
+    lines = out.read_text().splitlines()
+    assert lines[0] == "id,name,barcode,price,stock,details"
+    assert lines[2] == '2,Eggs,9,2.0,12,"{""a"": 1}"'
+    assert '"exported": 2' in capsys.readouterr().out
+
+
+def test_cli_stats_shows_totals_and_low_stock(monkeypatch, capsys):
+    calls = []
+
+    def fake_request(method, url, json=None, timeout=8):
+        calls.append(url)
+        if "/products/stats" in url:
+            return FakeResp(200, {"products": 3, "units": 159, "low_stock": 1})
+        return FakeResp(200, {"items": [{"id": 3, "name": "Peanut Butter", "stock": 15, "details": {}}], "total": 1})
+
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
+
+    cli.main(["--base-url", "http://x", "stats", "--threshold", "15", "--limit", "5"])
+    out = json.loads(capsys.readouterr().out)
+
+    assert calls == ["http://x/products/stats?threshold=15.0", "http://x/products/low-stock?threshold=15.0&limit=5"]
+    assert out["units"] == 159
+    assert out["low_stock_items"] == [{"id": 3, "name": "Peanut Butter", "stock": 15}]
+
+
+def test_cli_batch_runs_commands_and_prints_ndjson(monkeypatch, tmp_path, capsys):
+    calls = []
+
+    def fake_request(method, url, json=None, timeout=8):
+        calls.append((method, url, json))
+        if url.endswith("/products/999"):
+            return FakeResp(404, {"error": "Product not found"})
+        return FakeResp(200, {"id": int(url.rsplit("/", 1)[1]), "stock": (json or {}).get("stock")})
+
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
+
+    commands = tmp_path / "stocktake.txt"
+    commands.write_text(
+        "# counted on aisle 3\n"
+        "update 1 --stock 5\n"
+        "\n"
+        "show 999\n"
+        "update 2 --stock 0\n"
+        "update --stock nope\n"
+    )
+    try:
+        cli.main(["--base-url", "http://x", "batch", str(commands)])
+    except SystemExit as e:
+        assert e.code == 1
+    else:
+        raise AssertionError("expected a failing exit code")
+
+    captured = capsys.readouterr()
+    records = [json.loads(line) for line in captured.out.splitlines()]
+    assert [r["line"] for r in records] == [2, 4, 5, 6]
+    assert records[0] == {"line": 2, "command": "update 1 --stock 5", "ok": True, "result": {"id": 1, "stock": 5}}
+    assert records[1]["ok"] is False and records[1]["error"] == "Product not found"
+    assert records[2]["result"] == {"id": 2, "stock": 0}
+    assert records[3]["ok"] is False and records[3]["exit_code"] == 2
+    assert "2 command(s) failed" in captured.err
+    assert calls[0] == ("PATCH", "http://x/products/1", {"stock": 5})
+
+
+def test_cli_batch_keeps_going_after_unexpected_errors(monkeypatch, tmp_path, capsys):
+    import io
+
+    monkeypatch.setattr(cli._get_session(), "request", lambda method, url, json=None, timeout=8: FakeResp(200, {"id": 1}))
+    missing = tmp_path / "missing.csv"
+    monkeypatch.setattr("sys.stdin", io.StringIO(f"import {missing}\nshow 'unbalanced\nshow 1\n"))
+
+    try:
+        cli.main(["--base-url", "http://x", "batch"])
+    except SystemExit as e:
+        assert e.code == 1
+    else:
+        raise AssertionError("expected a failing exit code")
+
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(r["line"], r["ok"]) for r in records] == [(1, False), (2, False), (3, True)]
+    assert "missing.csv" in records[0]["error"]
+    assert records[1]["error"].startswith("invalid command") and records[1]["exit_code"] == 2
+    assert records[2]["result"] == {"id": 1}
+
+
+def test_cli_batch_concurrency_keeps_input_order(monkeypatch, capsys):
+    import io
+    import threading
+    import time
+
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fake_request(method, url, json=None, timeout=8):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        product_id = int(url.rsplit("/", 1)[1])
+        # Later commands finish first
+        time.sleep(0.002 * (20 - product_id))
+        with lock:
+            active["now"] -= 1
+        return FakeResp(200, {"id": product_id})
+
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
+    monkeypatch.setattr("sys.stdin", io.StringIO("".join(f"show {i}\n" for i in range(1, 21))))
+
+    cli.main(["--base-url", "http://x", "batch", "--concurrency", "4"])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r["result"]["id"] for r in records] == list(range(1, 21))
+    assert 1 < active["peak"] <= 4
+
+
+def test_cli_shell_runs_commands_until_exit(monkeypatch, capsys):
+    def fake_request(method, url, json=None, timeout=8):
+        if url.endswith("/products/999"):
+            return FakeResp(404, {"error": "Product not found"})
+        return FakeResp(200, {"id": 1, "name": "Milk"})
+
+    monkeypatch.setattr(cli._get_session(), "request", fake_request)
+    lines = iter(["show 1", "show 999", "batch", "exit", "show 1"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(lines))
+
+    cli.main(["--base-url", "http://x", "shell"])
+    captured = capsys.readouterr()
+    assert captured.out.count('"name": "Milk"') == 1
+    assert "ERROR: Product not found" in captured.err
+    assert "can't be run from inside batch or shell" in captured.err
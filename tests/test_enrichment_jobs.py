@@ -0,0 +1,83 @@
+from app import app, enrichment_jobs
+from services.ratelimit import RateLimiter
+
+
+def _wait_for(job_id):
+    job = enrichment_jobs.get(job_id)
+    assert job.wait(timeout=5)
+
+
+def test_bulk_enrich_by_ids(monkeypatch):
+    # Barcoded products get enriched; the banana (no barcode) and a missing id are reported
+    monkeypatch.setattr("app.fetch_by_barcode", lambda barcode: {"product_name": f"OFF {barcode}"})
+
+    client = app.test_client()
+    resp = client.post("/products/enrich", json={"ids": [1, 2, 3, 999]})
+    assert resp.status_code == 202
+    job_id = resp.get_json()["job_id"]
+    _wait_for(job_id)
+
+    body = client.get(f"/products/enrich/{job_id}?results=1").get_json()
+    assert body["status"] == "done"
+    assert body["processed"] == 4
+    assert body["counts"]["enriched"] == 2
+    assert body["counts"]["no_barcode"] == 1
+    assert body["counts"]["missing"] == 1
+    assert client.get("/products/3").get_json()["details"]["product_name"] == "OFF 051500255872"
+
+
+def test_bulk_enrich_missing_only(monkeypatch):
+    # "missing" should skip products that already have details and ones without a barcode
+    monkeypatch.setattr("app.fetch_by_barcode", lambda barcode: {"product_name": "x"})
+
+    client = app.test_client()
+    client.patch("/products/1", json={"details": {"product_name": "already there"}})
+    resp = client.post("/products/enrich", json={"missing": True})
+    body = resp.get_json()
+    assert body["total"] == 1
+    _wait_for(body["job_id"])
+
+    assert client.get("/products/1").get_json()["details"]["product_name"] == "already there"
+
+
+def test_bulk_enrich_failures_are_counted(monkeypatch):
+    def boom(barcode):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr("app.fetch_by_barcode", boom)
+
+    client = app.test_client()
+    job_id = client.post("/products/enrich", json={"ids": [1]}).get_json()["job_id"]
+    _wait_for(job_id)
+    assert client.get(f"/products/enrich/{job_id}").get_json()["counts"]["failed"] == 1
+
+
+def test_bulk_enrich_validation():
+    client = app.test_client()
+    assert client.post("/products/enrich", json={}).status_code == 400
+    assert client.post("/products/enrich", json={"ids": "1,2"}).status_code == 400
+    # Valid JSON that isn't an object
+    for body in ([1, 2], "x", 5):
+        resp = client.post("/products/enrich", json=body)
+        assert resp.status_code == 400
+        assert resp.get_json()["error"] == "Request body must be a JSON object"
+    assert client.get("/products/enrich/nope").status_code == 404
+
+
+def test_rate_limiter_spaces_out_calls(monkeypatch):
+    # With no burst allowance, 3 calls at 10/s need roughly 0.2s of sleeping.
+    # Fake the clock so the test doesn't actually sleep.
+    now = [0.0]
+    slept = []
+
+    def fake_sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr("services.ratelimit.time.monotonic", lambda: now[0])
+    monkeypatch.setattr("services.ratelimit.time.sleep", fake_sleep)
+
+    limiter = RateLimiter(10, burst=1)
+    for _ in range(3):
+        limiter.acquire()
+    assert round(sum(slept), 3) == 0.2
@@ -70,3 +70,18 @@ def test_enrich_external_failure(monkeypatch):
     client = app.test_client()
     resp = client.patch("/products/1/enrich")
     assert resp.status_code == 502
+
+
+def test_search_by_name_with_limit_returns_ranked_list(monkeypatch):
+    def fake_search(name, limit):
+        return [{"score": 2.0, "product": {"product_name": "Nutella"}}][:limit]
+
+    monkeypatch.setattr("app.search_by_name", fake_search)
+
+    client = app.test_client()
+    resp = client.get("/products/search?name=nutella&limit=3")
+    assert resp.status_code == 200
+    assert resp.get_json()[0]["product"]["product_name"] == "Nutella"
+
+    assert client.get("/products/search?name=nutella&limit=0").status_code == 400
+    assert client.get("/products/search?name=nutella&limit=x").status_code == 400
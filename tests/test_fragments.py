@@ -0,0 +1,145 @@
+import json
+
+from flask import jsonify
+
+import app as app_module
+from app import app
+from fragments import FragmentCache
+from store import ProductStore
+
+
+def _cache(store: ProductStore) -> FragmentCache:
+    cache = FragmentCache(json.dumps)
+    store.subscribe(cache.on_change, replay=False)
+    return cache
+
+
+def test_list_bodies_match_jsonify_byte_for_byte():
+    # Joining cached fragments must give exactly what encoding the whole list would
+    client = app.test_client()
+    app_module.store.update(2, {"details": {"brands": "Chiquita", "tags": ["en:fruits"]}, "name": "Bananas é"})
+
+    with app.app_context():
+        expected_all = jsonify(app_module.store.all()).get_data()
+        items, next_after = app_module.store.page(limit=2)
+        expected_page = jsonify({"items": items, "next_after": next_after}).get_data()
+        expected_one = jsonify(app_module.store.get(2)).get_data()
+
+    # Twice: once filling the cache, once served from it
+    for _ in range(2):
+        assert client.get("/products").get_data() == expected_all
+        assert client.get("/products?limit=2").get_data() == expected_page
+        assert client.get("/products/2").get_data() == expected_one
+
+
+def test_reads_during_a_change_never_cache_the_old_body(monkeypatch):
+    # GETs run from inside the store's listeners, on both sides of `versions`: whatever they
+    # see, afterwards the new ETag has to come with the new body
+    client = app.test_client()
+    store = app_module.store
+    client.get("/products")
+    seen = []
+
+    def reader(action, old, new):
+        resp = client.get("/products")
+        seen.append((resp.headers["ETag"], resp.get_json()[0]["stock"]))
+
+    listeners = list(store._listeners)
+    fragments_at = listeners.index(app_module.product_fragments.on_change)
+    versions_at = listeners.index(app_module.versions.on_change)
+    assert fragments_at < versions_at
+    listeners.insert(versions_at + 1, reader)
+    listeners.insert(versions_at, reader)
+    monkeypatch.setattr(store, "_listeners", listeners)
+
+    store.update(1, {"stock": 5})
+    # Before `versions` the old ETag may still serve its old body; after it, only the new one
+    assert seen[0][0] != seen[1][0]
+    assert seen[1][1] == 5
+
+    resp = client.get("/products")
+    assert resp.get_json()[0]["stock"] == 5
+    assert resp.headers["ETag"] == seen[-1][0]
+    assert client.get("/products", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
+
+
+def test_fragment_changed_after_a_readers_mark_is_not_served_to_it(make_backend):
+    store = ProductStore([{"id": 1, "name": "Milk"}], backend=make_backend())
+    cache = _cache(store)
+
+    since = cache.mark()
+    old = store.get(1)
+    store.update(1, {"name": "Oat Milk"})
+    # A newer reader caches the new encoding...
+    cache.join(store.iter_products(), cache.mark())
+    # ...which the older one mustn't mix into its body
+    assert json.loads(cache.encode(old, since))["name"] == "Milk"
+    assert json.loads(cache.join_ids([1], store.get, since))[0]["name"] == "Oat Milk"
+
+
+def test_fragments_are_reused_until_the_product_changes(make_backend):
+    store = ProductStore([{"id": 1, "name": "Milk"}, {"id": 2, "name": "Eggs"}], backend=make_backend())
+    cache = _cache(store)
+
+    first = cache.join(store.iter_products(), cache.mark())
+    assert json.loads(first) == store.all()
+    assert len(cache) == 2
+
+    cache.join(store.iter_products(), cache.mark())
+    assert cache.hits == 2
+
+    store.update(1, {"name": "Oat Milk"})
+    assert len(cache) == 1
+    assert json.loads(cache.join(store.iter_products(), cache.mark()))[0]["name"] == "Oat Milk"
+
+    store.delete(2)
+    assert json.loads(cache.join(store.iter_products(), cache.mark())) == [store.get(1)]
+
+
+def test_stale_read_is_never_cached(make_backend):
+    # A reader that picked up a product before a write must not store that old encoding
+    store = ProductStore([{"id": 1, "name": "Milk"}], backend=make_backend())
+    cache = _cache(store)
+
+    since = cache.mark()
+    old = store.get(1)
+    store.update(1, {"name": "Oat Milk"})
+    assert json.loads(cache.encode(old, since))["name"] == "Milk"
+    assert len(cache) == 0
+
+    # Same after a reload replaced everything
+    since = cache.mark()
+    old = store.get(1)
+    store.load([{"id": 1, "name": "Goat Milk"}])
+    cache.encode(old, since)
+    assert json.loads(cache.join(store.iter_products(), cache.mark()))[0]["name"] == "Goat Milk"
+
+
+def test_maxsize_caps_cached_fragments(make_backend):
+    store = ProductStore([{"id": i, "name": f"p{i}"} for i in range(1, 6)], backend=make_backend())
+    cache = _cache(store)
+    cache.maxsize = 2
+
+    body = cache.join(store.iter_products(), cache.mark())
+    assert len(json.loads(body)) == 5
+    assert len(cache) == 2
+
+
+def test_join_ids_only_reads_products_without_a_fragment(make_backend):
+    store = ProductStore([{"id": i, "name": f"p{i}"} for i in range(1, 5)], backend=make_backend())
+    cache = _cache(store)
+    expected = cache.join(store.iter_products(), cache.mark())
+
+    store.update(2, {"name": "Oat Milk"})
+    store.delete(3)
+    read = []
+
+    def get(product_id):
+        read.append(product_id)
+        return store.get(product_id)
+
+    # 3 was deleted after its id was read, so it's left out
+    body = cache.join_ids([1, 2, 3, 4], get, cache.mark())
+    assert read == [2, 3]
+    assert json.loads(body) == store.all()
+    assert body != expected
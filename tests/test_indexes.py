@@ -0,0 +1,135 @@
+import random
+
+from app import app
+from indexes import SortedIndex, build_indexes, find_products
+from store import ProductStore
+
+
+def test_sorted_index_stays_in_sync_with_random_writes(make_backend):
+    # Compare range lookups against a brute force filter after a mix of adds/updates/deletes
+    rng = random.Random(3)
+    store = ProductStore(
+        [{"id": i, "name": f"p{i}", "price": rng.choice([0.5, 1.25, 2.0, 9.99]), "stock": rng.randint(0, 20)}
+         for i in range(1, 201)],
+        backend=make_backend(),
+    )
+    index = SortedIndex("stock")
+    store.subscribe(index.on_change)
+
+    for _ in range(300):
+        roll = rng.random()
+        if roll < 0.5:
+            stock = rng.randint(0, 20) if rng.random() < 0.8 else "n/a"
+            store.update(rng.randint(1, store.next_id - 1), {"stock": stock})
+        elif roll < 0.8:
+            store.add({"name": "new", "stock": rng.randint(0, 20)})
+        else:
+            store.delete(rng.randint(1, store.next_id - 1))
+
+    for low, high in [(None, None), (5, 10), (None, 3), (18, None), (7, 7), (30, 40)]:
+        expected = sorted(
+            (p["stock"], p["id"]) for p in store.iter_products()
+            if isinstance(p["stock"], int)
+            and (low is None or p["stock"] >= low) and (high is None or p["stock"] <= high)
+        )
+        assert index.ids(low, high) == [product_id for _, product_id in expected]
+        assert index.count(low, high) == len(expected)
+
+
+def test_find_products_combines_filters_and_sorts(make_backend):
+    store = ProductStore([
+        {"id": 1, "name": "milk", "barcode": "1", "price": 3.0, "stock": 5},
+        {"id": 2, "name": "Bread", "barcode": None, "price": 2.0, "stock": 50},
+        {"id": 3, "name": "eggs", "barcode": "3", "price": 3.0, "stock": 2},
+        {"id": 4, "name": "jam", "barcode": None, "price": "free", "stock": 0},
+    ], backend=make_backend())
+    indexes = build_indexes(store)
+
+    def ids(**query):
+        products, total = find_products(store, indexes, **query)
+        assert total == len(products)
+        return [p["id"] for p in products]
+
+    assert ids(ranges={"price": (3.0, 3.0)}) == [1, 3]
+    assert ids(ranges={"price": (3.0, 3.0)}, sort="stock") == [3, 1]
+    assert ids(ranges={"stock": (None, 10), "price": (None, 2.5)}) == []
+    assert ids(ranges={"stock": (None, 10)}, has_barcode=False) == [4]
+    assert ids(barcode="3") == [3]
+    assert ids(sort="name") == [2, 3, 4, 1]
+    # Non-numeric prices sort last (first when descending)
+    assert ids(sort="price") == [2, 1, 3, 4]
+    assert ids(sort="price", descending=True) == [4, 3, 1, 2]
+    assert ids(sort="stock", descending=True) == [2, 1, 3, 4]
+
+    # Paging, both when the index answers the query alone and when candidates get filtered
+    assert find_products(store, indexes, ranges={"stock": (1, None)}, descending=True, sort="stock", limit=1) == (
+        [store.get(2)], 3
+    )
+    assert find_products(store, indexes, ranges={"stock": (1, None)}, has_barcode=True, offset=1) == (
+        [store.get(3)], 2
+    )
+
+
+def test_get_products_filters():
+    client = app.test_client()
+
+    resp = client.get("/products?stock_max=20")
+    assert resp.status_code == 200
+    assert [p["id"] for p in resp.get_json()] == [3]
+
+    resp = client.get("/products?price_min=1&price_max=4&sort=-price")
+    assert [p["id"] for p in resp.get_json()] == [1]
+
+    resp = client.get("/products?has_barcode=false")
+    assert [p["name"] for p in resp.get_json()] == ["Bananas"]
+
+    resp = client.get("/products?barcode=012000001658&fields=id,name")
+    assert resp.get_json() == [{"id": 1, "name": "Whole Milk"}]
+
+    resp = client.get("/products?stock=120")
+    assert [p["id"] for p in resp.get_json()] == [2]
+
+
+def test_get_products_sort_fields_and_offset_paging():
+    client = app.test_client()
+
+    resp = client.get("/products?sort=price&fields=name,price&limit=2")
+    assert resp.get_json() == {
+        "items": [{"name": "Bananas", "price": 0.59}, {"name": "Whole Milk", "price": 3.49}],
+        "next_offset": 2,
+        "total": 3,
+    }
+
+    resp = client.get("/products?sort=price&fields=name&limit=2&offset=2")
+    assert resp.get_json() == {"items": [{"name": "Peanut Butter"}], "next_offset": None, "total": 3}
+
+
+def test_get_products_filters_follow_writes():
+    client = app.test_client()
+    assert client.get("/products?stock_max=20").get_json()[0]["id"] == 3
+
+    client.patch("/products/3", json={"stock": 100})
+    client.patch("/products/1", json={"stock": 1})
+    client.post("/products", json={"name": "Salt", "stock": 7})
+    assert [p["name"] for p in client.get("/products?stock_max=20&sort=stock").get_json()] == ["Whole Milk", "Salt"]
+
+    client.delete("/products/1")
+    assert [p["name"] for p in client.get("/products?stock_max=20").get_json()] == ["Salt"]
+
+
+def test_get_products_query_validation():
+    client = app.test_client()
+    for query in [
+        "price_min=cheap",
+        "stock_max=nan",
+        "has_barcode=maybe",
+        "sort=details",
+        "fields=id,secret",
+        "sort=price&after=1",
+        "sort=price&limit=0",
+        "sort=price&offset=-1",
+        "sort=price&stream=ndjson",
+    ]:
+        resp = client.get(f"/products?{query}")
+        assert resp.status_code == 400, query
+        assert "error" in resp.get_json()
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from storage.journal import Journal
+from storage.memory import MemoryBackend
+from storage.sqlite import SqliteBackend
+from store import ProductStore
+
+
+def _open(directory, **kwargs):
+    # A "process start": brand new store + journal pointed at the same directory
+    store = ProductStore(backend=MemoryBackend())
+    journal = Journal(str(directory), group_commit_ms=0, **kwargs)
+    replayed = journal.attach(store)
+    return store, journal, replayed
+
+
+def test_journal_replays_changes_after_restart(tmp_path):
+    store, journal, _ = _open(tmp_path)
+    milk = store.add({"name": "Milk", "stock": 5})
+    eggs = store.add({"name": "Eggs"})
+    store.update(milk["id"], {"stock": 4})
+    store.delete(eggs["id"])
+    journal.close()
+
+    store, journal, replayed = _open(tmp_path)
+    assert replayed == 4
+    assert [p["name"] for p in store.all()] == ["Milk"]
+    assert store.get(milk["id"])["stock"] == 4
+    # Deleted ids stay retired after a restart
+    assert store.add({"name": "Bread"})["id"] == 3
+    journal.close()
+
+
+def test_snapshot_compacts_journal(tmp_path):
+    store, journal, _ = _open(tmp_path)
+    for i in range(5):
+        store.add({"name": f"p{i}"})
+    journal.snapshot()
+    store.update(1, {"name": "renamed"})
+    journal.close()
+
+    # Only the post-snapshot segment should be left, holding just the one update
+    segments = [f for f in os.listdir(tmp_path) if f.startswith("journal-")]
+    assert len(segments) == 1
+
+    store, journal, replayed = _open(tmp_path)
+    assert replayed == 1
+    assert len(store) == 5
+    assert store.get(1)["name"] == "renamed"
+    journal.close()
+
+
+def test_automatic_snapshot_after_threshold(tmp_path):
+    store, journal, _ = _open(tmp_path, snapshot_every=3)
+    for i in range(10):
+        store.add({"name": f"p{i}"})
+    journal.close()
+
+    assert os.path.exists(tmp_path / "snapshot.bin")
+    store, journal, _ = _open(tmp_path)
+    assert len(store) == 10
+    journal.close()
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    store, journal, _ = _open(tmp_path)
+    store.add({"name": "Milk"})
+    journal.close()
+
+    # Simulate a crash halfway through writing the next record
+    segment = sorted(f for f in os.listdir(tmp_path) if f.startswith("journal-"))[-1]
+    with open(tmp_path / segment, "a") as f:
+        f.write('{"op":"add","product":{"id":2')
+
+    store, journal, replayed = _open(tmp_path)
+    assert replayed == 1
+    assert len(store) == 1
+    journal.close()
+
+
+def test_journal_keeps_existing_rows_when_nothing_is_on_disk(tmp_path):
+    store = ProductStore([{"id": 1, "name": "Milk"}, {"id": 2, "name": "Eggs"}], backend=MemoryBackend())
+    journal = Journal(str(tmp_path), group_commit_ms=0)
+    assert journal.attach(store) == 0
+    assert [p["name"] for p in store.all()] == ["Milk", "Eggs"]
+    journal.close()
+
+    # They were snapshotted, so they survive a restart
+    store, journal, _ = _open(tmp_path)
+    assert [p["name"] for p in store.all()] == ["Milk", "Eggs"]
+    journal.close()
+
+
+def test_journal_refuses_persistent_backends(tmp_path):
+    store = ProductStore(backend=SqliteBackend(str(tmp_path / "inventory.db")))
+    store.add({"name": "Milk"})
+    with pytest.raises(ValueError):
+        Journal(str(tmp_path / "journal"), group_commit_ms=0).attach(store)
+    assert len(store) == 1
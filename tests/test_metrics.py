@@ -0,0 +1,122 @@
+import gc
+import threading
+
+import pytest
+import requests
+
+from app import app
+from metrics import MetricsRegistry
+from services import openfoodfacts
+from services.cache import TTLCache
+
+
+class FakeResp:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def test_counter_and_histogram_render():
+    registry = MetricsRegistry()
+    hits = registry.counter("hits_total", "Hits", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+
+    hits.inc("/a")
+    hits.inc("/a", amount=2)
+    hits.inc('/b"q')
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, "/a")
+
+    text = registry.render()
+    assert "# TYPE hits_total counter" in text
+    assert 'hits_total{route="/a"} 3' in text
+    assert 'hits_total{route="/b\\"q"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 3' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/a"} 4' in text
+    assert 'latency_seconds_sum{route="/a"} 3.65' in text
+
+    with pytest.raises(ValueError):
+        hits.inc()
+
+
+def test_per_thread_buckets_merge_and_retire():
+    # Every thread records into its own buckets; finished threads get folded into the totals
+    registry = MetricsRegistry()
+    hits = registry.counter("hits_total", "Hits")
+    latency = registry.histogram("latency_seconds", "Latency")
+
+    def work():
+        for _ in range(1000):
+            hits.inc()
+            latency.observe(0.002)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    del t, threads
+    gc.collect()
+
+    text = registry.render()
+    assert "hits_total 8000" in text
+    assert "latency_seconds_count 8000" in text
+    assert len(registry._live) == 0
+
+
+def test_metrics_endpoint():
+    client = app.test_client()
+    client.get("/products/1")
+    client.get("/products/1")
+    client.get("/products/999")
+    client.get("/no-such-route")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.content_type.startswith("text/plain")
+    text = resp.get_data(as_text=True)
+
+    # Counters are process-wide (other tests add to them too), so just check the series exist
+    assert 'http_requests_total{route="/products/<int:product_id>",method="GET",status="200"}' in text
+    assert 'http_requests_total{route="/products/<int:product_id>",method="GET",status="404"}' in text
+    assert 'http_requests_total{route="unmatched",method="GET",status="404"}' in text
+    assert 'http_request_duration_seconds_bucket{route="/products/<int:product_id>",method="GET",le="+Inf"}' in text
+    assert "inventory_products 3" in text
+    assert "process_resident_memory_bytes " in text
+
+
+def test_off_client_reports_outcomes(monkeypatch):
+    seen = []
+    client = openfoodfacts.OpenFoodFactsClient(cache=TTLCache())
+    client.observer = lambda endpoint, outcome, seconds: seen.append((endpoint, outcome))
+
+    responses = {
+        "1": lambda: FakeResp(200, {"product": {"product_name": "Nutella"}}),
+        "2": lambda: FakeResp(404, {"status": 0}),
+        "3": lambda: (_ for _ in ()).throw(requests.ReadTimeout("slow")),
+        "4": lambda: (_ for _ in ()).throw(requests.ConnectionError("refused")),
+    }
+
+    def fake_get(url, params=None, timeout=5):
+        return responses[url.rsplit("/", 1)[-1]]()
+
+    monkeypatch.setattr(client.session, "get", fake_get)
+
+    for barcode in ("1", "1", "2"):
+        client.fetch_by_barcode(barcode)
+    for barcode in ("3", "4"):
+        with pytest.raises(requests.RequestException):
+            client.fetch_by_barcode(barcode)
+
+    assert seen == [
+        ("product", "found"),
+        ("product", "hit"),
+        ("product", "not_found"),
+        ("product", "timeout"),
+        ("product", "error"),
+    ]
@@ -0,0 +1,78 @@
+import gzip
+import json
+
+import pytest
+import requests
+
+from services.offdump import LocalIndex, import_dump
+from services.openfoodfacts import OpenFoodFactsClient
+
+# Tiny generated "dump": a few products with extra junk fields we shouldn't keep
+RECORDS = [
+    {"code": "3017624010701", "product_name": "Nutella", "brands": "Ferrero",
+     "categories_tags": ["en:spreads"], "nutriments": {"sugars": 56.3}},
+    {"code": "012000001658", "product_name": "Whole Milk", "brands": "Acme", "quantity": "1 gal"},
+    {"code": "", "product_name": "No barcode, should be skipped"},
+]
+
+
+def _write_jsonl_gz(path):
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for record in RECORDS:
+            f.write(json.dumps(record) + "\n")
+        f.write("{not json\n")
+
+
+def _write_csv(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("code\tproduct_name\tbrands\tcategories_tags\tquantity\n")
+        f.write("3017624010701\tNutella\tFerrero\ten:spreads,en:sweet-spreads\t400 g\n")
+
+
+def test_import_jsonl_projects_fields(tmp_path):
+    dump = str(tmp_path / "dump.jsonl.gz")
+    db = str(tmp_path / "off.sqlite")
+    _write_jsonl_gz(dump)
+
+    assert import_dump(dump, db, batch_size=1) == 2
+
+    index = LocalIndex(db)
+    assert len(index) == 2
+    nutella = index.get("3017624010701")
+    assert nutella["product_name"] == "Nutella"
+    assert "nutriments" not in nutella
+    assert index.get("999") is None
+
+
+def test_import_csv_splits_tags(tmp_path):
+    dump = str(tmp_path / "dump.csv")
+    db = str(tmp_path / "off.sqlite")
+    _write_csv(dump)
+
+    import_dump(dump, db)
+    details = LocalIndex(db).get("3017624010701")
+    assert details["categories_tags"] == ["en:spreads", "en:sweet-spreads"]
+    assert details["quantity"] == "400 g"
+
+
+def test_client_is_local_first(tmp_path, monkeypatch):
+    # Local hits never touch the network; misses still fall back to it
+    dump = str(tmp_path / "dump.jsonl.gz")
+    db = str(tmp_path / "off.sqlite")
+    _write_jsonl_gz(dump)
+    import_dump(dump, db)
+
+    client = OpenFoodFactsClient(local_index=LocalIndex(db))
+    calls = []
+
+    def offline_get(url, params=None, timeout=5):
+        calls.append(url)
+        raise requests.ConnectionError("no network in the store")
+
+    monkeypatch.setattr(client.session, "get", offline_get)
+
+    assert client.fetch_by_barcode("012000001658")["product_name"] == "Whole Milk"
+    assert calls == []
+    with pytest.raises(requests.ConnectionError):
+        client.fetch_by_barcode("404404")
+    assert len(calls) == 1
@@ -0,0 +1,385 @@
+import asyncio
+import threading
+
+import pytest
+import requests
+
+from services import openfoodfacts
+from services.cache import TTLCache
+from services.deadline import DeadlineExceeded, deadline
+from services.singleflight import AsyncSingleFlight, SingleFlight
+
+
+class FakeResp:
+    # Minimal stand-in for requests.Response
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fetch_by_barcode_is_cached(monkeypatch):
+    # Second lookup for the same barcode should come from the cache, not the network
+    calls = []
+
+    def fake_get(url, params=None, timeout=5):
+        calls.append(url)
+        return FakeResp(200, {"product": {"product_name": "Nutella", "brands": "Ferrero"}})
+
+    monkeypatch.setattr(openfoodfacts.default_client.session, "get", fake_get)
+
+    first = openfoodfacts.fetch_by_barcode("3017624010701")
+    second = openfoodfacts.fetch_by_barcode(" 3017624010701 ")
+    assert first == second
+    assert first["product_name"] == "Nutella"
+    assert len(calls) == 1
+    assert openfoodfacts.cache.stats()["hits"] == 1
+
+
+def test_not_found_is_negatively_cached(monkeypatch):
+    # A real 404 gets remembered; a network error does not
+    calls = []
+
+    def fake_get(url, params=None, timeout=5):
+        calls.append(url)
+        return FakeResp(404, {"status": 0})
+
+    monkeypatch.setattr(openfoodfacts.default_client.session, "get", fake_get)
+
+    assert openfoodfacts.fetch_by_barcode("000") is None
+    assert openfoodfacts.fetch_by_barcode("000") is None
+    assert len(calls) == 1
+
+
+def test_network_errors_are_not_cached(monkeypatch):
+    def boom(url, params=None, timeout=5):
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(openfoodfacts.default_client.session, "get", boom)
+    # Raised, not None: an outage isn't "not found"
+    with pytest.raises(requests.ConnectionError):
+        openfoodfacts.fetch_by_barcode("111")
+    assert openfoodfacts.cache.get("barcode:111") == (False, None)
+
+
+def test_cache_ttl_and_negative_ttl():
+    clock = FakeClock()
+    cache = TTLCache(ttl=60, negative_ttl=5, clock=clock)
+    cache.set("found", {"a": 1})
+    cache.set("missing", None)
+
+    clock.now += 10
+    assert cache.get("found") == (True, {"a": 1})
+    assert cache.get("missing") == (False, None)
+
+    clock.now += 60
+    assert cache.get("found") == (False, None)
+
+
+def test_cache_lru_eviction():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # touch a so b becomes least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_persists_to_disk(tmp_path):
+    path = str(tmp_path / "off-cache.json")
+    cache = TTLCache(path=path)
+    cache.set("barcode:1", {"product_name": "Milk"})
+    cache.set("barcode:2", None)
+    cache.save()
+
+    reloaded = TTLCache(path=path)
+    assert reloaded.get("barcode:1") == (True, {"product_name": "Milk"})
+    assert reloaded.get("barcode:2") == (True, None)
+
+
+def test_client_uses_pooled_session_with_retries():
+    # Both schemes should be mounted on an adapter with a sized pool and 429/5xx retries
+    client = openfoodfacts.OpenFoodFactsClient(pool_size=4, retries=3, connect_timeout=1, read_timeout=2)
+    adapter = client.session.get_adapter("https://world.openfoodfacts.net")
+    assert adapter._pool_maxsize == 4
+    assert adapter.max_retries.total == 3
+    assert 429 in adapter.max_retries.status_forcelist
+    assert client.timeout == (1, 2)
+
+
+def test_client_upstream_5xx_is_not_cached(monkeypatch):
+    # A 503 (after retries) is an outage, not a "not found", so it must not be cached
+    client = openfoodfacts.OpenFoodFactsClient()
+    monkeypatch.setattr(client.session, "get", lambda url, params=None, timeout=5: FakeResp(503))
+
+    with pytest.raises(requests.HTTPError):
+        client.fetch_by_barcode("123")
+    assert len(client.cache) == 0
+
+
+def test_concurrent_lookups_share_one_request(monkeypatch):
+    # A burst of lookups for the same barcode should wait on a single upstream call
+    client = openfoodfacts.OpenFoodFactsClient()
+    release = threading.Event()
+    calls = []
+
+    def slow_get(url, params=None, timeout=5):
+        calls.append(url)
+        release.wait(timeout=5)
+        return FakeResp(200, {"product": {"product_name": "Nutella"}})
+
+    monkeypatch.setattr(client.session, "get", slow_get)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.fetch_by_barcode("301"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+
+    # Let everyone pile up behind the leader before the "network" answers
+    while client.inflight.coalesced < 7:
+        threading.Event().wait(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert [r["product_name"] for r in results] == ["Nutella"] * 8
+
+
+def test_singleflight_shares_errors():
+    # Waiters get the leader's exception, and the key is free again afterwards
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(timeout=5)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flight.do("k", failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(timeout=5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.coalesced < 1:
+        threading.Event().wait(0.01)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert errors == ["boom", "boom"]
+    assert flight.in_flight() == 0
+    assert flight.do("k", lambda: 42) == 42
+
+
+def test_singleflight_waiters_keep_their_own_deadline():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def slow():
+        started.set()
+        release.wait(timeout=5)
+        return 42
+
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    leader.start()
+    started.wait(timeout=5)
+
+    # The follower gives up when its budget runs out; the leader's call isn't affected
+    with deadline(0.05):
+        with pytest.raises(DeadlineExceeded):
+            flight.do("k", slow)
+    release.set()
+    leader.join()
+    assert results == [42]
+    assert flight.in_flight() == 0
+
+
+def test_async_singleflight_waiters_keep_their_own_deadline():
+    async def main():
+        flight = AsyncSingleFlight()
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return 42
+
+        leader = asyncio.create_task(flight.do("k", slow))
+        await asyncio.sleep(0)
+        with deadline(0.05):
+            with pytest.raises(DeadlineExceeded):
+                await flight.do("k", slow)
+        release.set()
+        return await leader
+
+    assert asyncio.run(main()) == 42
+
+
+def test_singleflight_waiter_with_more_budget_retries_after_leader_times_out():
+    # The leader's short budget runs out mid-call; the waiter had more, so it calls again
+    # on its own budget instead of inheriting the leader's timeout
+    flight = SingleFlight()
+    started = threading.Event()
+    calls = []
+    errors = []
+
+    def lookup():
+        calls.append(1)
+        if len(calls) == 1:
+            started.set()
+            while flight.coalesced < 1:
+                threading.Event().wait(0.01)
+            raise DeadlineExceeded("Request deadline exceeded")
+        return 42
+
+    def short_leader():
+        with deadline(0.5):
+            try:
+                flight.do("k", lookup)
+            except DeadlineExceeded as e:
+                errors.append(e)
+
+    leader = threading.Thread(target=short_leader)
+    leader.start()
+    started.wait(timeout=5)
+    with deadline(5):
+        assert flight.do("k", lookup) == 42
+    leader.join()
+    assert len(errors) == 1
+    assert len(calls) == 2
+
+
+def test_singleflight_waiter_with_less_budget_shares_the_timeout():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def timing_out():
+        started.set()
+        release.wait(timeout=5)
+        raise requests.Timeout("slow")
+
+    def call(budget):
+        with deadline(budget):
+            try:
+                flight.do("k", timing_out)
+            except requests.Timeout as e:
+                errors.append(e)
+
+    leader = threading.Thread(target=call, args=(None,))
+    leader.start()
+    started.wait(timeout=5)
+    follower = threading.Thread(target=call, args=(5,))
+    follower.start()
+    while flight.coalesced < 1:
+        threading.Event().wait(0.01)
+    release.set()
+    leader.join()
+    follower.join()
+    # The leader had no budget at all, so its timeout was OFF's, not a budget's: shared
+    assert [str(e) for e in errors] == ["slow", "slow"]
+
+
+def test_async_singleflight_waiter_with_more_budget_retries_after_leader_times_out():
+    async def main():
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def lookup():
+            calls.append(1)
+            if len(calls) == 1:
+                await asyncio.sleep(0.1)
+                raise DeadlineExceeded("Request deadline exceeded")
+            return 42
+
+        async def short_leader():
+            with deadline(0.05):
+                return await flight.do("k", lookup)
+
+        leader = asyncio.create_task(short_leader())
+        await asyncio.sleep(0)
+        with deadline(5):
+            result = await flight.do("k", lookup)
+        with pytest.raises(DeadlineExceeded):
+            await leader
+        return result, len(calls)
+
+    assert asyncio.run(main()) == (42, 2)
+
+
+def test_name_search_ranks_candidates_and_projects_fields(monkeypatch):
+    seen = {}
+
+    def fake_get(url, params=None, timeout=5):
+        seen.update(params)
+        return FakeResp(200, {"products": [
+            {"product_name": "Chocolate milk drink", "brands": "Acme"},
+            {"product_name": ""},
+            {"product_name": "Oat drink", "brands": "Milky Way"},
+            {"product_name": "Whole Milk", "brands": "Farm"},
+            {"product_name": "Milk", "brands": "Farm"},
+        ]})
+
+    client = openfoodfacts.OpenFoodFactsClient(cache=TTLCache())
+    monkeypatch.setattr(client.session, "get", fake_get)
+
+    results = client.search_by_name("milk", limit=3)
+    assert seen["fields"] == openfoodfacts.FIELDS
+    assert [r["product"]["product_name"] for r in results] == ["Milk", "Whole Milk", "Chocolate milk drink"]
+    assert results[0]["score"] > results[1]["score"] > results[2]["score"]
+
+    # Same ranked pool, no second request
+    assert client.fetch_by_name("MILK ")["product_name"] == "Milk"
+    assert len(client.search_by_name("milk", limit=10)) == 4
+
+
+def test_name_scoring_prefers_prefix_and_brand_matches():
+    tokens = ["nutel", "ferrero"]
+    prefix_and_brand = openfoodfacts._score_candidate("nutel ferrero", tokens, {"product_name": "Nutella", "brands": "Ferrero"})
+    prefix_only = openfoodfacts._score_candidate("nutel ferrero", tokens, {"product_name": "Nutella", "brands": "Other"})
+    nothing = openfoodfacts._score_candidate("nutel ferrero", tokens, {"product_name": "Jam", "brands": "Other"})
+    assert prefix_and_brand > prefix_only > nothing == 0.0
+
+
+def test_refresh_bypasses_cache_and_raises_network_errors(monkeypatch):
+    # A refresh always asks OFF and re-caches; an outage raises instead of looking like "gone"
+    client = openfoodfacts.OpenFoodFactsClient()
+    names = iter(["Old", "New"])
+    monkeypatch.setattr(
+        client.session, "get",
+        lambda url, params=None, timeout=5: FakeResp(200, {"product": {"product_name": next(names)}}),
+    )
+
+    cached = client.fetch_by_barcode("301")
+    refreshed = client.refresh_by_barcode("301")
+    assert (cached["product_name"], refreshed["product_name"]) == ("Old", "New")
+    assert client.fetch_by_barcode("301") == refreshed
+
+    monkeypatch.setattr(client.session, "get", lambda url, params=None, timeout=5: FakeResp(503))
+    with pytest.raises(requests.HTTPError):
+        client.refresh_by_barcode("301")
+    assert client.fetch_by_barcode("301") == refreshed
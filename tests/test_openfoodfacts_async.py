@@ -0,0 +1,256 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+from services.breaker import CircuitBreaker, CircuitOpenError
+from services.cache import TTLCache
+from services.deadline import DeadlineExceeded, deadline
+from services.openfoodfacts_async import AsyncOpenFoodFactsClient
+
+
+class FakeOFF:
+    # Local stand-in for OpenFoodFacts: barcodes in `products` are found, anything else 404s.
+    # `fail_first` makes the next N requests answer 503, `delay` slows every response down.
+    def __init__(self):
+        self.products = {}
+        self.search_results = []
+        # Barcodes answered with a 200 that isn't JSON
+        self.garbled = set()
+        self.delay = 0.0
+        self.fail_first = 0
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+
+def _handler(off: FakeOFF):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; without this, Nagle + delayed ACKs add ~40ms
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with off.lock:
+                off.requests.append(self.path)
+                off.active += 1
+                off.max_active = max(off.max_active, off.active)
+                fail = off.fail_first > 0
+                off.fail_first -= fail
+            try:
+                if off.delay:
+                    time.sleep(off.delay)
+                url = urlparse(self.path)
+                if fail:
+                    self._send(503, {})
+                elif url.path.startswith("/api/v2/product/"):
+                    barcode = url.path.rsplit("/", 1)[-1]
+                    product = off.products.get(barcode)
+                    if barcode in off.garbled:
+                        self._send(200, None, body=b"<html>oops")
+                    elif product:
+                        self._send(200, {"product": product})
+                    else:
+                        self._send(404, {"status": 0})
+                elif url.path == "/cgi/search.pl":
+                    assert parse_qs(url.query)["search_terms"]
+                    self._send(200, {"products": off.search_results})
+                else:
+                    self._send(404, {})
+            finally:
+                with off.lock:
+                    off.active -= 1
+
+        def _send(self, status, payload, body=None):
+            body = json.dumps(payload).encode() if body is None else body
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+@pytest.fixture
+def fake_off():
+    off = FakeOFF()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(off))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    off.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield off
+    server.shutdown()
+    server.server_close()
+
+
+def _client(off, **kwargs):
+    return AsyncOpenFoodFactsClient(
+        base_url=f"{off.url}/api/v2",
+        search_url=f"{off.url}/cgi/search.pl",
+        backoff=0.01,
+        cache=TTLCache(),
+        **kwargs,
+    )
+
+
+def test_async_fetch_by_barcode_cleans_and_caches(fake_off):
+    fake_off.products["123"] = {"product_name": "Nutella", "brands": "Ferrero", "extra": "dropped"}
+
+    async def run():
+        async with _client(fake_off) as client:
+            first = await client.fetch_by_barcode("123")
+            second = await client.fetch_by_barcode(" 123 ")
+            missing = await client.fetch_by_barcode("999")
+            return first, second, missing
+
+    first, second, missing = asyncio.run(run())
+    assert first == second
+    assert first["product_name"] == "Nutella"
+    assert "extra" not in first and "fetched_at" not in first
+    assert missing is None
+    assert len(fake_off.requests) == 2
+
+
+def test_async_fetch_by_name_picks_best_match(fake_off):
+    fake_off.search_results = [{"product_name": "Oat Drink"}, {"product_name": "Whole Milk"}]
+
+    async def run():
+        async with _client(fake_off) as client:
+            return await client.fetch_by_name("milk")
+
+    assert asyncio.run(run())["product_name"] == "Whole Milk"
+
+
+def test_fetch_many_bounds_concurrency(fake_off):
+    # 20 lookups at 50ms each with 5 in flight should take ~4 rounds, not 20
+    for i in range(20):
+        fake_off.products[str(i)] = {"product_name": f"P{i}"}
+    fake_off.delay = 0.05
+
+    async def run():
+        async with _client(fake_off) as client:
+            return await client.fetch_many([str(i) for i in range(20)] + ["0", "404"], concurrency=5)
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 21
+    assert results["7"]["product_name"] == "P7"
+    assert results["404"] is None
+    assert fake_off.max_active <= 5
+    assert elapsed < 0.8
+
+
+def test_fetch_many_survives_a_garbled_body(fake_off):
+    fake_off.products.update({"1": {"product_name": "P1"}, "2": {"product_name": "P2"}})
+    fake_off.garbled.add("2")
+
+    async def run():
+        async with _client(fake_off) as client:
+            return await client.fetch_many(["1", "2"])
+
+    results = asyncio.run(run())
+    assert results["1"]["product_name"] == "P1"
+    # A failure is reported as its exception, never as "not found"
+    assert isinstance(results["2"], ValueError)
+
+
+def test_concurrent_lookups_for_one_barcode_share_a_request(fake_off):
+    fake_off.products["123"] = {"product_name": "Nutella"}
+    fake_off.delay = 0.05
+
+    async def run():
+        async with _client(fake_off) as client:
+            results = await asyncio.gather(*(client.fetch_by_barcode("123") for _ in range(10)))
+            return results, client.inflight.coalesced
+
+    results, coalesced = asyncio.run(run())
+    assert all(r["product_name"] == "Nutella" for r in results)
+    assert len(fake_off.requests) == 1
+    assert coalesced == 9
+
+
+def test_async_retries_5xx(fake_off):
+    fake_off.products["123"] = {"product_name": "Nutella"}
+    fake_off.fail_first = 2
+
+    async def run():
+        async with _client(fake_off, retries=2) as client:
+            return await client.fetch_by_barcode("123")
+
+    assert asyncio.run(run())["product_name"] == "Nutella"
+    assert len(fake_off.requests) == 3
+
+
+def test_async_upstream_errors_are_not_cached(fake_off):
+    fake_off.products["123"] = {"product_name": "Nutella"}
+    fake_off.fail_first = 1
+
+    async def run():
+        async with _client(fake_off, retries=0) as client:
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.fetch_by_barcode("123")
+            return await client.fetch_by_barcode("123")
+
+    assert asyncio.run(run())["product_name"] == "Nutella"
+
+
+def test_async_unreachable_host_raises():
+    async def run():
+        client = AsyncOpenFoodFactsClient(base_url="http://127.0.0.1:9/api/v2", retries=0, cache=TTLCache())
+        async with client:
+            with pytest.raises(httpx.ConnectError):
+                await client.fetch_by_barcode("123")
+            # Bulk lookups keep going and report the error for that barcode
+            return await client.fetch_many(["123"])
+
+    assert isinstance(asyncio.run(run())["123"], httpx.ConnectError)
+
+
+def test_async_client_shares_the_breaker(fake_off):
+    # Once the breaker is open, lookups fail fast without asking OFF
+    fake_off.products["123"] = {"product_name": "Nutella"}
+    breaker = CircuitBreaker(min_calls=1)
+    breaker.record(False, 0.01)
+
+    async def run():
+        async with _client(fake_off, breaker=breaker) as client:
+            with pytest.raises(CircuitOpenError):
+                await client.fetch_by_barcode("123")
+            return await client.fetch_many(["123"])
+
+    assert isinstance(asyncio.run(run())["123"], CircuitOpenError)
+    assert fake_off.requests == []
+
+
+def test_async_lookups_stay_within_the_deadline(fake_off):
+    fake_off.products["123"] = {"product_name": "Nutella"}
+    fake_off.delay = 1.0
+
+    async def run():
+        async with _client(fake_off, breaker=CircuitBreaker()) as client:
+            with deadline(0):
+                with pytest.raises(DeadlineExceeded):
+                    await client.fetch_by_barcode("123")
+            assert fake_off.requests == []
+
+            # A slow OFF is cut off at the budget, not the 5s read timeout
+            start = time.perf_counter()
+            with deadline(0.2):
+                with pytest.raises((httpx.TimeoutException, DeadlineExceeded)):
+                    await client.fetch_by_barcode("123")
+            return time.perf_counter() - start
+
+    assert asyncio.run(run()) < 0.8
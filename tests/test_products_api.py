@@ -1,3 +1,6 @@
+import time
+
+import app as app_module
 from app import app
 
 
@@ -52,6 +55,42 @@ def test_post_product_missing_name():
     assert "error" in resp.get_json()
 
 
+def test_post_and_patch_reject_wrongly_typed_fields():
+    # Rejected before anything is written, so the store and everything derived from it agree
+    client = app.test_client()
+    etag = client.get("/products").headers["ETag"]
+    for body in [{"name": 123}, {"name": ["a"]}, {"name": "Jam", "details": "str"}, {"name": "Jam", "barcode": ["a"]}]:
+        assert client.post("/products", json=body).status_code == 400, body
+    for body in [{"name": 123}, {"details": "str"}, {"barcode": {"a": 1}}, {"barcode": 123}, ["stock"]]:
+        assert client.patch("/products/1", json=body).status_code == 400, body
+
+    assert client.get("/products/4").status_code == 404
+    assert client.get("/products").headers["ETag"] == etag
+
+
+def test_writes_read_back_the_same_on_every_backend():
+    # Runs once per storage backend (see conftest): what a write returns is what reads return
+    client = app.test_client()
+    for body in [
+        {"name": "Jam", "price": 3, "stock": 2, "barcode": "123", "details": None},
+        {"name": "Tea", "details": {"brands": "Acme"}},
+    ]:
+        created = client.post("/products", json=body)
+        assert created.status_code == 201, body
+        product = created.get_json()
+        assert client.get(f"/products/{product['id']}").get_json() == product
+
+    assert product["price"] == 0.0 and product["stock"] == 0
+    patched = client.patch("/products/1", json={"price": 2, "details": None}).get_json()
+    assert patched["price"] == 2.0 and patched["details"] == {}
+    assert client.get("/products/1").get_json() == patched
+
+    for body in [{"name": None}, {"name": "Jam", "price": None}, {"name": "Jam", "stock": None},
+                 {"name": "Jam", "stock": 1.5}, {"name": "Jam", "price": "3"}, {"name": "Jam", "price": True}]:
+        assert client.post("/products", json=body).status_code == 400, body
+    assert client.patch("/products/1", json={"stock": None}).status_code == 400
+
+
 def test_patch_product_success():
     # PATCH should allow partial updates (here we're just changing stock)
     client = app.test_client()
@@ -87,3 +126,102 @@ def test_delete_product_404():
     client = app.test_client()
     resp = client.delete("/products/999")
     assert resp.status_code == 404
+
+
+def test_get_products_paginated():
+    # limit/after should walk the inventory in id order and hand back the next cursor
+    client = app.test_client()
+    resp = client.get("/products?limit=2")
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert [p["id"] for p in body["items"]] == [1, 2]
+    assert body["next_after"] == 2
+
+    resp = client.get("/products?limit=2&after=2")
+    body = resp.get_json()
+    assert [p["id"] for p in body["items"]] == [3]
+    assert body["next_after"] is None
+
+
+def test_get_products_bad_limit():
+    # Garbage or out-of-range paging params should be a clean 400
+    client = app.test_client()
+    assert client.get("/products?limit=abc").status_code == 400
+    assert client.get("/products?limit=0").status_code == 400
+
+
+def test_get_products_stream_ndjson():
+    # NDJSON streaming returns one product per line
+    client = app.test_client()
+    resp = client.get("/products?stream=ndjson")
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+    lines = resp.get_data(as_text=True).strip().split("\n")
+    assert len(lines) == 3
+
+
+def test_get_products_stream_json_matches_plain():
+    # The streamed JSON array should decode to the same thing as the normal response
+    client = app.test_client()
+    streamed = client.get("/products?stream=json").get_json()
+    assert streamed == client.get("/products").get_json()
+
+
+def test_get_product_etag_and_304(monkeypatch):
+    # Same version -> 304 with no body; after a PATCH the old ETag no longer matches
+    # Last-Modified only shows up once its second is over
+    later = time.time() + 5
+    monkeypatch.setattr(app_module.time, "time", lambda: later)
+    client = app.test_client()
+    first = client.get("/products/1")
+    etag = first.headers["ETag"]
+    assert first.headers["Last-Modified"]
+
+    again = client.get("/products/1", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.get_data() == b""
+
+    client.patch("/products/1", json={"stock": 1})
+    changed = client.get("/products/1", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["stock"] == 1
+
+
+def test_get_products_collection_etag_changes_on_any_mutation():
+    client = app.test_client()
+    etag = client.get("/products").headers["ETag"]
+    assert client.get("/products", headers={"If-None-Match": etag}).status_code == 304
+
+    client.delete("/products/3")
+    resp = client.get("/products", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert len(resp.get_json()) == 2
+
+
+def test_get_product_if_modified_since(monkeypatch):
+    # Last-Modified only shows up once its second is over
+    later = time.time() + 5
+    monkeypatch.setattr(app_module.time, "time", lambda: later)
+    client = app.test_client()
+    last_modified = client.get("/products/2").headers["Last-Modified"]
+    resp = client.get("/products/2", headers={"If-Modified-Since": last_modified})
+    assert resp.status_code == 304
+
+
+def test_same_second_write_never_gets_a_false_304(monkeypatch):
+    # Last-Modified only has whole seconds, so it isn't handed out until its second is over;
+    # otherwise a write later in that second would still look "not modified"
+    clock = [1_000_000.25]
+    monkeypatch.setattr(app_module.time, "time", lambda: clock[0])
+    client = app.test_client()
+    client.patch("/products/2", json={"stock": 1})
+    assert "Last-Modified" not in client.get("/products/2").headers
+
+    clock[0] = 1_000_001.5
+    last_modified = client.get("/products/2").headers["Last-Modified"]
+    client.patch("/products/2", json={"stock": 2})
+    resp = client.get("/products/2", headers={"If-Modified-Since": last_modified})
+    assert resp.status_code == 200
+    assert resp.get_json()["stock"] == 2
+    assert "Last-Modified" not in resp.headers
@@ -0,0 +1,193 @@
+import threading
+
+import app as app_module
+from app import app
+from refresher import DetailsRefresher
+from services.breaker import CircuitOpenError
+from store import ProductStore
+
+DAY = 24 * 3600
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100 * DAY
+
+    def __call__(self):
+        return self.now
+
+
+def _product(product_id, fetched_days_ago, barcode=None, clock=None):
+    details = {"product_name": f"P{product_id}"}
+    if fetched_days_ago is not None:
+        details["fetched_at"] = clock.now - fetched_days_ago * DAY
+    return {"id": product_id, "name": f"P{product_id}", "barcode": barcode or f"00{product_id}", "details": details}
+
+
+def _refresher(make_backend, products, fetch, **kwargs):
+    store = ProductStore(products, backend=make_backend())
+    refresher = DetailsRefresher(store, fetch, max_age=7 * DAY, rate_per_sec=1000, interval=0, **kwargs)
+    return store, refresher
+
+
+def test_refreshes_oldest_stale_details_in_batches(make_backend):
+    clock = FakeClock()
+    fetched = []
+
+    def fetch(barcode):
+        fetched.append(barcode)
+        return {"product_name": "fresh", "fetched_at": clock.now}
+
+    products = [
+        _product(1, 8, clock=clock),
+        _product(2, 30, clock=clock),
+        _product(3, 1, clock=clock),
+        _product(4, None, clock=clock),
+        _product(5, 10, clock=clock),
+    ]
+    store, refresher = _refresher(make_backend, products, fetch, batch_size=2, clock=clock)
+    assert refresher.stale_count() == 3
+
+    run = refresher.run_once()
+    # Oldest first; fresh details and ones OFF never stamped are left alone
+    assert fetched == ["002", "005"]
+    assert run["counts"]["refreshed"] == 2 and run["total"] == 2
+    assert store.get(2)["details"] == {"product_name": "fresh", "fetched_at": clock.now}
+
+    refresher.run_once()
+    assert fetched == ["002", "005", "001"]
+    assert refresher.run_once()["total"] == 0
+    assert refresher.stale_count() == 0
+
+    clock.now += 8 * DAY
+    assert refresher.stale_count() == 4
+
+
+def test_failures_back_off_and_keep_old_details(make_backend):
+    clock = FakeClock()
+    answers = {"001": None, "002": RuntimeError("OFF down")}
+    calls = []
+
+    def fetch(barcode):
+        calls.append(barcode)
+        answer = answers.get(barcode, {"product_name": "fresh"})
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    products = [_product(1, 20, clock=clock), _product(2, 10, clock=clock), _product(3, 9, clock=clock)]
+    store, refresher = _refresher(make_backend, products, fetch, batch_size=2, clock=clock)
+
+    counts = refresher.run_once()["counts"]
+    assert (counts["not_found"], counts["failed"]) == (1, 1)
+    assert store.get(1)["details"]["product_name"] == "P1"
+
+    # Backing-off products don't take up the next batch
+    counts = refresher.run_once()["counts"]
+    assert counts["refreshed"] == 1 and calls == ["001", "002", "003"]
+    # fetch didn't stamp it, so the refresher did
+    assert store.get(3)["details"]["fetched_at"] == clock.now
+    assert refresher.status()["backing_off"] == 2
+
+    # A failed lookup is retried sooner than a barcode OFF doesn't know
+    clock.now += 2 * 3600
+    refresher.run_once()
+    assert calls[3:] == ["002"]
+
+
+def test_open_circuit_defers_the_rest_of_the_batch(make_backend):
+    clock = FakeClock()
+    calls = []
+
+    def fetch(barcode):
+        calls.append(barcode)
+        raise CircuitOpenError(5)
+
+    products = [_product(1, 20, clock=clock), _product(2, 10, clock=clock)]
+    store, refresher = _refresher(make_backend, products, fetch, clock=clock)
+
+    run = refresher.run_once()
+    assert calls == ["001"]
+    assert run["counts"]["deferred"] == 1 and run["processed"] == 1
+    # Nothing backs off, so the next run starts from the oldest again
+    assert refresher.status()["backing_off"] == 0
+    refresher.run_once()
+    assert calls == ["001", "001"]
+
+
+def test_does_not_overwrite_details_changed_during_fetch(make_backend):
+    clock = FakeClock()
+    holder = {}
+
+    def fetch(barcode):
+        holder["store"].update(1, {"details": {"product_name": "edited"}})
+        return {"product_name": "fresh"}
+
+    store, refresher = _refresher(make_backend, [_product(1, 20, clock=clock)], fetch, clock=clock)
+    holder["store"] = store
+
+    assert refresher.run_once()["counts"]["skipped"] == 1
+    assert store.get(1)["details"] == {"product_name": "edited"}
+
+
+def test_worker_runs_on_trigger_and_reports_progress(make_backend):
+    clock = FakeClock()
+    release = threading.Event()
+
+    def fetch(barcode):
+        release.wait(timeout=5)
+        return {"product_name": "fresh"}
+
+    store, refresher = _refresher(make_backend, [_product(1, 20, clock=clock)], fetch, clock=clock)
+    assert refresher.status()["state"] == "idle"
+    refresher.start()
+    try:
+        refresher.trigger()
+        while refresher.status()["state"] != "running":
+            threading.Event().wait(0.01)
+        assert refresher.status()["current"]["total"] == 1
+        release.set()
+        while refresher.status()["last_run"] is None:
+            threading.Event().wait(0.01)
+    finally:
+        refresher.stop(timeout=5)
+
+    status = refresher.status()
+    assert status["state"] == "idle"
+    assert status["totals"]["refreshed"] == 1
+    assert status["stale"] == 0
+
+
+def test_refresh_endpoints(monkeypatch):
+    client = app.test_client()
+    fetched = []
+
+    def fake_refresh(barcode):
+        fetched.append(barcode)
+        return {"product_name": "fresh"}
+
+    monkeypatch.setattr(app_module.off_client, "refresh_by_barcode", fake_refresh)
+    app_module.store.update(1, {"details": {"product_name": "old", "fetched_at": 0}})
+
+    status = client.get("/products/refresh").get_json()
+    assert status["stale"] == 1
+    assert status["state"] == "idle"
+
+    resp = client.post("/products/refresh")
+    assert resp.status_code == 202
+    while client.get("/products/refresh").get_json()["stale"] != 0:
+        threading.Event().wait(0.01)
+
+    assert fetched == ["012000001658"]
+    assert app_module.store.get(1)["details"]["product_name"] == "fresh"
+
+
+def test_only_stored_details_carry_fetched_at(monkeypatch):
+    client = app.test_client()
+    monkeypatch.setattr(app_module.off_client, "fetch_by_barcode", lambda barcode: {"product_name": "Nutella"})
+
+    # Search sends OFF's data as is; the stamp only goes on what enrich stores
+    assert client.get("/products/search?barcode=301").get_json() == {"product_name": "Nutella"}
+    enriched = client.patch("/products/1/enrich").get_json()
+    assert enriched["details"]["product_name"] == "Nutella"
+    assert enriched["details"]["fetched_at"] > 0
@@ -0,0 +1,73 @@
+from app import app
+from search import SearchIndex
+
+
+def _index(*products):
+    index = SearchIndex()
+    for product in products:
+        index.add(product)
+    return index
+
+
+def test_index_skips_values_that_are_not_text():
+    index = _index(
+        {"id": 1, "name": 123, "details": "str"},
+        {"id": 2, "name": ["a"], "details": {"brands": 7, "categories_tags": "en:jam"}},
+        {"id": 3, "name": "Jam", "details": None},
+    )
+    assert [product_id for product_id, _ in index.search("jam")] == [3]
+
+
+def test_search_exact_name_match():
+    # Plain word match on the product name
+    index = _index({"id": 1, "name": "Whole Milk"}, {"id": 2, "name": "Bananas"})
+    assert [pid for pid, _ in index.search("milk")] == [1]
+
+
+def test_search_typo_and_substring():
+    # Trigrams should catch typos and partial words
+    index = _index({"id": 1, "name": "Peanut Butter"}, {"id": 2, "name": "Bananas"})
+    assert index.search("peanot")[0][0] == 1
+    assert index.search("banan")[0][0] == 2
+
+
+def test_search_ranks_name_over_ingredients():
+    # A name hit should outrank the same word buried in ingredients
+    index = _index(
+        {"id": 1, "name": "Cookies", "details": {"ingredients_text": "flour, chocolate"}},
+        {"id": 2, "name": "Chocolate Bar", "details": {}},
+    )
+    assert [pid for pid, _ in index.search("chocolate")] == [2, 1]
+
+
+def test_search_remove_drops_results():
+    index = _index({"id": 1, "name": "Whole Milk"})
+    index.remove(1)
+    assert index.search("milk") == []
+    assert len(index) == 0
+
+
+def test_local_search_endpoint_tracks_mutations(monkeypatch):
+    # The endpoint index should follow add / update / enrich / delete without a rebuild
+    client = app.test_client()
+
+    resp = client.post("/products", json={"name": "Hazelnut Spread"})
+    new_id = resp.get_json()["id"]
+    hits = client.get("/products/local-search?q=hazelnut").get_json()
+    assert hits[0]["product"]["id"] == new_id
+
+    client.patch(f"/products/{new_id}", json={"name": "Almond Spread"})
+    assert client.get("/products/local-search?q=hazelnut").get_json() == []
+
+    monkeypatch.setattr("app.fetch_by_barcode", lambda barcode: {"brands": "Ferrero", "categories_tags": ["en:spreads"]})
+    client.patch("/products/1/enrich")
+    hits = client.get("/products/local-search?q=ferrero").get_json()
+    assert hits[0]["product"]["id"] == 1
+
+    client.delete("/products/1")
+    assert client.get("/products/local-search?q=ferrero").get_json() == []
+
+
+def test_local_search_requires_query():
+    client = app.test_client()
+    assert client.get("/products/local-search").status_code == 400
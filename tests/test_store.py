@@ -0,0 +1,268 @@
+import threading
+
+import pytest
+
+from store import ProductStore
+from storage import compact as compact_module
+from storage.compact import CompactBackend
+from storage.memory import MemoryBackend
+from storage.sqlite import SqliteBackend
+
+
+def _seed(make_backend):
+    return ProductStore(backend=make_backend(), rows=[
+        {"id": 1, "name": "Whole Milk", "barcode": "012000001658", "price": 3.49, "stock": 24, "details": {}},
+        {"id": 5, "name": "Bananas", "barcode": None, "price": 0.59, "stock": 120, "details": {}},
+    ])
+
+
+def test_store_get_by_id(make_backend):
+    # Primary index lookups should find existing rows and return None for missing ones
+    store = _seed(make_backend)
+    assert store.get(1)["name"] == "Whole Milk"
+    assert store.get(999) is None
+    assert len(store) == 2
+
+
+def test_store_add_allocates_after_max_id(make_backend):
+    # The allocator starts after the highest seeded id and never reuses deleted ids
+    store = _seed(make_backend)
+    first = store.add({"name": "Eggs"})
+    assert first["id"] == 6
+
+    store.delete(6)
+    second = store.add({"name": "Bread"})
+    assert second["id"] == 7
+
+
+@pytest.mark.parametrize("backend", [MemoryBackend, CompactBackend])
+def test_store_ignores_barcodes_that_are_not_strings(backend):
+    # Only the API validates types, so the in-memory indexes must not blow up half way through
+    # a write (SQLite refuses such values before touching anything)
+    store = ProductStore([], backend=backend())
+    listed = store.add({"name": "Odd", "barcode": ["a"]})
+    store.update(listed["id"], {"barcode": {"x": 1}})
+    store.update(listed["id"], {"barcode": "123"})
+    assert [p["id"] for p in store.find_by_barcode("123")] == [listed["id"]]
+    assert store.delete(listed["id"]) is not None
+    assert store.find_by_barcode("123") == []
+
+
+def test_store_barcode_index_follows_updates(make_backend):
+    # Changing or deleting a barcode should keep the secondary index in sync
+    store = _seed(make_backend)
+    assert [p["id"] for p in store.find_by_barcode("012000001658")] == [1]
+
+    store.update(1, {"barcode": "999"})
+    assert store.find_by_barcode("012000001658") == []
+    assert [p["id"] for p in store.find_by_barcode("999")] == [1]
+
+    store.delete(1)
+    assert store.find_by_barcode("999") == []
+
+
+def test_store_update_ignores_unknown_fields(make_backend):
+    # Only real product fields get written (the id can't be changed through update)
+    store = _seed(make_backend)
+    product = store.update(1, {"id": 42, "stock": 3, "junk": True})
+    assert product["id"] == 1
+    assert product["stock"] == 3
+    assert "junk" not in product
+
+
+def test_store_paginates_in_id_order(make_backend):
+    store = ProductStore(backend=make_backend(), rows=[{"id": i, "name": f"p{i}"} for i in (5, 1, 3)])
+    items, next_after = store.page(limit=2)
+    assert [p["id"] for p in items] == [1, 3]
+    assert store.page(after=next_after, limit=2) == ([store.get(5)], None)
+
+
+def test_store_transaction_rolls_back(make_backend):
+    # A failed batch shouldn't leave half its writes behind (SQLite); memory just passes through
+    store = _seed(make_backend)
+    try:
+        with store.transaction():
+            store.update(1, {"stock": 0})
+            raise RuntimeError("abort batch")
+    except RuntimeError:
+        pass
+
+    if isinstance(store.backend, SqliteBackend):
+        assert store.get(1)["stock"] == 24
+
+
+def test_sqlite_backend_survives_reopen(tmp_path):
+    # The whole point of SQLite: a new process (new backend object) sees the same data
+    path = str(tmp_path / "inventory.db")
+    store = ProductStore(backend=SqliteBackend(path), rows=[{"id": 1, "name": "Milk", "details": {"a": 1}}])
+    store.add({"name": "Eggs", "barcode": "123"})
+
+    reopened = ProductStore(backend=SqliteBackend(path))
+    assert len(reopened) == 2
+    assert reopened.get(1)["details"] == {"a": 1}
+    assert reopened.find_by_barcode("123")[0]["name"] == "Eggs"
+    # The id allocator picks up where the old process left off
+    assert reopened.add({"name": "Bread"})["id"] == 3
+
+    # ...and still skips a deleted max id after another restart
+    reopened.delete(3)
+    again = ProductStore(backend=SqliteBackend(path))
+    assert again.add({"name": "Jam"})["id"] == 4
+
+
+def test_sqlite_backend_upgrades_tables_without_autoincrement(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "inventory.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, barcode TEXT, price REAL, stock INTEGER, details TEXT)"
+    )
+    conn.execute("INSERT INTO products VALUES (7, 'Milk', '123', 1.5, 2, '{}')")
+    conn.commit()
+    conn.close()
+
+    store = ProductStore(backend=SqliteBackend(path))
+    assert store.find_by_barcode("123")[0]["name"] == "Milk"
+    store.delete(7)
+    assert ProductStore(backend=SqliteBackend(path)).add({"name": "Eggs"})["id"] == 8
+
+
+def test_sqlite_backend_uses_wal_and_barcode_index(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "inventory.db"))
+    conn = backend._conn()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM products WHERE barcode = ?", ("1",)).fetchall()
+    assert "idx_products_barcode" in str(plan)
+
+
+def test_sqlite_backend_iterates_across_batches(tmp_path, monkeypatch):
+    # Iteration pages through the table in chunks instead of loading it all at once
+    monkeypatch.setattr("storage.sqlite.BATCH_SIZE", 2)
+    store = ProductStore(backend=SqliteBackend(str(tmp_path / "inventory.db")),
+                         rows=[{"id": i, "name": f"p{i}"} for i in range(1, 6)])
+    assert [p["id"] for p in store.iter_products()] == [1, 2, 3, 4, 5]
+    assert [p["id"] for p in store.iter_products(after=3)] == [4, 5]
+
+
+def test_store_column_matches_rows(make_backend):
+    store = _seed(make_backend)
+    store.add({"name": "Eggs", "stock": 12, "details": {"brands": "Farm"}})
+    store.delete(5)
+
+    assert store.column("id") == [1, 6]
+    assert store.column("stock") == [24, 12]
+    assert store.column("details") == [{}, {"brands": "Farm"}]
+
+
+def test_compact_backend_round_trips_exact_values():
+    # Values that don't fit the typed columns (int price, odd stock) come back untouched
+    store = ProductStore(backend=CompactBackend())
+    odd = store.add({"name": "Odd", "price": 3, "stock": "lots", "details": {"ingredients_text": "café"}})
+    none = store.add({"name": None, "barcode": None, "price": None, "stock": None})
+    normal = store.add({"name": "Milk", "price": 1.25, "stock": 4})
+
+    assert store.get(odd["id"]) == odd
+    assert type(store.get(odd["id"])["price"]) is int
+    assert store.get(none["id"]) == none
+    assert store.get(normal["id"]) == normal
+    assert store.column("price") == [3, None, 1.25]
+
+    store.update(odd["id"], {"price": 2.5, "stock": 7})
+    assert store.get(odd["id"])["price"] == 2.5
+    assert store.get(odd["id"])["stock"] == 7
+    assert store.column("stock") == [7, None, 4]
+
+
+def test_compact_backend_packed_names_survive_renames_and_rewrites(monkeypatch):
+    monkeypatch.setattr(compact_module, "NAME_GARBAGE_MIN", 64)
+    backend = CompactBackend()
+    # Repeated names share their bytes after load(); odd ones (a lone surrogate, not a str)
+    # go to the overflow
+    store = ProductStore(backend=backend, rows=[
+        {"id": 1, "name": "Whole Milk"}, {"id": 2, "name": "Whole Milk"}, {"id": 3, "name": "Caf\u00e9 \ud800"},
+        {"id": 4, "name": 42}, {"id": 5, "name": None},
+    ])
+    assert store.column("name") == ["Whole Milk", "Whole Milk", "Caf\u00e9 \ud800", 42, None]
+    assert len(backend._cols.names) == len("Whole Milk")
+
+    for i in range(20):
+        store.update(1, {"name": f"Oat Milk {i}"})
+    store.update(4, {"name": "Eggs"})
+    store.update(5, {"name": 7})
+
+    # The renames got compacted away, and the shared name is still shared
+    assert len(backend._cols.names) < 40
+    assert [p["name"] for p in store.iter_products()] == ["Oat Milk 19", "Whole Milk", "Caf\u00e9 \ud800", "Eggs", 7]
+    assert store.get(2)["name"] == "Whole Milk"
+
+
+def test_compact_backend_compacts_after_many_deletes():
+    backend = CompactBackend()
+    store = ProductStore(backend=backend, rows=[
+        {"id": i, "name": f"P{i}", "barcode": str(i), "price": 1.0, "stock": i, "details": {}} for i in range(1, 3001)
+    ])
+    for i in range(1, 2501):
+        store.delete(i)
+
+    # Tombstones got dropped, and everything that's left still reads and indexes correctly
+    assert len(backend._cols.ids) < 3000
+    assert len(store) == 500
+    assert store.get(2500) is None
+    assert store.get(2501)["stock"] == 2501
+    assert [p["id"] for p in store.find_by_barcode("3000")] == [3000]
+    assert store.column("id") == list(range(2501, 3001))
+
+
+def test_compact_backend_readers_never_see_half_an_update():
+    # Writers keep price == stock on every product; a torn read would break that
+    store = ProductStore(backend=CompactBackend(), rows=[
+        {"id": i, "name": "P", "barcode": None, "price": 0.0, "stock": 0, "details": {}} for i in range(1, 11)
+    ])
+    stop = threading.Event()
+    torn = []
+
+    def writer():
+        value = 0
+        while not stop.is_set():
+            value += 1
+            store.update(value % 10 + 1, {"price": float(value), "stock": value})
+
+    def reader():
+        for _ in range(20000):
+            product = store.get(_ % 10 + 1)
+            if product["price"] != product["stock"]:
+                torn.append(product)
+
+    threads = [threading.Thread(target=writer) for _ in range(2)]
+    for t in threads:
+        t.start()
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    for t in readers:
+        t.start()
+    for t in readers:
+        t.join()
+    stop.set()
+    for t in threads:
+        t.join()
+
+    assert torn == []
+
+
+def test_sqlite_listeners_only_see_committed_writes(tmp_path):
+    store = ProductStore([{"id": 1, "name": "Milk"}], backend=SqliteBackend(str(tmp_path / "inventory.db")))
+    seen = []
+    store.subscribe(lambda action, old, new: seen.append((action, (new or old)["id"])), replay=False)
+
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.add({"name": "Eggs"})
+            store.update(1, {"stock": 3})
+            raise RuntimeError("batch failed")
+    assert seen == []
+    assert len(store) == 1 and store.get(1)["stock"] == 0
+
+    with store.transaction():
+        store.add({"name": "Bread"})
+        assert seen == []
+    assert seen == [("add", 3)]
@@ -0,0 +1,48 @@
+import threading
+import time
+import uuid
+
+
+class VersionTracker:
+    # Version counters for conditional GETs (ETag / Last-Modified).
+    # Every store change bumps the changed product's version and the collection version.
+    # Products that haven't changed since startup aren't tracked at all: they're version 0,
+    # last modified at startup. The epoch is random per process (and per store reload), so an
+    # ETag from a previous run can never accidentally match.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.epoch = uuid.uuid4().hex[:8]
+        self.collection_version = 0
+        self.collection_modified = time.time()
+        self._started = self.collection_modified
+        self._products: dict[int, tuple[int, float]] = {}
+
+    def on_change(self, action: str, old: dict | None, new: dict | None) -> None:
+        # Store listener
+        with self._lock:
+            if action == "clear":
+                self._reset()
+                return
+
+            now = time.time()
+            product_id = (new or old)["id"]
+            version, _ = self._products.get(product_id, (0, self._started))
+            self._products[product_id] = (version + 1, now)
+            self.collection_version += 1
+            self.collection_modified = now
+
+    # ---------- per product ----------
+    def product_etag(self, product_id: int) -> str:
+        version, _ = self._products.get(product_id, (0, self._started))
+        return f"{self.epoch}-p{product_id}-v{version}"
+
+    def product_modified(self, product_id: int) -> float:
+        return self._products.get(product_id, (0, self._started))[1]
+
+    # ---------- whole collection ----------
+    def collection_etag(self) -> str:
+        return f"{self.epoch}-c{self.collection_version}"